@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+from .models import *
+
+admin.site.register(LessonWeek)
+admin.site.register(SchoolWeek)
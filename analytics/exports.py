@@ -0,0 +1,153 @@
+import os
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.db import connection
+from django.utils import timezone
+
+PARQUET = "parquet"
+ARROW = "arrow"
+FORMATS = (PARQUET, ARROW)
+
+WATERMARK_FILE = "_watermark"
+
+# Solutions modified this recently are left for the next export: a transaction
+# stamps last_modified before it commits, and one still in flight when the
+# watermark moves past its rows would never be exported.
+SETTLE = timedelta(minutes=1)
+
+# Solutions modified in (since, until], with the ids of everything they belong
+# to, ordered so that each school and month partition comes in one run.
+EXPORT_SQL = """
+    SELECT school_class.school_id,
+           to_char(solution.created_at AT TIME ZONE %(tz)s, 'YYYY-MM') AS month,
+           solution.id, solution.student_id, solution.assignment_id,
+           assignment.class_obj_id, assignment.lesson_id,
+           solution.grade, assignment.grade, assignment.deadline,
+           solution.created_at, solution.last_modified
+    FROM assignments_solution AS solution
+    JOIN assignments_assignment AS assignment ON assignment.id = solution.assignment_id
+    JOIN schools_class AS school_class ON school_class.id = assignment.class_obj_id
+    WHERE solution.last_modified <= %(until)s
+    {since}
+    ORDER BY school_class.school_id, month, solution.last_modified, solution.id
+"""
+
+
+def _schema(pa):
+    return pa.schema(
+        [
+            ("school_id", pa.int32()),
+            ("solution_id", pa.int32()),
+            ("student_id", pa.int32()),
+            ("assignment_id", pa.int32()),
+            ("class_id", pa.int32()),
+            ("lesson_id", pa.int32()),
+            ("grade", pa.decimal128(5, 2)),
+            ("max_grade", pa.decimal128(5, 2)),
+            ("deadline", pa.date32()),
+            ("submitted_at", pa.timestamp("us", tz="UTC")),
+            ("last_modified", pa.timestamp("us", tz="UTC")),
+        ]
+    )
+
+
+class _PartitionWriter:
+    """
+    Writes the rows of one school and month to
+    ``school=<id>/month=<YYYY-MM>/part-<stamp>.<format>`` under ``directory``.
+    """
+
+    def __init__(self, pa, schema, directory, partition, stamp, file_format):
+        self.partition = partition
+        school_id, month = partition
+        folder = os.path.join(directory, f"school={school_id}", f"month={month}")
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, f"part-{stamp}.{file_format}")
+        self.pa, self.schema = pa, schema
+        if file_format == PARQUET:
+            import pyarrow.parquet as pq
+
+            self.writer = pq.ParquetWriter(self.path, schema)
+        else:
+            self.writer = pa.ipc.new_file(self.path, schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(
+            self.pa.Table.from_arrays(
+                [
+                    self.pa.array(column, type=field.type)
+                    for column, field in zip(columns, self.schema)
+                ],
+                schema=self.schema,
+            )
+        )
+
+    def close(self):
+        self.writer.close()
+
+
+def export_solutions(
+    directory, since=None, until=None, file_format=PARQUET, chunk_size=5000
+):
+    """
+    Write the solutions modified after ``since`` and up to ``until`` under
+    ``directory``, partitioned by school and month of submission, reading
+    them in chunks through a server-side cursor. Needs pyarrow.
+
+    Every export adds a part file to the partitions it touches: a solution
+    modified again shows up in a later part too, and its latest row is the
+    one with the greatest ``last_modified``. Return ``(rows, paths, until)``;
+    ``until`` is the watermark to export from next time.
+    """
+    import pyarrow as pa
+
+    until = until or timezone.now() - SETTLE
+    stamp = until.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    params = {"tz": timezone.get_current_timezone_name(), "until": until}
+    where = ""
+    if since is not None:
+        where, params["since"] = "AND solution.last_modified > %(since)s", since
+
+    schema = _schema(pa)
+    count, paths, writer = 0, [], None
+    try:
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(EXPORT_SQL.format(since=where), params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for partition, group in groupby(rows, key=lambda row: row[:2]):
+                    if writer is None or writer.partition != partition:
+                        if writer is not None:
+                            writer.close()
+                        writer = _PartitionWriter(
+                            pa, schema, directory, partition, stamp, file_format
+                        )
+                        paths.append(writer.path)
+                    # The month is in the path only.
+                    group = [row[:1] + row[2:] for row in group]
+                    writer.write(group)
+                    count += len(group)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count, paths, until
+
+
+def read_watermark(directory):
+    try:
+        with open(os.path.join(directory, WATERMARK_FILE)) as file:
+            return datetime.fromisoformat(file.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(directory, watermark):
+    # Replaced in one step, so that an interrupted write keeps the old one.
+    path = os.path.join(directory, WATERMARK_FILE)
+    with open(path + ".tmp", "w") as file:
+        file.write(watermark.isoformat())
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,66 @@
+import os
+from glob import glob
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.exports import (
+    FORMATS,
+    PARQUET,
+    export_solutions,
+    read_watermark,
+    write_watermark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Export solutions with their assignment, class, school and lesson ids as "
+        "Parquet (or Arrow IPC) files under DIRECTORY, partitioned as "
+        "school=<id>/month=<YYYY-MM>. Only the solutions modified since the "
+        "previous export into DIRECTORY are written, unless --full is given. "
+        "Needs pyarrow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument("--format", choices=FORMATS, default=PARQUET)
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Export every solution, ignoring the watermark, into a "
+            "directory without exported files.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        os.makedirs(directory, exist_ok=True)
+        if options["full"] and glob(
+            os.path.join(directory, "school=*", "month=*", "part-*")
+        ):
+            # The parts already there would hold every solution a second time.
+            raise CommandError(
+                "{} already holds exported files; a full export needs an empty "
+                "directory.".format(directory)
+            )
+        since = None if options["full"] else read_watermark(directory)
+
+        try:
+            rows, paths, watermark = export_solutions(
+                directory,
+                since=since,
+                file_format=options["format"],
+                chunk_size=options["chunk_size"],
+            )
+        except ImportError:
+            raise CommandError("Exports need pyarrow.")
+        write_watermark(directory, watermark)
+
+        self.stdout.write(
+            "Exported {} solutions modified {}until {} into {} files.".format(
+                rows,
+                "since {} ".format(since.isoformat()) if since else "",
+                watermark.isoformat(),
+                len(paths),
+            )
+        )
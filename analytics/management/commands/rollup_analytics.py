@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.rollups import pending_weeks, rollup_weeks, week_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregate assignments, solutions and news into the weekly analytics "
+        "rollups. Without options, rolls up the complete weeks since the last "
+        "run and re-rolls the last few, as the scheduled job does. --since and "
+        "--until (dates, inclusive) re-roll the weeks containing them; rolling "
+        "up the same weeks again replaces them with the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat)
+        parser.add_argument("--until", type=date.fromisoformat)
+
+    def handle(self, *args, **options):
+        if options["since"] or options["until"]:
+            if not (options["since"] and options["until"]):
+                raise CommandError("--since and --until go together.")
+            weeks = week_start(options["since"]), week_start(options["until"])
+            if weeks[0] > weeks[1]:
+                raise CommandError("--since is after --until.")
+        else:
+            weeks = pending_weeks()
+            if weeks is None:
+                self.stdout.write("Nothing to roll up.")
+                return
+
+        lesson_weeks, school_weeks = rollup_weeks(*weeks)
+        self.stdout.write(
+            "Rolled up the weeks of {} to {}: {} lesson weeks, {} school "
+            "weeks.".format(weeks[0], weeks[1], lesson_weeks, school_weeks)
+        )
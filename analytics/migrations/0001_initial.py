@@ -0,0 +1,47 @@
+# Generated by Django 3.1.7 on 2026-10-17 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('schools', '0006_lesson_normalized_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolWeek',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('news', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weeks', to='schools.school')),
+            ],
+            options={
+                'unique_together': {('school', 'week')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonWeek',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('assignments', models.IntegerField(default=0)),
+                ('submissions', models.IntegerField(default=0)),
+                ('on_time_submissions', models.IntegerField(default=0)),
+                ('graded', models.IntegerField(default=0)),
+                ('grade_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weeks', to='schools.lesson')),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_weeks', to='schools.school')),
+            ],
+            options={
+                'unique_together': {('school', 'week', 'lesson')},
+            },
+        ),
+    ]
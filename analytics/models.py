@@ -0,0 +1,48 @@
+from django.db import models
+
+from schools.models import Lesson, School
+
+
+class LessonWeek(models.Model):
+    """
+    Activity of one lesson of a school during one ISO week, rolled up by the
+    rollup_analytics command. ``week`` is the Monday the week starts on.
+    Assignments count in the week they were created, solutions and their
+    grades in the week they were submitted. Sums and counts are kept rather
+    than rates and averages, so that weeks and lessons add up.
+    """
+
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, related_name="lesson_weeks"
+    )
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="weeks")
+    week = models.DateField()
+    assignments = models.IntegerField(default=0)
+    submissions = models.IntegerField(default=0)
+    on_time_submissions = models.IntegerField(default=0)
+    graded = models.IntegerField(default=0)
+    grade_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("school", "week", "lesson")]
+
+    def __str__(self):
+        return f"{self.lesson} at {self.school}, week of {self.week}"
+
+
+class SchoolWeek(models.Model):
+    """
+    News published by a school or its classes during one ISO week.
+    """
+
+    school = models.ForeignKey(School, on_delete=models.CASCADE, related_name="weeks")
+    week = models.DateField()
+    news = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("school", "week")]
+
+    def __str__(self):
+        return f"{self.school}, week of {self.week}"
@@ -0,0 +1,18 @@
+from rest_framework.permissions import BasePermission
+
+from users.authorization import get_authorization_context
+
+
+class CanViewSchoolAnalytics(BasePermission):
+    """
+    Admins, and the manager of the school whose id is in the URL.
+    """
+
+    def has_permission(self, request, view):
+        if request.user.is_staff:
+            return True
+        try:
+            school_id = int(view.kwargs.get("pk"))
+        except (TypeError, ValueError):
+            return False
+        return get_authorization_context(request.user).manages(school_id)
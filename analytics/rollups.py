@@ -0,0 +1,139 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from assignments.models import Assignment, Solution
+from news.models import News
+
+from .models import LessonWeek, SchoolWeek
+
+# Key of the advisory lock that keeps two rollups from replacing the same weeks
+# at once.
+ROLLUP_LOCK = 240_001
+
+# Assignments created and solutions submitted in [start, end), per school,
+# lesson and local ISO week.
+LESSON_WEEKS_SQL = """
+    INSERT INTO analytics_lessonweek
+        (school_id, lesson_id, week, assignments, submissions,
+         on_time_submissions, graded, grade_sum, updated_at)
+    SELECT school_id, lesson_id, week, sum(assignments), sum(submissions),
+           sum(on_time), sum(graded), sum(grade_sum), now()
+    FROM (
+        SELECT school_class.school_id, assignment.lesson_id,
+               date_trunc('week', assignment.created_at AT TIME ZONE %(tz)s)::date
+                   AS week,
+               1 AS assignments, 0 AS submissions, 0 AS on_time, 0 AS graded,
+               0 AS grade_sum
+        FROM assignments_assignment AS assignment
+        JOIN schools_class AS school_class ON school_class.id = assignment.class_obj_id
+        WHERE assignment.created_at >= %(start)s AND assignment.created_at < %(end)s
+        UNION ALL
+        SELECT school_class.school_id, assignment.lesson_id,
+               date_trunc('week', solution.created_at AT TIME ZONE %(tz)s)::date,
+               0, 1,
+               ((solution.created_at AT TIME ZONE %(tz)s)::date
+                   <= assignment.deadline)::int,
+               (solution.grade IS NOT NULL)::int,
+               coalesce(solution.grade, 0)
+        FROM assignments_solution AS solution
+        JOIN assignments_assignment AS assignment
+          ON assignment.id = solution.assignment_id
+        JOIN schools_class AS school_class ON school_class.id = assignment.class_obj_id
+        WHERE solution.created_at >= %(start)s AND solution.created_at < %(end)s
+    ) AS activity
+    GROUP BY school_id, lesson_id, week
+"""
+
+# News published in [start, end), per school and local ISO week; class news
+# count for the school of the class.
+SCHOOL_WEEKS_SQL = """
+    INSERT INTO analytics_schoolweek (school_id, week, news, updated_at)
+    SELECT coalesce(news.school_id, school_class.school_id),
+           date_trunc('week', news.created_at AT TIME ZONE %(tz)s)::date,
+           count(*), now()
+    FROM news_news AS news
+    LEFT JOIN schools_class AS school_class ON school_class.id = news.class_obj_id
+    WHERE news.created_at >= %(start)s AND news.created_at < %(end)s
+      AND coalesce(news.school_id, school_class.school_id) IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+
+def week_start(day):
+    """Return the Monday of the ISO week of ``day``."""
+    return day - timedelta(days=day.weekday())
+
+
+def _boundary(week):
+    return timezone.make_aware(datetime.combine(week, time.min))
+
+
+def rollup_weeks(first_week, last_week):
+    """
+    Replace the rollups of the weeks from ``first_week`` through
+    ``last_week`` (Mondays) with ones aggregated from the source tables.
+    Running it again for the same weeks gives the same rows. Return the
+    number of lesson and school weeks written.
+    """
+    params = {
+        "tz": timezone.get_current_timezone_name(),
+        "start": _boundary(first_week),
+        "end": _boundary(last_week + timedelta(weeks=1)),
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK])
+        LessonWeek.objects.filter(week__range=(first_week, last_week)).delete()
+        SchoolWeek.objects.filter(week__range=(first_week, last_week)).delete()
+        cursor.execute(LESSON_WEEKS_SQL, params)
+        lesson_weeks = cursor.rowcount
+        cursor.execute(SCHOOL_WEEKS_SQL, params)
+        school_weeks = cursor.rowcount
+    return lesson_weeks, school_weeks
+
+
+def _earliest_activity():
+    dates = [
+        model.objects.aggregate(earliest=Min("created_at"))["earliest"]
+        for model in (Assignment, Solution, News)
+    ]
+    dates = [date for date in dates if date is not None]
+    return timezone.localdate(min(dates)) if dates else None
+
+
+def pending_weeks(today=None):
+    """
+    Return the ``(first_week, last_week)`` the next scheduled run rolls up,
+    or ``None``: every complete week since the latest one rolled up, and the
+    ``ANALYTICS_ROLLUP_LOOKBACK_WEEKS`` last complete weeks again, which late
+    grades and edits may have changed. Without rollups yet, everything since
+    the earliest activity.
+    """
+    last_week = week_start(today or timezone.localdate()) - timedelta(weeks=1)
+    latest = max(
+        (
+            week
+            for week in (
+                LessonWeek.objects.aggregate(latest=Max("week"))["latest"],
+                SchoolWeek.objects.aggregate(latest=Max("week"))["latest"],
+            )
+            if week is not None
+        ),
+        default=None,
+    )
+    if latest is not None:
+        first_week = min(
+            latest + timedelta(weeks=1),
+            last_week - timedelta(weeks=settings.ANALYTICS_ROLLUP_LOOKBACK_WEEKS - 1),
+        )
+    else:
+        earliest = _earliest_activity()
+        if earliest is None:
+            return None
+        first_week = week_start(earliest)
+    if first_week > last_week:
+        return None
+    return first_week, last_week
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .exports import FORMATS, PARQUET
+from .rollups import week_start
+
+DEFAULT_WEEKS = 12
+MAX_WEEKS = 260
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """
+    The weeks to report, from the one containing ``start`` through the one
+    containing ``end``; by default the last twelve.
+    """
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    lesson = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        end = week_start(data.get("end") or timezone.localdate())
+        start = week_start(
+            data.get("start") or end - timedelta(weeks=DEFAULT_WEEKS - 1)
+        )
+        if start > end:
+            raise serializers.ValidationError("start must not be after end.")
+        if (end - start).days // 7 >= MAX_WEEKS:
+            raise serializers.ValidationError(
+                "At most {} weeks can be reported at once.".format(MAX_WEEKS)
+            )
+        return dict(data, start=start, end=end)
+
+
+class ActivitySerializer(serializers.Serializer):
+    assignments = serializers.IntegerField()
+    submissions = serializers.IntegerField()
+    on_time_submissions = serializers.IntegerField()
+    on_time_rate = serializers.SerializerMethodField()
+    graded = serializers.IntegerField()
+    average_grade = serializers.SerializerMethodField()
+
+    def get_on_time_rate(self, obj):
+        if not obj["submissions"]:
+            return None
+        return round(obj["on_time_submissions"] / obj["submissions"], 2)
+
+    def get_average_grade(self, obj):
+        if not obj["graded"]:
+            return None
+        return round(float(obj["grade_sum"]) / obj["graded"], 2)
+
+
+class WeekSerializer(ActivitySerializer):
+    week = serializers.SerializerMethodField()
+    week_start = serializers.DateField()
+    news = serializers.IntegerField()
+
+    def get_week(self, obj):
+        year, week, _ = obj["week_start"].isocalendar()
+        return "{}-W{:02d}".format(year, week)
+
+
+class LessonActivitySerializer(ActivitySerializer):
+    lesson = serializers.IntegerField(source="lesson_id")
+    name = serializers.CharField(source="lesson__name")
+
+
+class SolutionExportQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    output = serializers.ChoiceField(choices=FORMATS, default=PARQUET)
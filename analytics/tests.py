@@ -0,0 +1,200 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from glob import glob
+
+from django.contrib.auth.models import Group
+from django.contrib.gis.geos import Point
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from assignments.models import Assignment, Solution
+from news.models import News
+from schools.models import Class, Lesson, School
+from users.models import User
+
+from .exports import read_watermark
+from .models import LessonWeek, SchoolWeek
+from .rollups import pending_weeks, rollup_weeks, week_start
+
+
+def create_user(username, national_id, group):
+    user = User.objects.create_user(
+        username=username,
+        password="p",
+        email=f"{username}@b.com",
+        national_id=national_id,
+    )
+    user.groups.add(Group.objects.get_or_create(name=group)[0])
+    return user
+
+
+class AnalyticsTestCase(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manager = create_user("manager", "1000000001", "manager")
+        teacher = create_user("teacher", "1000000002", "teacher")
+        student = create_user("student", "1000000003", "student")
+        self.school = School.objects.create(
+            name="School", location=Point(10.0, 20.0), manager=self.manager
+        )
+        classroom = Class.objects.create(name="7A", school=self.school, teacher=teacher)
+        classroom.students.add(student)
+        self.lesson = Lesson.objects.create(name="Math")
+
+        today = timezone.localdate()
+        self.this_week = week_start(today)
+        for title, deadline, grade in [
+            ("Homework", today + timedelta(days=7), 18),
+            ("Late homework", today - timedelta(days=1), None),
+        ]:
+            assignment = Assignment.objects.create(
+                title=title,
+                grade=20,
+                deadline=deadline,
+                lesson=self.lesson,
+                class_obj=classroom,
+            )
+            Solution.objects.create(
+                context="42", student=student, assignment=assignment, grade=grade
+            )
+        News.objects.create(
+            title="Trip", content="Friday", creator=self.manager, school=self.school
+        )
+
+
+class RollupTests(AnalyticsTestCase):
+    def rollup(self):
+        day = self.this_week.isoformat()
+        call_command(
+            "rollup_analytics", "--since", day, "--until", day, stdout=io.StringIO()
+        )
+
+    def test_rollup_is_idempotent(self):
+        fields = ("week", "assignments", "submissions", "on_time_submissions")
+        fields += ("graded", "grade_sum")
+        self.rollup()
+        rows = list(LessonWeek.objects.values_list(*fields))
+        self.assertEqual(rows, [(self.this_week, 2, 2, 1, 1, 18)])
+        self.assertEqual(
+            list(SchoolWeek.objects.values_list("week", "news")),
+            [(self.this_week, 1)],
+        )
+
+        self.rollup()
+        self.assertEqual(list(LessonWeek.objects.values_list(*fields)), rows)
+        self.assertEqual(SchoolWeek.objects.count(), 1)
+
+    def test_pending_weeks(self):
+        last_week = self.this_week - timedelta(weeks=1)
+        self.assertIsNone(pending_weeks())
+
+        Assignment.objects.update(created_at=timezone.now() - timedelta(weeks=3))
+        first_week = self.this_week - timedelta(weeks=3)
+        self.assertEqual(pending_weeks(), (first_week, last_week))
+
+        rollup_weeks(first_week, last_week)
+        with override_settings(ANALYTICS_ROLLUP_LOOKBACK_WEEKS=1):
+            self.assertEqual(
+                pending_weeks(), (first_week + timedelta(weeks=1), last_week)
+            )
+        with override_settings(ANALYTICS_ROLLUP_LOOKBACK_WEEKS=4):
+            self.assertEqual(
+                pending_weeks(), (last_week - timedelta(weeks=3), last_week)
+            )
+
+    def test_weekly_report(self):
+        self.rollup()
+        self.client.force_authenticate(user=self.manager)
+        url = reverse("school-analytics-weeks", args=[self.school.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[0]["submissions"], 0)
+        week = response.data[-1]
+        self.assertEqual(week["week_start"], self.this_week.isoformat())
+        self.assertEqual(
+            (week["submissions"], week["on_time_rate"], week["average_grade"]),
+            (2, 0.5, 18.0),
+        )
+        self.assertEqual(week["news"], 1)
+
+        response = self.client.get(
+            reverse("school-analytics-lessons", args=[self.school.id])
+        )
+        self.assertEqual(
+            [(row["name"], row["assignments"]) for row in response.data],
+            [("Math", 2)],
+        )
+
+    def test_only_the_school_manager_sees_analytics(self):
+        other = create_user("other", "1000000004", "manager")
+        School.objects.create(name="Other", location=Point(10.0, 20.0), manager=other)
+        self.client.force_authenticate(user=other)
+        url = reverse("school-analytics-weeks", args=[self.school.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SolutionExportTests(AnalyticsTestCase):
+    def setUp(self):
+        super().setUp()
+        # Solutions modified in the last minute wait for the next export.
+        Solution.objects.update(last_modified=timezone.now() - timedelta(minutes=5))
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def export(self, *args):
+        output = io.StringIO()
+        call_command("export_solutions", self.directory, *args, stdout=output)
+        return output.getvalue()
+
+    def test_incremental_export(self):
+        import pyarrow.parquet as pq
+
+        self.assertIn("Exported 2 solutions", self.export())
+        files = glob(
+            os.path.join(self.directory, f"school={self.school.id}", "month=*", "*")
+        )
+        self.assertEqual(len(files), 1)
+        table = pq.read_table(files[0])
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(set(table.column("school_id").to_pylist()), {self.school.id})
+
+        self.assertIn("Exported 0 solutions", self.export())
+        Solution.objects.filter(grade__isnull=True).update(
+            grade=12,
+            last_modified=read_watermark(self.directory) + timedelta(microseconds=1),
+        )
+        self.assertIn("Exported 1 solutions", self.export())
+
+    def test_full_export_needs_an_empty_directory(self):
+        self.assertIn("Exported 2 solutions", self.export("--full"))
+        with self.assertRaises(CommandError):
+            self.export("--full")
+        self.assertEqual(
+            len(glob(os.path.join(self.directory, "school=*", "month=*", "*"))), 1
+        )
+
+    def test_export_endpoint(self):
+        admin = User.objects.create_superuser(
+            username="admin", email="a@b.com", password="a", national_id="1111111111"
+        )
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(reverse("solution-export"), {"output": "arrow"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("X-Export-Watermark", response)
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 1)
+        self.assertTrue(archive.namelist()[0].endswith(".arrow"))
+
+    def test_only_admins_export(self):
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(reverse("solution-export"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,12 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import SchoolAnalyticsViewSet, SolutionExportView
+
+router = DefaultRouter()
+router.register("schools", SchoolAnalyticsViewSet, basename="school-analytics")
+
+urlpatterns = [
+    path("exports/solutions/", SolutionExportView.as_view(), name="solution-export"),
+    path("", include(router.urls)),
+]
@@ -0,0 +1,173 @@
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.http import FileResponse
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .exports import export_solutions
+from .models import LessonWeek, SchoolWeek
+from .permissions import CanViewSchoolAnalytics
+from .serializers import *
+
+ACTIVITY = (
+    "assignments",
+    "submissions",
+    "on_time_submissions",
+    "graded",
+    "grade_sum",
+)
+
+
+def sum_activity(lesson_weeks, *group_by):
+    """
+    Sum the activity of ``lesson_weeks`` per ``group_by`` fields, under the
+    names of the fields summed.
+    """
+    rows = lesson_weeks.values(*group_by).annotate(
+        **{"total_" + name: Sum(name) for name in ACTIVITY}
+    )
+    return [
+        dict(
+            {field: row[field] for field in group_by},
+            **{name: row["total_" + name] for name in ACTIVITY},
+        )
+        for row in rows
+    ]
+
+
+class SchoolAnalyticsViewSet(viewsets.ViewSet):
+    """
+    Read-only reports of a school's activity, answered from the weekly
+    rollups of the rollup_analytics command only: the current week shows up
+    once it is over and rolled up.
+    """
+
+    permission_classes = [IsAuthenticated, CanViewSchoolAnalytics]
+    lookup_value_regex = r"\d+"
+
+    def get_query(self, request):
+        query = AnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return query.validated_data
+
+    def lesson_weeks(self, school_id, query):
+        lesson_weeks = LessonWeek.objects.filter(
+            school_id=school_id, week__range=(query["start"], query["end"])
+        )
+        if "lesson" in query:
+            lesson_weeks = lesson_weeks.filter(lesson_id=query["lesson"])
+        return lesson_weeks
+
+    @swagger_auto_schema(
+        operation_summary="Weekly activity of a school",
+        operation_description="One entry per ISO week from `start` through `end` "
+        "(the last twelve weeks by default): assignments created, solutions "
+        "submitted and the share submitted by the deadline, graded solutions and "
+        "their average grade, all optionally for one `lesson`, and news published. "
+        "Weeks without activity are reported with zeros.",
+        query_serializer=AnalyticsQuerySerializer,
+        responses={200: WeekSerializer(many=True)},
+    )
+    @action(detail=True, methods=["get"])
+    def weeks(self, request, pk=None):
+        query = self.get_query(request)
+        activity = {
+            row["week"]: row
+            for row in sum_activity(self.lesson_weeks(pk, query), "week")
+        }
+        news = dict(
+            SchoolWeek.objects.filter(
+                school_id=pk, week__range=(query["start"], query["end"])
+            ).values_list("week", "news")
+        )
+
+        weeks, week = [], query["start"]
+        while week <= query["end"]:
+            row = activity.get(week) or dict.fromkeys(ACTIVITY, 0)
+            weeks.append(dict(row, week_start=week, news=news.get(week, 0)))
+            week += timedelta(weeks=1)
+        serializer = WeekSerializer(weeks, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="Activity of a school per lesson",
+        operation_description="The activity of every lesson of the school over the "
+        "weeks from `start` through `end` (the last twelve by default).",
+        query_serializer=AnalyticsQuerySerializer,
+        responses={200: LessonActivitySerializer(many=True)},
+    )
+    @action(detail=True, methods=["get"])
+    def lessons(self, request, pk=None):
+        query = self.get_query(request)
+        lessons = sum_activity(
+            self.lesson_weeks(pk, query).order_by("lesson__name", "lesson_id"),
+            "lesson_id",
+            "lesson__name",
+        )
+        serializer = LessonActivitySerializer(lessons, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class SolutionExportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Export solutions as Parquet or Arrow files",
+        operation_description="Returns a zip archive of the solutions modified "
+        "after `since` (all of them without it), with their assignment, class, "
+        "school and lesson ids, as Parquet (default) or Arrow IPC files "
+        "partitioned as `school=<id>/month=<YYYY-MM>/`. Pass the "
+        "`X-Export-Watermark` header of the response as `since` to get only what "
+        "changed next time. Needs pyarrow on the server.",
+        query_serializer=SolutionExportQuerySerializer,
+        responses={
+            200: openapi.Response(
+                description="Zip archive of the partitioned files",
+                headers={
+                    "X-Export-Watermark": {
+                        "type": openapi.TYPE_STRING,
+                        "description": "Export from this time next time",
+                    }
+                },
+            )
+        },
+    )
+    def get(self, request):
+        query = SolutionExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        archive = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                _, paths, watermark = export_solutions(
+                    directory,
+                    since=query.validated_data.get("since"),
+                    file_format=query.validated_data["output"],
+                )
+            except ImportError:
+                archive.close()
+                raise ValidationError({"output": "Exports need pyarrow."})
+            # Parquet and Arrow files are compressed already.
+            with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zipped:
+                for path in paths:
+                    zipped.write(path, os.path.relpath(path, directory))
+        archive.seek(0)
+
+        response = FileResponse(
+            archive,
+            as_attachment=True,
+            filename="solutions-{:%Y%m%dT%H%M%S}.zip".format(watermark),
+            content_type="application/zip",
+        )
+        response["X-Export-Watermark"] = watermark.isoformat()
+        return response
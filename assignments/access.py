@@ -0,0 +1,84 @@
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+from django.utils import timezone
+
+from users.authorization import get_authorization_context
+
+
+def _flag(condition):
+    """
+    Wrap ``condition`` as a boolean column. ``None`` is a condition that can
+    never hold, such as membership of an empty list of ids, which Django
+    cannot compile inside an annotation.
+    """
+    if condition is None or condition is True:
+        return Value(condition is True, output_field=BooleanField())
+    return ExpressionWrapper(condition, output_field=BooleanField())
+
+
+def _among(lookup, ids):
+    return Q(**{lookup + "__in": list(ids)}) if ids else None
+
+
+def _both(condition, other):
+    return None if condition is None else condition & other
+
+
+def assignment_access(user):
+    """
+    Annotations telling, for every assignment of a queryset, whether ``user``
+    can view it (``can_view``), update it (``can_update``), add its answer
+    (``can_add_answer``) or see its grade statistics (``can_view_stats``), so
+    that the object permissions read them from the row the view loads instead
+    of following relations.
+    """
+    context = get_authorization_context(user)
+    today = timezone.now().date()
+    teaches = _among("class_obj_id", context.taught_class_ids)
+
+    if context.has_role("teacher"):
+        can_view = teaches
+    elif context.has_role("student"):
+        can_view = _among("class_obj_id", context.enrolled_class_ids)
+    elif context.has_role("manager") and context.managed_school_id:
+        can_view = Q(class_obj__school_id=context.managed_school_id)
+    else:
+        can_view = True if user.is_staff else None
+
+    return {
+        "can_view": _flag(can_view),
+        "can_update": _flag(_both(teaches, Q(deadline__gt=today))),
+        "can_add_answer": _flag(_both(teaches, Q(deadline__lt=today))),
+        # Students see their own grades, not those of their classmates.
+        "can_view_stats": _flag(None if context.has_role("student") else can_view),
+    }
+
+
+def solution_access(user):
+    """
+    Annotations telling, for every solution of a queryset, whether ``user``
+    can view it (``can_view``), grade it (``can_grade``) or update it
+    (``can_update``).
+    """
+    context = get_authorization_context(user)
+    today = timezone.now().date()
+    teaches = _among("assignment__class_obj_id", context.taught_class_ids)
+    own = Q(student_id=user.pk)
+
+    if context.has_role("teacher"):
+        can_view = teaches
+    elif context.has_role("student"):
+        can_view = own
+    else:
+        can_view = None
+
+    can_update = None
+    if context.has_role("student"):
+        can_update = _both(
+            _among("assignment__class_obj_id", context.enrolled_class_ids), own
+        )
+
+    return {
+        "can_view": _flag(can_view),
+        "can_grade": _flag(_both(teaches, Q(assignment__deadline__lt=today))),
+        "can_update": _flag(can_update),
+    }
@@ -0,0 +1,226 @@
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Window
+from django.db.models.functions import Cast, NullIf, Rank
+from django.utils import timezone
+
+from .models import Assignment, StudentAverage
+
+# Sum and count of the graded solutions of every student, per class and lesson
+# of their assignments, computed from scratch.
+AVERAGES_SQL = """
+    SELECT assignment.class_obj_id, assignment.lesson_id, solution.student_id,
+           sum(solution.grade), count(solution.grade)
+    FROM assignments_solution AS solution
+    JOIN assignments_assignment AS assignment ON assignment.id = solution.assignment_id
+    WHERE solution.grade IS NOT NULL
+    {where}
+    GROUP BY assignment.class_obj_id, assignment.lesson_id, solution.student_id
+"""
+
+
+def compute_averages(placements=None):
+    """
+    Return ``{(class_id, lesson_id, student_id): (grade_sum, graded)}``
+    computed from the solutions, for every class and lesson or only the
+    ``(class_id, lesson_id)`` pairs of ``placements``.
+    """
+    where, params = "", {}
+    if placements is not None:
+        where = """
+            AND (assignment.class_obj_id, assignment.lesson_id) IN (
+                SELECT * FROM unnest(%(class_ids)s::int[], %(lesson_ids)s::int[])
+            )
+        """
+        params = {
+            "class_ids": [class_id for class_id, _ in placements],
+            "lesson_ids": [lesson_id for _, lesson_id in placements],
+        }
+    with connection.cursor() as cursor:
+        cursor.execute(AVERAGES_SQL.format(where=where), params)
+        return {tuple(row[:3]): tuple(row[3:]) for row in cursor.fetchall()}
+
+
+def _decimal(grade):
+    return Decimal(0) if grade is None else Decimal(str(grade))
+
+
+def _average(grade_sum, graded):
+    # Rounded the way PostgreSQL rounds into the numeric(5, 2) column.
+    return (grade_sum / graded).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _increments(sum_delta, count_delta):
+    grade_sum = F("grade_sum") + sum_delta
+    graded = F("graded") + count_delta
+    return {
+        "grade_sum": grade_sum,
+        "graded": graded,
+        # Every right-hand side reads the row as it was before the update.
+        "average": ExpressionWrapper(
+            grade_sum / NullIf(graded, 0), output_field=DecimalField()
+        ),
+        "updated_at": timezone.now(),
+    }
+
+
+def record_grade_changes(changes):
+    """
+    Apply ``changes``, a list of ``grading.GradeChange``, to the averages of
+    their students with F() expressions, so that concurrent grading adds up.
+    A grade set from nothing or cleared also moves the count.
+    """
+    placements = {
+        assignment_id: (class_obj_id, lesson_id)
+        for assignment_id, class_obj_id, lesson_id in Assignment.objects.filter(
+            pk__in={change.assignment_id for change in changes}
+        ).values_list("pk", "class_obj_id", "lesson_id")
+    }
+
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for change in changes:
+        if change.assignment_id not in placements:
+            continue
+        key = placements[change.assignment_id] + (change.student_id,)
+        deltas[key][0] += _decimal(change.grade) - _decimal(change.previous)
+        deltas[key][1] += (change.grade is not None) - (change.previous is not None)
+
+    for (class_id, lesson_id, student_id), (sum_delta, count_delta) in sorted(
+        deltas.items()
+    ):
+        if not sum_delta and not count_delta:
+            continue
+        rows = StudentAverage.objects.filter(
+            class_obj_id=class_id, lesson_id=lesson_id, student_id=student_id
+        )
+        if rows.update(**_increments(sum_delta, count_delta)) or count_delta <= 0:
+            # A missing row only matters for a new grade: removals without one
+            # come from a class or lesson whose averages are being deleted.
+            continue
+        # Created empty and then incremented, so that two transactions
+        # creating the same row both count.
+        StudentAverage.objects.bulk_create(
+            [
+                StudentAverage(
+                    class_obj_id=class_id, lesson_id=lesson_id, student_id=student_id
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        rows.update(**_increments(sum_delta, count_delta))
+
+
+def rebuild_student_averages(placements=None):
+    """
+    Replace the averages of every class and lesson, or of the ``(class_id,
+    lesson_id)`` pairs of ``placements``, with ones computed from scratch.
+    """
+    with transaction.atomic():
+        stored = StudentAverage.objects.select_for_update()
+        if placements is not None:
+            placements = {
+                (class_id, lesson_id)
+                for class_id, lesson_id in placements
+                if class_id is not None and lesson_id is not None
+            }
+            if not placements:
+                return
+            stored = stored.filter(
+                class_obj_id__in={class_id for class_id, _ in placements},
+                lesson_id__in={lesson_id for _, lesson_id in placements},
+            )
+        stored = {
+            (average.class_obj_id, average.lesson_id, average.student_id): average
+            for average in stored
+            if placements is None
+            or (average.class_obj_id, average.lesson_id) in placements
+        }
+
+        computed = compute_averages(placements)
+        created, updated = [], []
+        for key, (grade_sum, graded) in computed.items():
+            average = stored.pop(key, None)
+            if average is None:
+                average = StudentAverage(
+                    class_obj_id=key[0], lesson_id=key[1], student_id=key[2]
+                )
+                created.append(average)
+            elif (average.grade_sum, average.graded) != (grade_sum, graded):
+                updated.append(average)
+            average.grade_sum, average.graded = grade_sum, graded
+            average.average = _average(grade_sum, graded)
+            average.updated_at = timezone.now()
+
+        StudentAverage.objects.filter(
+            pk__in=[average.pk for average in stored.values()]
+        ).delete()
+        StudentAverage.objects.bulk_update(
+            updated, ["grade_sum", "graded", "average", "updated_at"]
+        )
+        StudentAverage.objects.bulk_create(created, ignore_conflicts=True)
+
+
+def find_drift():
+    """
+    Compare the stored averages with ones computed from scratch. Return
+    ``(computed, drifted)``, where ``drifted`` lists ``(key, stored,
+    computed)`` for every key whose ``(grade_sum, graded, average)`` differ,
+    ``None`` standing for a missing row. Rows without grades equal no row.
+    """
+    computed = {
+        key: (grade_sum, graded, _average(grade_sum, graded))
+        for key, (grade_sum, graded) in compute_averages().items()
+    }
+    stored = {
+        (class_obj_id, lesson_id, student_id): (grade_sum, graded, average)
+        for class_obj_id, lesson_id, student_id, grade_sum, graded, average in (
+            StudentAverage.objects.exclude(graded=0, grade_sum=0).values_list(
+                "class_obj_id",
+                "lesson_id",
+                "student_id",
+                "grade_sum",
+                "graded",
+                "average",
+            )
+        )
+    }
+    drifted = [
+        (key, stored.get(key), computed.get(key))
+        for key in sorted(stored.keys() | computed.keys())
+        if stored.get(key) != computed.get(key)
+    ]
+    return computed, drifted
+
+
+def class_ranking(class_id, lesson_id=None):
+    """
+    Rank the students of a class by their average in one lesson or, without
+    ``lesson_id``, by the average of all their graded solutions in the class.
+    Ties share a rank; students without grades are left out.
+    """
+    fields = (
+        "student_id",
+        "student__username",
+        "student__first_name",
+        "student__last_name",
+    )
+    averages = StudentAverage.objects.filter(class_obj_id=class_id, graded__gt=0)
+    if lesson_id is not None:
+        averages = (
+            averages.filter(lesson_id=lesson_id)
+            .values(*fields)
+            .annotate(student_average=F("average"), solutions=F("graded"))
+        )
+    else:
+        averages = averages.values(*fields).annotate(
+            solutions=Sum("graded"),
+            student_average=Cast(
+                Sum("grade_sum") / Sum("graded"),
+                DecimalField(max_digits=5, decimal_places=2),
+            ),
+        )
+    return averages.annotate(
+        rank=Window(expression=Rank(), order_by=F("student_average").desc())
+    ).order_by("rank", "student__last_name", "student_id")
@@ -0,0 +1,206 @@
+import csv
+
+from django.db import connection
+from openpyxl import Workbook
+
+from users.models import User
+
+from .models import Assignment
+
+CSV = "csv"
+XLSX = "xlsx"
+FORMATS = (CSV, XLSX)
+
+# One cell per enrolled student and assignment of the class: the best grade of
+# the student's solutions, if any was graded, and that grade as a percentage
+# of the assignment's maximum grade, which makes grades of assignments graded
+# out of different maximums comparable.
+CELLS_SQL = """
+    SELECT enrollment.user_id AS student_id,
+           assignment.id AS assignment_id,
+           max(solution.grade) AS grade,
+           max(solution.grade) * 100 / nullif(assignment.grade, 0) AS score
+    FROM schools_class_students AS enrollment
+    JOIN assignments_assignment AS assignment
+      ON assignment.class_obj_id = enrollment.class_id
+    LEFT JOIN assignments_solution AS solution
+      ON solution.assignment_id = assignment.id
+     AND solution.student_id = enrollment.user_id
+    WHERE enrollment.class_id = %(class_id)s
+    GROUP BY enrollment.user_id, assignment.id
+"""
+
+# The cells and every average in one pass. GROUPING() tells the sets apart: 0
+# for a cell, 1 for a student, 2 for an assignment and 3 for the class.
+GRADEBOOK_SQL = (
+    "WITH cells AS ("
+    + CELLS_SQL
+    + """)
+    SELECT student_id, assignment_id, avg(grade), avg(score), count(grade),
+           GROUPING(student_id, assignment_id)
+    FROM cells
+    GROUP BY GROUPING SETS (
+        (student_id, assignment_id), (student_id), (assignment_id), ()
+    )
+"""
+)
+
+CELL, STUDENT, ASSIGNMENT, CLASS = 0, 1, 2, 3
+
+# One row per student with the grades in assignment order, for exports.
+EXPORT_SQL = (
+    "WITH cells AS ("
+    + CELLS_SQL
+    + """)
+    SELECT account.id, account.username, account.first_name, account.last_name,
+           array_agg(cells.grade ORDER BY assignment.deadline, assignment.id),
+           avg(cells.score)
+    FROM cells
+    JOIN users_user AS account ON account.id = cells.student_id
+    JOIN assignments_assignment AS assignment ON assignment.id = cells.assignment_id
+    GROUP BY account.id
+    ORDER BY account.last_name, account.first_name, account.username, account.id
+"""
+)
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def class_assignments(class_id):
+    return list(
+        Assignment.objects.filter(class_obj_id=class_id)
+        .order_by("deadline", "id")
+        .values("id", "title", "deadline", "grade")
+    )
+
+
+def gradebook(class_id):
+    """
+    Return the student x assignment grade matrix of a class.
+
+    ``grades`` of every student are in the order of ``assignments``, ``None``
+    where nothing was graded. Assignments average their grades; students and
+    the class average the grades as percentages of the maximum grades.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(GRADEBOOK_SQL, {"class_id": class_id})
+        rows = cursor.fetchall()
+
+    cells, students_average, assignments_average, average = {}, {}, {}, None
+    for student_id, assignment_id, grade, score, graded, grouping in rows:
+        if grouping == CELL:
+            cells[student_id, assignment_id] = grade
+        elif grouping == STUDENT:
+            students_average[student_id] = _round(score)
+        elif grouping == ASSIGNMENT:
+            assignments_average[assignment_id] = (_round(grade), graded)
+        else:
+            average = _round(score)
+
+    assignments = class_assignments(class_id)
+    students = (
+        User.objects.filter(class_students=class_id)
+        .order_by("last_name", "first_name", "username", "id")
+        .values("id", "username", "first_name", "last_name")
+    )
+    return {
+        "assignments": [
+            {
+                "id": assignment["id"],
+                "title": assignment["title"],
+                "deadline": assignment["deadline"],
+                "max_grade": _round(assignment["grade"]),
+                "average": assignments_average.get(assignment["id"], (None, 0))[0],
+                "graded": assignments_average.get(assignment["id"], (None, 0))[1],
+            }
+            for assignment in assignments
+        ],
+        "students": [
+            dict(
+                student,
+                grades=[
+                    _round(cells.get((student["id"], assignment["id"])))
+                    for assignment in assignments
+                ],
+                average=students_average.get(student["id"]),
+            )
+            for student in students
+        ],
+        "average": average,
+    }
+
+
+AVERAGES_SQL = (
+    "WITH cells AS ("
+    + CELLS_SQL
+    + """)
+    SELECT assignment_id, avg(grade), avg(score)
+    FROM cells
+    GROUP BY GROUPING SETS ((assignment_id), ())
+"""
+)
+
+
+def gradebook_averages(class_id):
+    """
+    Return ``{assignment_id: average grade}``, with the class's average
+    percentage under ``None``.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(AVERAGES_SQL, {"class_id": class_id})
+        return {
+            assignment_id: _round(score if assignment_id is None else grade)
+            for assignment_id, grade, score in cursor.fetchall()
+        }
+
+
+def export_rows(class_id, chunk_size=500):
+    """
+    Yield the rows of a gradebook export: a header, one row per student read
+    through a server-side cursor, and the assignment averages.
+    """
+    assignments = class_assignments(class_id)
+    yield ["Student ID", "Username", "First name", "Last name"] + [
+        assignment["title"] for assignment in assignments
+    ] + ["Average (%)"]
+
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(EXPORT_SQL, {"class_id": class_id})
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for student_id, username, first_name, last_name, grades, score in rows:
+                yield [student_id, username, first_name, last_name] + [
+                    _round(grade) for grade in grades
+                ] + [_round(score)]
+
+    averages = gradebook_averages(class_id)
+    yield ["", "Average", "", ""] + [
+        averages.get(assignment["id"]) for assignment in assignments
+    ] + [averages.get(None)]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_csv(class_id):
+    writer = csv.writer(_Echo())
+    for row in export_rows(class_id):
+        yield writer.writerow(row)
+
+
+def write_xlsx(class_id, file):
+    """
+    Write the gradebook export of a class to ``file`` as a workbook, in
+    openpyxl's write-only mode, which keeps rows out of memory.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Gradebook")
+    for row in export_rows(class_id):
+        sheet.append(row)
+    workbook.save(file)
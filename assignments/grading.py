@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Solution
+
+# Sent with ``sender=Solution`` and ``changes``, a list of GradeChange, after
+# grades were set, changed or cleared, whether one solution was saved or many
+# were graded at once.
+grades_changed = Signal()
+
+GradeChange = namedtuple(
+    "GradeChange", ["solution_id", "assignment_id", "student_id", "previous", "grade"]
+)
+
+ATOMIC = "atomic"
+BEST_EFFORT = "best_effort"
+MODES = (ATOMIC, BEST_EFFORT)
+
+GRADED = "graded"
+SKIPPED = "skipped"
+INVALID = "invalid"
+DUPLICATE = "duplicate"
+NOT_FOUND = "not_found"
+FORBIDDEN = "forbidden"
+
+
+def grade_solutions(queryset, items, mode=ATOMIC, dry_run=False):
+    """
+    Set the grade of the solutions of ``queryset`` listed in ``items``, a list
+    of ``{"id", "grade"}``.
+
+    ``queryset`` is expected to carry the ``can_grade`` flag of
+    ``access.solution_access``, so that visibility, ownership and deadlines of
+    the whole set are checked by the query that loads it. Items whose solution
+    is not in ``queryset`` are ``not_found``, those that cannot be graded yet
+    or by this user ``forbidden``. In ``ATOMIC`` mode a single failure leaves
+    every solution untouched and the others ``skipped``; in ``BEST_EFFORT``
+    mode the other solutions are graded. With ``dry_run`` the items are only
+    checked.
+
+    Return one ``{"id", "status"}`` result per item, in order.
+    """
+    with transaction.atomic():
+        solutions = (
+            queryset.filter(pk__in=[item["id"] for item in items])
+            .select_for_update(of=("self",))
+            .only("id", "grade", "assignment_id", "student_id")
+            .in_bulk()
+        )
+
+        results, graded, seen = [], [], set()
+        for item in items:
+            solution = solutions.get(item["id"])
+            if item["id"] in seen:
+                outcome = DUPLICATE
+            elif solution is None:
+                outcome = NOT_FOUND
+            elif not solution.can_grade:
+                outcome = FORBIDDEN
+            else:
+                outcome = GRADED
+                graded.append((solution, item["grade"]))
+            seen.add(item["id"])
+            results.append({"id": item["id"], "status": outcome})
+
+        if dry_run or (mode == ATOMIC and len(graded) < len(items)):
+            for result in results:
+                if result["status"] == GRADED:
+                    result["status"] = SKIPPED
+            return results
+
+        now = timezone.now()
+        changes = []
+        for solution, grade in graded:
+            if solution.grade != grade:
+                changes.append(
+                    GradeChange(
+                        solution.pk,
+                        solution.assignment_id,
+                        solution.student_id,
+                        solution.grade,
+                        grade,
+                    )
+                )
+            solution.grade, solution.last_modified = grade, now
+        Solution.objects.bulk_update(
+            [solution for solution, _ in graded], ["grade", "last_modified"]
+        )
+        if changes:
+            grades_changed.send(sender=Solution, changes=changes)
+    return results
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from assignments.averages import find_drift, rebuild_student_averages
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every student's lesson averages from the graded solutions and "
+        "report the ones that had drifted. With --check nothing is written and "
+        "the command fails if any average drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            computed, drifted = find_drift()
+
+            for (class_id, lesson_id, student_id), stored, expected in drifted:
+                self.stdout.write(
+                    "Student {} in class {}, lesson {}: {} -> {}".format(
+                        student_id,
+                        class_id,
+                        lesson_id,
+                        self.describe(stored),
+                        self.describe(expected),
+                    )
+                )
+
+            if options["check"]:
+                if drifted:
+                    raise CommandError("{} averages drifted.".format(len(drifted)))
+                self.stdout.write("All {} averages are exact.".format(len(computed)))
+                return
+
+            rebuild_student_averages()
+            self.stdout.write(
+                "Rebuilt {} averages, {} had drifted.".format(
+                    len(computed), len(drifted)
+                )
+            )
+
+    def describe(self, values):
+        if values is None:
+            return "no row"
+        return "sum {}, count {}, average {}".format(*values)
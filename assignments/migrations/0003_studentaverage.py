@@ -0,0 +1,47 @@
+# Generated by Django 3.1.7 on 2026-10-17 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0006_lesson_normalized_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('assignments', '0002_auto_20250523_0922'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAverage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('graded', models.IntegerField(default=0)),
+                ('average', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_averages', to='schools.class')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_averages', to='schools.lesson')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_averages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('class_obj', 'lesson', 'student')},
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO assignments_studentaverage
+                    (class_obj_id, lesson_id, student_id, grade_sum, graded, average, updated_at)
+                SELECT assignment.class_obj_id, assignment.lesson_id, solution.student_id,
+                       sum(solution.grade), count(solution.grade),
+                       sum(solution.grade) / count(solution.grade), now()
+                FROM assignments_solution AS solution
+                JOIN assignments_assignment AS assignment ON assignment.id = solution.assignment_id
+                WHERE solution.grade IS NOT NULL
+                GROUP BY assignment.class_obj_id, assignment.lesson_id, solution.student_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
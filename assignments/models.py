@@ -46,3 +46,33 @@ class Solution(models.Model):
 
     def __str__(self):
         return f"Solution by {self.student.username} for {self.assignment.title}"
+
+
+class StudentAverage(models.Model):
+    """
+    Running sum, count and average of a student's graded solutions to the
+    assignments of one lesson in one class. Kept up to date with F()
+    expressions by ``averages.record_grade_changes`` and rebuilt from the
+    solutions by the rebuild_student_averages command.
+    """
+
+    student = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="lesson_averages"
+    )
+    class_obj = models.ForeignKey(
+        Class, on_delete=models.CASCADE, related_name="student_averages"
+    )
+    lesson = models.ForeignKey(
+        Lesson, on_delete=models.CASCADE, related_name="student_averages"
+    )
+    grade_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    graded = models.IntegerField(default=0)
+    average = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Class and lesson lead, so the index also serves the rankings.
+        unique_together = [("class_obj", "lesson", "student")]
+
+    def __str__(self):
+        return f"{self.student} - {self.lesson} in {self.class_obj}"
@@ -3,11 +3,14 @@ from django.core.exceptions import PermissionDenied
 from django.utils import timezone
 from rest_framework.permissions import BasePermission
 
+from users.authorization import get_authorization_context, has_role
+from users.identity import get_shared_object
+
 from .models import Assignment, Lesson, Solution
 
 
 def is_in_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return has_role(user, group_name)
 
 
 class IsTeacher(BasePermission):
@@ -41,31 +44,37 @@ class IsStudentReadOnly(BasePermission):
 
 class IsTeacherOfLesson(BasePermission):
     def has_permission(self, request, view):
-        lesson_id = request.data.get("lesson_id")
+        lesson_id = request.data.get("lesson") or request.data.get("lesson_id")
         if not lesson_id:
             return False
 
+        context = get_authorization_context(request.user)
         try:
-            lesson = Lesson.objects.get(id=lesson_id)
-            return lesson.class_lessons.first().teacher == request.user
-        except Lesson.DoesNotExist:
+            return Lesson.objects.filter(
+                pk=lesson_id, class_lessons__in=context.taught_class_ids
+            ).exists()
+        except (TypeError, ValueError):
             return False
 
 
+# The object permissions below read the flags annotated by
+# ``access.assignment_access`` and ``access.solution_access`` on the querysets
+# of the viewsets, which authorize in the same statement that loads the object.
+
+
 class CanUpdateAssignment(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return (
-            obj.lesson.class_lessons.first().teacher == request.user
-            and obj.deadline > timezone.now().date()
-        )
+        return obj.can_update
 
 
 class CanAddAnswer(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return (
-            obj.class_obj.teacher == request.user
-            and obj.deadline < timezone.now().date()
-        )
+        return obj.can_add_answer
+
+
+class CanViewAssignmentStats(BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return obj.can_view_stats
 
 
 class CanSubmitOrUpdateSolution(BasePermission):
@@ -78,72 +87,56 @@ class CanSubmitOrUpdateSolution(BasePermission):
 
 class IsTeacherOfAssignment(BasePermission):
     def has_permission(self, request, view):
-        assignment_id = view.kwargs.get("pk")
+        if not view.kwargs.get("pk"):
+            return False
         try:
-            assignment = Assignment.objects.get(id=assignment_id)
-            return assignment.class_obj.teacher == request.user
+            assignment = get_shared_object(request, view)
         except Assignment.DoesNotExist:
             return False
+        return get_authorization_context(request.user).teaches(assignment.class_obj_id)
 
 
 class CanGradeSolution(BasePermission):
     def has_object_permission(self, request, view, obj):
-        is_teacher = obj.assignment.class_obj.teacher == request.user
-        deadline_passed = obj.assignment.deadline < timezone.now().date()
-        return is_teacher and deadline_passed
+        return obj.can_grade
 
 
 class CanViewSolution(BasePermission):
     def has_object_permission(self, request, view, obj):
-        if is_in_group(request.user, "teacher"):
-            return obj.assignment.class_obj.teacher == request.user
-        elif is_in_group(request.user, "student"):
-            return obj.student == request.user
-        return False
+        return obj.can_view
 
 
 class CanViewAssignment(BasePermission):
     def has_object_permission(self, request, view, obj):
-        user = request.user
-
-        if user.groups.filter(name="teacher").exists():
-            return obj.class_obj.teacher == user
-
-        elif user.groups.filter(name="student").exists():
-            return obj.class_obj.students.filter(id=user.id).exists()
-
-        elif user.groups.filter(name="manager").exists() and hasattr(
-            user, "school_manager"
-        ):
-            return obj.class_obj.school == user.school_manager
-
-        return False
+        return obj.can_view
 
 
 class IsStudentOfAssignment(BasePermission):
 
     def has_permission(self, request, view):
-        user = request.user
-        if not user.groups.filter(name="student").exists():
+        context = get_authorization_context(request.user)
+        if not context.has_role("student"):
             return False
 
-        assignment_id = view.kwargs.get("pk")
+        # Solutions are created with the id of their assignment in the body.
+        assignment_id = request.data.get("assignment_id")
         if not assignment_id:
             return False
 
         try:
-            assignment = Assignment.objects.get(id=assignment_id)
-        except Assignment.DoesNotExist:
+            class_id = (
+                Assignment.objects.filter(pk=assignment_id)
+                .values_list("class_obj_id", flat=True)
+                .first()
+            )
+        except (TypeError, ValueError):
+            class_id = None
+        if class_id is None:
             raise PermissionDenied("Assignment not found.")
 
-        return assignment.class_obj.students.filter(id=user.id).exists()
+        return context.is_enrolled_in(class_id)
 
 
 class CanUpdateOwnSolution(BasePermission):
     def has_object_permission(self, request, view, obj):
-        user = request.user
-        if not user.groups.filter(name="student").exists():
-            return False
-        if obj.student != user:
-            return False
-        return obj.assignment.class_obj.students.filter(id=user.id).exists()
+        return obj.can_update
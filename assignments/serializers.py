@@ -8,6 +8,7 @@ from rest_framework import serializers
 from schools.models import Class, Lesson
 from schools.serializers import ClassSerializer, LessonSerializer
 
+from . import grading
 from .models import Assignment, Solution
 
 
@@ -192,3 +193,19 @@ class TeacherGradeSolutionSerializer(serializers.ModelSerializer):
         if value > 100:
             raise ValidationError("Grade cannot exceed 100.")
         return value
+
+
+class GradeItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    grade = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100
+    )
+
+
+class BulkGradeSerializer(serializers.Serializer):
+    # Items are validated one by one, so that invalid ones can be reported
+    # next to the others.
+    grades = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=1000
+    )
+    mode = serializers.ChoiceField(choices=grading.MODES, default=grading.ATOMIC)
@@ -0,0 +1,204 @@
+from collections import Counter
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from schools.models import Class
+from schools.summary import adjust_school_summary, rebuild_school_summary_on_commit
+
+from .averages import rebuild_student_averages, record_grade_changes
+from .grading import GradeChange, grades_changed
+from .models import Assignment, Solution
+from .stats import forget_assignment_stats, forget_class_stats, forget_stats
+
+
+def assignment_school_id(assignment_id):
+    return (
+        Assignment.objects.filter(pk=assignment_id)
+        .values_list("class_obj__school_id", flat=True)
+        .first()
+    )
+
+
+@receiver(pre_save, sender=Assignment)
+def remember_previous_assignment_school(sender, instance, **kwargs):
+    instance._previous_school_id = None
+    if instance.pk:
+        instance._previous_school_id = assignment_school_id(instance.pk)
+
+
+@receiver(post_save, sender=Assignment)
+def summarize_assignment_saved(sender, instance, created, **kwargs):
+    school_id = instance.class_obj.school_id
+    if created:
+        adjust_school_summary(school_id, assignments=1)
+    elif instance._previous_school_id != school_id:
+        # Its solutions moved along with it.
+        rebuild_school_summary_on_commit(instance._previous_school_id, school_id)
+
+
+@receiver(post_delete, sender=Assignment)
+def summarize_assignment_deleted(sender, instance, **kwargs):
+    adjust_school_summary(instance.class_obj.school_id, assignments=-1)
+
+
+@receiver(pre_save, sender=Solution)
+def remember_previous_grade(sender, instance, **kwargs):
+    instance._is_new, instance._previous_grade = True, None
+    if instance.pk:
+        for grade in Solution.objects.filter(pk=instance.pk).values_list(
+            "grade", flat=True
+        ):
+            instance._is_new, instance._previous_grade = False, grade
+
+
+@receiver(post_save, sender=Solution)
+def summarize_solution_saved(sender, instance, created, **kwargs):
+    if created or instance._is_new:
+        if instance.grade is None:
+            adjust_school_summary(
+                assignment_school_id(instance.assignment_id), ungraded_solutions=1
+            )
+    elif instance._previous_grade != instance.grade:
+        grades_changed.send(
+            sender=Solution,
+            changes=[
+                GradeChange(
+                    instance.pk,
+                    instance.assignment_id,
+                    instance.student_id,
+                    instance._previous_grade,
+                    instance.grade,
+                )
+            ],
+        )
+
+
+@receiver(grades_changed, sender=Solution)
+def summarize_grades_changed(sender, changes, **kwargs):
+    deltas = Counter()
+    for change in changes:
+        deltas[change.assignment_id] += (change.grade is None) - (
+            change.previous is None
+        )
+    school_deltas = Counter()
+    for assignment_id, school_id in Assignment.objects.filter(
+        pk__in=[assignment_id for assignment_id, delta in deltas.items() if delta]
+    ).values_list("pk", "class_obj__school_id"):
+        school_deltas[school_id] += deltas[assignment_id]
+    for school_id, delta in school_deltas.items():
+        adjust_school_summary(school_id, ungraded_solutions=delta)
+
+
+@receiver(post_delete, sender=Solution)
+def summarize_solution_deleted(sender, instance, **kwargs):
+    if instance.grade is None:
+        adjust_school_summary(
+            assignment_school_id(instance.assignment_id), ungraded_solutions=-1
+        )
+
+
+@receiver(grades_changed, sender=Solution)
+def forget_graded_stats(sender, changes, **kwargs):
+    forget_assignment_stats({change.assignment_id for change in changes})
+
+
+@receiver(post_save, sender=Solution)
+def forget_submitted_stats(sender, instance, created, **kwargs):
+    if created or instance._is_new:
+        forget_assignment_stats([instance.assignment_id])
+
+
+@receiver(post_delete, sender=Solution)
+def forget_withdrawn_stats(sender, instance, **kwargs):
+    forget_assignment_stats([instance.assignment_id])
+
+
+@receiver(post_save, sender=Assignment)
+def forget_assignment_saved_stats(sender, instance, created, **kwargs):
+    # Its maximum grade or class may have changed.
+    school_id = instance.class_obj.school_id
+    forget_stats(
+        [(instance.pk, school_id)],
+        school_ids=[instance._previous_school_id],
+    )
+
+
+@receiver(post_delete, sender=Assignment)
+def forget_assignment_deleted_stats(sender, instance, **kwargs):
+    forget_stats([(instance.pk, instance.class_obj.school_id)])
+
+
+@receiver(m2m_changed, sender=Class.students.through)
+def forget_enrollment_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    # Enrollment changes the submission rates of the assignments of the class.
+    if reverse:
+        # ``instance`` is the student, ``pk_set`` its classes.
+        if action == "pre_clear":
+            instance._cleared_class_ids = list(
+                instance.class_students.values_list("id", flat=True)
+            )
+        elif action == "post_clear":
+            forget_class_stats(getattr(instance, "_cleared_class_ids", ()))
+        elif action in ("post_add", "post_remove"):
+            forget_class_stats(pk_set)
+    elif action in ("post_add", "post_remove", "post_clear"):
+        forget_class_stats([instance.pk])
+
+
+@receiver(grades_changed, sender=Solution)
+def average_grades_changed(sender, changes, **kwargs):
+    record_grade_changes(changes)
+
+
+@receiver(post_save, sender=Solution)
+def average_graded_submission(sender, instance, created, **kwargs):
+    # Grade changes of saved solutions come through grades_changed.
+    if (created or instance._is_new) and instance.grade is not None:
+        record_grade_changes(
+            [
+                GradeChange(
+                    instance.pk,
+                    instance.assignment_id,
+                    instance.student_id,
+                    None,
+                    instance.grade,
+                )
+            ]
+        )
+
+
+@receiver(post_delete, sender=Solution)
+def average_deleted_solution(sender, instance, **kwargs):
+    if instance.grade is not None:
+        record_grade_changes(
+            [
+                GradeChange(
+                    instance.pk,
+                    instance.assignment_id,
+                    instance.student_id,
+                    instance.grade,
+                    None,
+                )
+            ]
+        )
+
+
+@receiver(pre_save, sender=Assignment)
+def remember_previous_placement(sender, instance, **kwargs):
+    instance._previous_placement = None
+    if instance.pk:
+        instance._previous_placement = (
+            Assignment.objects.filter(pk=instance.pk)
+            .values_list("class_obj_id", "lesson_id")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Assignment)
+def average_moved_assignment(sender, instance, created, **kwargs):
+    # Its graded solutions now count for another class or lesson.
+    placement = (instance.class_obj_id, instance.lesson_id)
+    previous = instance._previous_placement
+    if not created and previous is not None and previous != placement:
+        rebuild_student_averages([previous, placement])
@@ -0,0 +1,229 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Assignment
+
+PERCENTILES = (10, 25, 50, 75, 90)
+BUCKETS = 10
+
+ASSIGNMENT_KEY = "assignment-stats:{}:{}"
+ASSIGNMENT_VERSION_KEY = "assignment-stats-version:{}"
+SCHOOL_KEY = "school-assignment-stats:{}:{}"
+SCHOOL_VERSION_KEY = "school-assignment-stats-version:{}"
+
+# The maximum grade of an assignment, how many students its class has, how
+# many of them submitted a solution and the best grade of every one of them
+# whose solutions were graded.
+ASSIGNMENT_STATS_SQL = """
+    SELECT assignment.grade,
+           (SELECT count(*) FROM schools_class_students AS enrollment
+            WHERE enrollment.class_id = assignment.class_obj_id) AS enrolled,
+           (SELECT count(DISTINCT solution.student_id)
+            FROM assignments_solution AS solution
+            JOIN schools_class_students AS enrollment
+              ON enrollment.class_id = assignment.class_obj_id
+             AND enrollment.user_id = solution.student_id
+            WHERE solution.assignment_id = assignment.id) AS submitted,
+           ARRAY(SELECT max(solution.grade)
+                 FROM assignments_solution AS solution
+                 JOIN schools_class_students AS enrollment
+                   ON enrollment.class_id = assignment.class_obj_id
+                  AND enrollment.user_id = solution.student_id
+                 WHERE solution.assignment_id = assignment.id
+                   AND solution.grade IS NOT NULL
+                 GROUP BY solution.student_id) AS grades
+    FROM assignments_assignment AS assignment
+    WHERE assignment.id = %(assignment_id)s
+"""
+
+# The same over every assignment of a school, counting submissions per enrolled
+# student and assignment and turning grades into percentages of the maximum
+# grades.
+SCHOOL_STATS_SQL = """
+    WITH school_assignment AS (
+        SELECT assignment.id, assignment.class_obj_id, assignment.grade
+        FROM assignments_assignment AS assignment
+        JOIN schools_class AS school_class ON school_class.id = assignment.class_obj_id
+        WHERE school_class.school_id = %(school_id)s
+    )
+    SELECT (SELECT count(*) FROM school_assignment) AS assignments,
+           (SELECT count(*) FROM school_assignment
+            JOIN schools_class_students AS enrollment
+              ON enrollment.class_id = school_assignment.class_obj_id) AS expected,
+           (SELECT count(DISTINCT (solution.assignment_id, solution.student_id))
+            FROM school_assignment
+            JOIN schools_class_students AS enrollment
+              ON enrollment.class_id = school_assignment.class_obj_id
+            JOIN assignments_solution AS solution
+              ON solution.assignment_id = school_assignment.id
+             AND solution.student_id = enrollment.user_id) AS submitted,
+           ARRAY(SELECT max(solution.grade) * 100 / school_assignment.grade
+                 FROM school_assignment
+                 JOIN schools_class_students AS enrollment
+                   ON enrollment.class_id = school_assignment.class_obj_id
+                 JOIN assignments_solution AS solution
+                   ON solution.assignment_id = school_assignment.id
+                  AND solution.student_id = enrollment.user_id
+                 WHERE solution.grade IS NOT NULL AND school_assignment.grade > 0
+                 GROUP BY school_assignment.id, solution.student_id,
+                          school_assignment.grade) AS scores
+"""
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+def distribution(values, upper):
+    """
+    Describe ``values`` with NumPy: count, mean, standard deviation, extremes,
+    percentiles and a histogram of ``BUCKETS`` equal buckets from 0 to
+    ``upper``, where values out of that range fall in the first or last one.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    upper = float(upper) if upper and upper > 0 else 1.0
+    counts, edges = np.histogram(
+        np.clip(values, 0, upper), bins=BUCKETS, range=(0, upper)
+    )
+    histogram = [
+        {"from": _round(start), "to": _round(end), "count": int(count)}
+        for start, end, count in zip(edges, edges[1:], counts)
+    ]
+    if not values.size:
+        return {
+            "graded": 0,
+            "mean": None,
+            "median": None,
+            "std": None,
+            "min": None,
+            "max": None,
+            "percentiles": {f"p{rank}": None for rank in PERCENTILES},
+            "histogram": histogram,
+        }
+
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        "graded": int(values.size),
+        "mean": _round(values.mean()),
+        "median": _round(np.median(values)),
+        "std": _round(values.std()),
+        "min": _round(values.min()),
+        "max": _round(values.max()),
+        "percentiles": {
+            f"p{rank}": _round(value) for rank, value in zip(PERCENTILES, percentiles)
+        },
+        "histogram": histogram,
+    }
+
+
+def _rate(part, whole):
+    return _round(part / whole) if whole else None
+
+
+def compute_assignment_stats(assignment_id):
+    with connection.cursor() as cursor:
+        cursor.execute(ASSIGNMENT_STATS_SQL, {"assignment_id": assignment_id})
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    max_grade, enrolled, submitted, grades = row
+    return {
+        "assignment": assignment_id,
+        "max_grade": _round(max_grade),
+        "enrolled": enrolled,
+        "submitted": submitted,
+        "submission_rate": _rate(submitted, enrolled),
+        **distribution(grades, max_grade),
+    }
+
+
+def compute_school_stats(school_id):
+    with connection.cursor() as cursor:
+        cursor.execute(SCHOOL_STATS_SQL, {"school_id": school_id})
+        assignments, expected, submitted, scores = cursor.fetchone()
+    return {
+        "school": school_id,
+        "assignments": assignments,
+        "expected": expected,
+        "submitted": submitted,
+        "submission_rate": _rate(submitted, expected),
+        **distribution(scores, 100),
+    }
+
+
+def _version(version_key):
+    cache.add(version_key, 0, None)
+    return cache.get(version_key)
+
+
+def _cached(key, version_key, object_id, compute):
+    # The version is read before computing: statistics computed while a grade
+    # changes land under the version that change retires.
+    key = key.format(object_id, _version(version_key.format(object_id)))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute(object_id)
+        cache.set(key, stats, settings.ASSIGNMENT_STATS_TIMEOUT)
+    return stats
+
+
+def assignment_stats(assignment_id):
+    """
+    Return the grade distribution and submission rate of an assignment, cached
+    until one of its grades, solutions or students changes.
+    """
+    return _cached(
+        ASSIGNMENT_KEY,
+        ASSIGNMENT_VERSION_KEY,
+        assignment_id,
+        compute_assignment_stats,
+    )
+
+
+def school_stats(school_id):
+    """
+    Return the distribution of every grade of a school, as percentages of the
+    maximum grades, and the rate of expected solutions that were submitted.
+    """
+    return _cached(SCHOOL_KEY, SCHOOL_VERSION_KEY, school_id, compute_school_stats)
+
+
+def _bump(version_keys):
+    for version_key in version_keys:
+        cache.add(version_key, 0, None)
+        cache.incr(version_key)
+
+
+def forget_stats(assignments=(), school_ids=()):
+    """
+    Retire the cached statistics of ``assignments``, ``(id, school_id)``
+    pairs, of their schools and of ``school_ids`` once the transaction
+    commits.
+    """
+    version_keys = set()
+    for assignment_id, school_id in assignments:
+        version_keys.add(ASSIGNMENT_VERSION_KEY.format(assignment_id))
+        version_keys.add(SCHOOL_VERSION_KEY.format(school_id))
+    for school_id in school_ids:
+        if school_id is not None:
+            version_keys.add(SCHOOL_VERSION_KEY.format(school_id))
+    if version_keys:
+        transaction.on_commit(lambda: _bump(version_keys))
+
+
+def forget_assignment_stats(assignment_ids):
+    forget_stats(
+        Assignment.objects.filter(pk__in=assignment_ids).values_list(
+            "pk", "class_obj__school_id"
+        )
+    )
+
+
+def forget_class_stats(class_ids):
+    forget_stats(
+        Assignment.objects.filter(class_obj_id__in=class_ids).values_list(
+            "pk", "class_obj__school_id"
+        )
+    )
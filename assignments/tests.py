@@ -0,0 +1,351 @@
+import io
+from datetime import timedelta
+
+from django.contrib.auth.models import Group
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from schools.models import Class, Lesson, School
+from users.models import User
+
+from .models import Assignment, Solution, StudentAverage
+from .stats import distribution
+
+
+def create_user(username, national_id, group):
+    user = User.objects.create_user(
+        username=username,
+        password="p",
+        email=f"{username}@b.com",
+        national_id=national_id,
+    )
+    user.groups.add(Group.objects.get_or_create(name=group)[0])
+    return user
+
+
+class AssignmentAccessTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.teacher = create_user("teacher", "1000000001", "teacher")
+        self.student = create_user("student", "1000000002", "student")
+        self.outsider = create_user("outsider", "1000000003", "student")
+
+        school = School.objects.create(name="School", location=Point(10.0, 20.0))
+        self.classroom = Class.objects.create(
+            name="7A", school=school, teacher=self.teacher
+        )
+        self.classroom.students.add(self.student)
+        lesson = Lesson.objects.create(name="Math")
+        self.classroom.lessons.add(lesson)
+        self.assignment = Assignment.objects.create(
+            title="Homework",
+            grade=20,
+            deadline=timezone.now().date() + timedelta(days=7),
+            lesson=lesson,
+            class_obj=self.classroom,
+        )
+        self.solution = Solution.objects.create(
+            context="42", student=self.student, assignment=self.assignment
+        )
+
+    def test_retrieve_authorizes_in_the_loading_query(self):
+        self.client.force_authenticate(user=self.teacher)
+        url = reverse("assignment-detail", args=[self.assignment.id])
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assignment_loads = [
+            query["sql"]
+            for query in queries.captured_queries
+            if 'FROM "assignments_assignment"' in query["sql"]
+        ]
+        self.assertEqual(len(assignment_loads), 1)
+
+    def test_invisible_assignment_is_not_found(self):
+        self.client.force_authenticate(user=self.outsider)
+        url = reverse("assignment-detail", args=[self.assignment.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_grading_waits_for_the_deadline(self):
+        self.client.force_authenticate(user=self.teacher)
+        url = reverse("solution-grade", args=[self.solution.id])
+        response = self.client.post(url, {"grade": 18}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        Assignment.objects.filter(pk=self.assignment.pk).update(
+            deadline=timezone.now().date() - timedelta(days=1)
+        )
+        response = self.client.post(url, {"grade": 18}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.solution.refresh_from_db()
+        self.assertEqual(self.solution.grade, 18)
+
+    def test_students_cannot_grade(self):
+        Assignment.objects.filter(pk=self.assignment.pk).update(
+            deadline=timezone.now().date() - timedelta(days=1)
+        )
+        self.client.force_authenticate(user=self.student)
+        url = reverse("solution-grade", args=[self.solution.id])
+        response = self.client.post(url, {"grade": 20}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_only_enrolled_students_submit_solutions(self):
+        data = {"assignment_id": self.assignment.id, "context": "43"}
+        self.client.force_authenticate(user=self.outsider)
+        response = self.client.post(reverse("solution-list"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.student)
+        response = self.client.post(reverse("solution-list"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_grading(self):
+        Assignment.objects.filter(pk=self.assignment.pk).update(
+            deadline=timezone.now().date() - timedelta(days=1)
+        )
+        other = Solution.objects.create(
+            context="41", student=self.outsider, assignment=self.assignment
+        )
+        self.client.force_authenticate(user=self.teacher)
+        url = reverse("solution-grade-bulk")
+        grades = [
+            {"id": self.solution.id, "grade": "18.5"},
+            {"id": other.id, "grade": 150},
+            {"id": 0, "grade": 10},
+        ]
+
+        response = self.client.post(url, {"grades": grades}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["skipped", "invalid", "not_found"],
+        )
+        self.solution.refresh_from_db()
+        self.assertIsNone(self.solution.grade)
+
+        data = {"grades": grades, "mode": "best_effort"}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["graded"], 1)
+        self.solution.refresh_from_db()
+        self.assertEqual(float(self.solution.grade), 18.5)
+
+    def test_bulk_grading_checks_deadline(self):
+        self.client.force_authenticate(user=self.teacher)
+        data = {"grades": [{"id": self.solution.id, "grade": 10}]}
+        response = self.client.post(reverse("solution-grade-bulk"), data, format="json")
+        self.assertEqual(response.data["results"][0]["status"], "forbidden")
+
+
+class AssignmentStatsTests(APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher = create_user("teacher", "1000000001", "teacher")
+        self.manager = create_user("manager", "1000000002", "manager")
+        self.students = [
+            create_user(f"student{i}", f"200000000{i}", "student") for i in range(3)
+        ]
+
+        self.school = School.objects.create(
+            name="School", location=Point(10.0, 20.0), manager=self.manager
+        )
+        classroom = Class.objects.create(
+            name="7A", school=self.school, teacher=self.teacher
+        )
+        classroom.students.add(*self.students)
+        self.assignment = Assignment.objects.create(
+            title="Homework",
+            grade=20,
+            deadline=timezone.now().date() - timedelta(days=1),
+            lesson=Lesson.objects.create(name="Math"),
+            class_obj=classroom,
+        )
+        for student, grade in zip(self.students, [10, 20]):
+            Solution.objects.create(
+                context="42", student=student, assignment=self.assignment, grade=grade
+            )
+
+    def get_stats(self):
+        url = reverse("assignment-stats", args=[self.assignment.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_distribution(self):
+        stats = distribution([10, 20, 20, 30], 40)
+        self.assertEqual(stats["mean"], 20.0)
+        self.assertEqual(stats["median"], 20.0)
+        self.assertEqual(stats["std"], 7.07)
+        self.assertEqual(stats["percentiles"]["p25"], 17.5)
+        self.assertEqual(
+            [bucket["count"] for bucket in stats["histogram"]],
+            [0, 0, 1, 0, 0, 2, 0, 1, 0, 0],
+        )
+        self.assertIsNone(distribution([], 40)["mean"])
+
+    def test_stats_follow_grade_changes(self):
+        self.client.force_authenticate(user=self.teacher)
+        stats = self.get_stats()
+        self.assertEqual((stats["enrolled"], stats["submitted"]), (3, 2))
+        self.assertEqual(stats["submission_rate"], 0.67)
+        self.assertEqual((stats["graded"], stats["mean"], stats["std"]), (2, 15.0, 5.0))
+        self.assertEqual(stats["histogram"][5]["count"], 1)
+        self.assertEqual(stats["histogram"][-1]["count"], 1)
+
+        solution = Solution.objects.create(
+            context="43", student=self.students[2], assignment=self.assignment
+        )
+        self.assertEqual(self.get_stats()["submitted"], 3)
+        url = reverse("solution-grade", args=[solution.id])
+        self.client.post(url, {"grade": 18}, format="json")
+        stats = self.get_stats()
+        self.assertEqual((stats["graded"], stats["median"]), (3, 18.0))
+
+        self.client.force_authenticate(user=self.students[0])
+        url = reverse("assignment-stats", args=[self.assignment.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_school_stats(self):
+        self.client.force_authenticate(user=self.manager)
+        url = reverse("school-assignment-stats", args=[self.school.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data["expected"], response.data["submitted"]), (3, 2)
+        )
+        self.assertEqual(response.data["mean"], 75.0)
+
+        url = reverse("solution-grade-bulk")
+        solution = Solution.objects.get(student=self.students[0])
+        self.client.force_authenticate(user=self.teacher)
+        self.client.post(
+            url, {"grades": [{"id": solution.id, "grade": 20}]}, format="json"
+        )
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(
+            reverse("school-assignment-stats", args=[self.school.id])
+        )
+        self.assertEqual(response.data["mean"], 100.0)
+
+    def test_stats_leave_out_former_students(self):
+        self.assignment.class_obj.students.remove(self.students[0])
+        self.client.force_authenticate(user=self.teacher)
+        stats = self.get_stats()
+        self.assertEqual((stats["enrolled"], stats["submitted"]), (2, 1))
+        self.assertEqual((stats["graded"], stats["mean"]), (1, 20.0))
+
+        self.client.force_authenticate(user=self.manager)
+        url = reverse("school-assignment-stats", args=[self.school.id])
+        response = self.client.get(url)
+        self.assertEqual(
+            (response.data["expected"], response.data["submitted"]), (2, 1)
+        )
+        self.assertEqual((response.data["graded"], response.data["mean"]), (1, 100.0))
+
+
+class StudentAverageTests(APITestCase):
+    def setUp(self):
+        self.teacher = create_user("teacher", "1000000001", "teacher")
+        self.first, self.second = [
+            create_user(f"student{i}", f"200000000{i}", "student") for i in range(2)
+        ]
+        school = School.objects.create(name="School", location=Point(10.0, 20.0))
+        self.classroom = Class.objects.create(
+            name="7A", school=school, teacher=self.teacher
+        )
+        self.classroom.students.add(self.first, self.second)
+        self.math = Lesson.objects.create(name="Math")
+        self.art = Lesson.objects.create(name="Art")
+        self.quiz, self.exam = [
+            Assignment.objects.create(
+                title=title,
+                grade=20,
+                deadline=timezone.now().date() - timedelta(days=1),
+                lesson=self.math,
+                class_obj=self.classroom,
+            )
+            for title in ("Quiz", "Exam")
+        ]
+
+    def submit(self, student, assignment, grade=None):
+        return Solution.objects.create(
+            context="42", student=student, assignment=assignment, grade=grade
+        )
+
+    def average(self, student, lesson):
+        return (
+            StudentAverage.objects.filter(student=student, lesson=lesson)
+            .values_list("grade_sum", "graded", "average")
+            .first()
+        )
+
+    def test_averages_follow_grades(self):
+        self.submit(self.first, self.quiz, 10)
+        solution = self.submit(self.first, self.exam)
+        self.assertEqual(self.average(self.first, self.math), (10, 1, 10))
+
+        solution.grade = 15
+        solution.save()
+        self.assertEqual(self.average(self.first, self.math), (25, 2, 12.5))
+
+        self.client.force_authenticate(user=self.teacher)
+        data = {"grades": [{"id": solution.id, "grade": 20}]}
+        self.client.post(reverse("solution-grade-bulk"), data, format="json")
+        self.assertEqual(self.average(self.first, self.math), (30, 2, 15))
+
+        solution.refresh_from_db()
+        solution.delete()
+        self.assertEqual(self.average(self.first, self.math), (10, 1, 10))
+
+        self.exam.lesson = self.art
+        self.exam.save()
+        self.submit(self.first, self.exam, 16)
+        self.quiz.lesson = self.art
+        self.quiz.save()
+        self.assertEqual(self.average(self.first, self.art), (26, 2, 13))
+        self.assertIsNone(self.average(self.first, self.math))
+        call_command("rebuild_student_averages", "--check", stdout=io.StringIO())
+
+    def test_rankings(self):
+        self.submit(self.first, self.quiz, 10)
+        self.submit(self.second, self.quiz, 18)
+        self.submit(self.second, self.exam, 12)
+        self.client.force_authenticate(user=self.teacher)
+
+        url = reverse("class-rankings", args=[self.classroom.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["student"], row["average"], row["rank"]) for row in response.data],
+            [(self.second.id, 15, 1), (self.first.id, 10, 2)],
+        )
+
+        self.submit(self.first, self.exam, 20)
+        response = self.client.get(url, {"lesson": self.math.id})
+        self.assertEqual([row["rank"] for row in response.data], [1, 1])
+
+        self.client.force_authenticate(user=self.first)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_checker_reports_drift(self):
+        self.submit(self.first, self.quiz, 10)
+        StudentAverage.objects.update(grade_sum=12)
+
+        output = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_student_averages", "--check", stdout=output)
+        self.assertIn(f"Student {self.first.id}", output.getvalue())
+
+        call_command("rebuild_student_averages", stdout=io.StringIO())
+        self.assertEqual(self.average(self.first, self.math), (10, 1, 10))
@@ -5,46 +5,65 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from schools.expansions import class_expansions, class_prefetch
 from schools.models import Lesson
+from users.authorization import get_authorization_context
+from users.identity import SharedObjectMixin
 from users.models import User
 
+from . import grading, stats
+from .access import assignment_access, solution_access
 from .models import Assignment, Solution
 from .permissions import *
 from .serializers import *
 
 
-class AssignmentViewSet(viewsets.ModelViewSet):
+class AssignmentViewSet(SharedObjectMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all().order_by("created_at")
     serializer_class = AssignmentSerializer
 
     def get_permissions(self):
         if self.action in ["retrieve", "list"]:
-            permission_classes = [CanViewAssignment]
+            permission_classes = [IsAuthenticated, CanViewAssignment]
         elif self.action == "create":
-            permission_classes = [IsTeacherOfLesson]
+            permission_classes = [IsAuthenticated, IsTeacherOfLesson]
         elif self.action in ["update", "partial_update"]:
-            permission_classes = [CanUpdateAssignment]
+            permission_classes = [IsAuthenticated, CanUpdateAssignment]
         elif self.action == "add_answer":
-            permission_classes = [CanAddAnswer]
+            permission_classes = [IsAuthenticated, CanAddAnswer]
+        elif self.action == "stats":
+            permission_classes = [IsAuthenticated, CanViewAssignmentStats]
         else:
             permission_classes = [IsAuthenticated]
-        return [permission() for permission in self.permission_classes]
+        return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        user = self.request.user
-
-        if is_in_group(user, "teacher"):
-            return Assignment.objects.filter(class_obj__teacher=user).order_by(
-                "created_at"
+        return (
+            self.get_visible_assignments()
+            .annotate(**assignment_access(self.request.user))
+            .select_related("lesson")
+            .prefetch_related(
+                class_prefetch("class_obj", class_expansions(self.request))
             )
-        elif is_in_group(user, "student"):
-            return Assignment.objects.filter(class_obj__students=user).order_by(
-                "created_at"
-            )
-        elif is_in_group(user, "manager"):
-            if hasattr(user, "school_manager"):
-                school = user.school_manager
-                return Assignment.objects.filter(class_obj__school=school)
+        )
+
+    def get_visible_assignments(self):
+        user = self.request.user
+        context = get_authorization_context(user)
+
+        if context.has_role("teacher"):
+            return Assignment.objects.filter(
+                class_obj_id__in=context.taught_class_ids
+            ).order_by("created_at")
+        elif context.has_role("student"):
+            return Assignment.objects.filter(
+                class_obj_id__in=context.enrolled_class_ids
+            ).order_by("created_at")
+        elif context.has_role("manager"):
+            if context.managed_school_id:
+                return Assignment.objects.filter(
+                    class_obj__school_id=context.managed_school_id
+                )
         if user.is_staff:
             return Assignment.objects.all()
 
@@ -130,6 +149,50 @@ class AssignmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
+    @swagger_auto_schema(
+        operation_summary="Grade statistics of an assignment",
+        operation_description="Returns the distribution of the best grade of every "
+        "graded student (mean, median, standard deviation, extremes, percentiles and "
+        "a histogram of ten buckets from 0 to the maximum grade) and the share of the "
+        "class that submitted a solution. Available to the class teacher, the school "
+        "manager and admins; cached until a grade, solution or student changes.",
+        responses={
+            200: openapi.Response(
+                description="Success",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    example={
+                        "assignment": 1,
+                        "max_grade": 20.0,
+                        "enrolled": 30,
+                        "submitted": 27,
+                        "submission_rate": 0.9,
+                        "graded": 25,
+                        "mean": 14.2,
+                        "median": 15.0,
+                        "std": 3.1,
+                        "min": 6.0,
+                        "max": 20.0,
+                        "percentiles": {
+                            "p10": 9.5,
+                            "p25": 12.0,
+                            "p50": 15.0,
+                            "p75": 17.0,
+                            "p90": 18.5,
+                        },
+                        "histogram": [{"from": 0.0, "to": 2.0, "count": 0}],
+                    },
+                ),
+            ),
+        },
+    )
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        assignment = self.get_object()
+        return Response(
+            stats.assignment_stats(assignment.pk), status=status.HTTP_200_OK
+        )
+
 
 class SolutionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -144,29 +207,40 @@ class SolutionViewSet(viewsets.ModelViewSet):
         return super().get_serializer_class()
 
     def get_queryset(self):
+        return self.get_visible_solutions().annotate(
+            **solution_access(self.request.user)
+        )
+
+    def get_visible_solutions(self):
         user = self.request.user
+        context = get_authorization_context(user)
 
-        if is_in_group(user, "teacher"):
-            return Solution.objects.filter(assignment__class_obj__teacher=user)
+        if context.has_role("teacher"):
+            return Solution.objects.filter(
+                assignment__class_obj_id__in=context.taught_class_ids
+            )
 
-        elif is_in_group(user, "student"):
+        elif context.has_role("student"):
             return Solution.objects.filter(student=user)
-        elif is_in_group(user, "manager") and hasattr(user, "school_manager"):
-            school = user.school_manager
-            return Solution.objects.filter(assignment__class_obj__school=school)
+        elif context.has_role("manager") and context.managed_school_id:
+            return Solution.objects.filter(
+                assignment__class_obj__school_id=context.managed_school_id
+            )
 
         return Solution.objects.none()
 
     def get_permissions(self):
         if self.action == "create":
-            permission_classes = [IsStudentOfAssignment]
+            permission_classes = [IsAuthenticated, IsStudentOfAssignment]
         elif self.action in ["update", "partial_update"]:
-            permission_classes = [CanUpdateOwnSolution]
+            permission_classes = [IsAuthenticated, CanUpdateOwnSolution]
         elif self.action == "grade":
-            permission_classes = [CanGradeSolution]
+            permission_classes = [IsAuthenticated, CanGradeSolution]
+        elif self.action == "grade_bulk":
+            permission_classes = [IsAuthenticated, IsTeacher]
         else:
-            permission_classes = [CanViewSolution]
-        return [permission() for permission in self.permission_classes]
+            permission_classes = [IsAuthenticated, CanViewSolution]
+        return [permission() for permission in permission_classes]
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -236,16 +310,17 @@ class SolutionViewSet(viewsets.ModelViewSet):
         Request Body: {"grade": 75}
         """
         try:
-            solution = Solution.objects.get(pk=pk)
+            solution = self.get_object()
             grade = request.data.get("grade")
-            self.check_object_permissions(request, solution)
             if grade is None:
                 return Response(
                     {"detail": "The grade must be provided."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            solution.grade = grade
+            grade_serializer = TeacherGradeSolutionSerializer(data=request.data)
+            grade_serializer.is_valid(raise_exception=True)
+            solution.grade = grade_serializer.validated_data["grade"]
             solution.save()
             serializer = TeacherGradeSolutionSerializer(solution)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -253,6 +328,73 @@ class SolutionViewSet(viewsets.ModelViewSet):
         except Solution.DoesNotExist:
             return Response({"detail": "The solution not found."}, status=404)
 
+    @swagger_auto_schema(
+        operation_summary="Grade many solutions",
+        operation_description="Sets the grade of every `{id, grade}` of `grades`. "
+        "Only the teacher of the class can grade, once the deadline has passed. "
+        "Every item gets a status: `graded`, `invalid`, `duplicate`, `not_found`, "
+        "`forbidden`, or `skipped` when an `atomic` request (the default) failed "
+        "because of other items. In `best_effort` mode the valid items are graded "
+        "whatever happens to the others.",
+        request_body=BulkGradeSerializer,
+        responses={
+            200: openapi.Response(
+                description="Success",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    example={"graded": 1, "results": [{"id": 1, "status": "graded"}]},
+                ),
+            ),
+            400: openapi.Response(
+                description="Nothing was graded",
+                schema=openapi.Schema(type=openapi.TYPE_OBJECT),
+            ),
+        },
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="grade-bulk",
+        url_name="grade-bulk",
+    )
+    def grade_bulk(self, request):
+        serializer = BulkGradeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        mode = serializer.validated_data["mode"]
+
+        results, items, positions = [], [], []
+        for item in serializer.validated_data["grades"]:
+            item_serializer = GradeItemSerializer(data=item)
+            if item_serializer.is_valid():
+                positions.append(len(results))
+                items.append(item_serializer.validated_data)
+                results.append(None)
+            else:
+                results.append(
+                    {
+                        "id": item.get("id"),
+                        "status": grading.INVALID,
+                        "errors": item_serializer.errors,
+                    }
+                )
+
+        # An invalid item fails an atomic request, but the others are still
+        # checked so that every failure is reported at once.
+        graded = grading.grade_solutions(
+            self.get_queryset(),
+            items,
+            mode,
+            dry_run=mode == grading.ATOMIC and len(items) < len(results),
+        )
+        for position, result in zip(positions, graded):
+            results[position] = result
+
+        count = sum(result["status"] == grading.GRADED for result in results)
+        return Response(
+            {"graded": count, "results": results},
+            status=status.HTTP_200_OK if count else status.HTTP_400_BAD_REQUEST,
+        )
+
     @action(
         detail=False,
         methods=["get"],
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import Group
 from rest_framework.permissions import BasePermission
 
+from users.authorization import get_authorization_context, has_role
+
 from .models import Class, School
 
 
@@ -16,7 +18,7 @@ class AnyOf(BasePermission):
 
 
 def user_in_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return has_role(user, group_name)
 
 
 class IsTeacher(BasePermission):
@@ -94,13 +96,14 @@ class IsManagerOfSchool(BasePermission):
 
 class CanViewNews(BasePermission):
     def has_object_permission(self, request, view, obj):
-        if obj.class_obj:
-            if user_in_group(request.user, "student"):
-                return obj.class_obj.students.filter(id=request.user.id).exists()
-            elif user_in_group(request.user, "teacher"):
-                return obj.class_obj.teacher == request.user
-            elif user_in_group(request.user, "manager"):
-                return obj.class_obj.school.manager == request.user
+        context = get_authorization_context(request.user)
+        if obj.class_obj_id:
+            if context.has_role("student"):
+                return context.is_enrolled_in(obj.class_obj_id)
+            elif context.has_role("teacher"):
+                return context.teaches(obj.class_obj_id)
+            elif context.has_role("manager"):
+                return context.manages(obj.class_obj.school_id)
         elif obj.school:
             if user_in_group(request.user, "student"):
                 return obj.school in [
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from schools.summary import adjust_school_summary, rebuild_school_summary_on_commit
+
+from .models import News
+
+
+def news_school_id(news):
+    if news.school_id is not None or news.class_obj_id is None:
+        return news.school_id
+    return news.class_obj.school_id
+
+
+@receiver(pre_save, sender=News)
+def remember_previous_news_school(sender, instance, **kwargs):
+    instance._previous_school_id = None
+    if instance.pk:
+        previous = News.objects.select_related("class_obj").filter(pk=instance.pk)
+        instance._previous_school_id = next(
+            (news_school_id(news) for news in previous), None
+        )
+
+
+@receiver(post_save, sender=News)
+def summarize_news_saved(sender, instance, created, **kwargs):
+    school_id = news_school_id(instance)
+    if created:
+        adjust_school_summary(school_id, news=1)
+    elif instance._previous_school_id != school_id:
+        rebuild_school_summary_on_commit(instance._previous_school_id, school_id)
+
+
+@receiver(post_delete, sender=News)
+def summarize_news_deleted(sender, instance, **kwargs):
+    adjust_school_summary(news_school_id(instance), news=-1)
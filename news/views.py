@@ -5,6 +5,7 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 
 from schools.models import Class, School
+from users.authorization import get_authorization_context
 
 from .models import News
 from .permissions import *
@@ -17,22 +18,27 @@ class NewsViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         queryset = News.objects.select_related("creator", "school", "class_obj")
-        if user.groups.filter(name="manager").exists():
-            school = user.school_manager
+        context = get_authorization_context(user)
+        if context.has_role("manager"):
+            school_id = context.managed_school_id
+            if school_id is None:
+                return queryset.filter(creator=user)
             return queryset.filter(
-                Q(school=school) | Q(class_obj__school=school) | Q(creator=user)
+                Q(school_id=school_id)
+                | Q(class_obj__school_id=school_id)
+                | Q(creator=user)
             )
 
-        elif user.groups.filter(name="teacher").exists():
-            class_ids = user.class_teacher.values_list("id", flat=True)
-            school_ids = user.class_teacher.values_list("school_id", flat=True)
+        elif context.has_role("teacher"):
+            class_ids = context.taught_class_ids
+            school_ids = Class.objects.filter(id__in=class_ids).values("school_id")
             return News.objects.filter(
                 Q(class_obj__in=class_ids) | Q(school_id__in=school_ids)
             )
 
-        elif user.groups.filter(name="student").exists():
-            class_ids = user.class_students.values_list("id", flat=True)
-            school_ids = user.class_students.values_list("school_id", flat=True)
+        elif context.has_role("student"):
+            class_ids = context.enrolled_class_ids
+            school_ids = Class.objects.filter(id__in=class_ids).values("school_id")
             return News.objects.filter(
                 Q(class_obj__in=class_ids) | Q(school_id__in=school_ids)
             )
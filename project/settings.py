@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     "schools",
     "news",
     "assignments",
+    "analytics",
     "mapwidgets",
 ]
 
@@ -60,6 +61,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.authorization.AuthorizationContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -100,6 +102,42 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared between workers in production (e.g. CACHE_URL=redis://redis:6379/1) so
+# that signal-driven invalidations reach every process.
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+    # Rendered school vector tiles; point TILE_CACHE_URL at a filecache:// to
+    # keep them on disk.
+    "tiles": env.cache("TILE_CACHE_URL", default="locmemcache://school-tiles"),
+}
+
+# Seconds an authorization context (roles, managed school, classes) stays cached.
+AUTHORIZATION_CONTEXT_TIMEOUT = env.int("AUTHORIZATION_CONTEXT_TIMEOUT", default=300)
+
+
+# Answer schools/nearby/ from an in-memory copy of the school locations kept by
+# each worker instead of querying PostGIS.
+SCHOOL_LOCATION_INDEX = env.bool("SCHOOL_LOCATION_INDEX", default=False)
+
+# Cache alias and lifetime (seconds) of the rendered schools/tiles/ tiles. Tiles
+# are also dropped as soon as a school inside them is added, moved or removed.
+SCHOOL_TILE_CACHE = "tiles"
+SCHOOL_TILE_TIMEOUT = env.int("SCHOOL_TILE_TIMEOUT", default=24 * 60 * 60)
+
+# Seconds a schools/autocomplete/ result is reused for the same query and area.
+SCHOOL_AUTOCOMPLETE_TIMEOUT = env.int("SCHOOL_AUTOCOMPLETE_TIMEOUT", default=30)
+
+# Upper bound, in seconds, on how long assignment statistics stay cached. Grade,
+# solution and enrollment changes already retire them.
+ASSIGNMENT_STATS_TIMEOUT = env.int("ASSIGNMENT_STATS_TIMEOUT", default=24 * 60 * 60)
+
+# Complete weeks that every scheduled rollup_analytics run aggregates again, so
+# that grades given and news edited after a week ended reach its rollups.
+ANALYTICS_ROLLUP_LOOKBACK_WEEKS = env.int("ANALYTICS_ROLLUP_LOOKBACK_WEEKS", default=4)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -139,10 +177,19 @@ USE_TZ = True
 STATIC_URL = "/static/"
 
 
+# When enabled, access tokens carry the user's roles, managed school and
+# membership version, and requests are authenticated from those claims without
+# loading the user row.
+STATELESS_JWT = env.bool("STATELESS_JWT", default=False)
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         # "rest_framework.authentication.BasicAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        (
+            "users.authentication.StatelessJWTAuthentication"
+            if STATELESS_JWT
+            else "rest_framework_simplejwt.authentication.JWTAuthentication"
+        ),
         "rest_framework.authentication.SessionAuthentication",  # for admin
     ],
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
@@ -18,7 +18,8 @@ from django.contrib import admin
 from django.urls import include, path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+from users.views import ClaimsTokenObtainPairView, ClaimsTokenRefreshView
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -39,8 +40,9 @@ urlpatterns = [
     path("schools/", include("schools.urls")),
     path("news/", include("news.urls")),
     path("assignments/", include("assignments.urls")),
-    path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("analytics/", include("analytics.urls")),
+    path("api/token/", ClaimsTokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("api/token/refresh/", ClaimsTokenRefreshView.as_view(), name="token_refresh"),
     path("schools/", include("schools.urls")),
     path(
         "swagger/",
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class SchoolsConfig(AppConfig):
     name = 'schools'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,228 @@
+import csv
+import io
+import json
+
+import numpy as np
+
+from .spatial_index import LocationArrays, haversine, load_location_entries
+
+CSV = "csv"
+GEOJSON = "geojson"
+FORMATS = (CSV, GEOJSON)
+
+# Upper bound on the points x schools distance matrix computed at once, which
+# keeps a chunk at about 32 MB of float64 whatever the number of schools.
+MAX_CELLS = 4000000
+
+
+class PointsFormatError(ValueError):
+    pass
+
+
+def guess_format(filename):
+    if filename and filename.lower().endswith((".geojson", ".json")):
+        return GEOJSON
+    return CSV
+
+
+def read_points(file, format=CSV):
+    """
+    Read ``(id, lng, lat)`` tuples from a text file.
+
+    CSV files need ``lng`` and ``lat`` columns and may have an ``id`` column;
+    GeoJSON files are FeatureCollections of Points identified by the feature
+    ``id`` or an ``id`` property. Points without an id are numbered from 1.
+    """
+    if format == GEOJSON:
+        return list(_read_geojson(file))
+    return list(_read_csv(file))
+
+
+def _read_csv(file):
+    reader = csv.DictReader(file)
+    if not reader.fieldnames or not {"lng", "lat"} <= set(reader.fieldnames):
+        raise PointsFormatError("The CSV file needs `lng` and `lat` columns.")
+    for number, row in enumerate(reader, start=1):
+        yield _point(row.get("id") or number, row["lng"], row["lat"], number)
+
+
+def _read_geojson(file):
+    try:
+        features = json.load(file)["features"]
+    except (ValueError, KeyError, TypeError):
+        raise PointsFormatError("The file is not a GeoJSON FeatureCollection.")
+    if not isinstance(features, list):
+        raise PointsFormatError("The file is not a GeoJSON FeatureCollection.")
+    for number, feature in enumerate(features, start=1):
+        if not isinstance(feature, dict):
+            raise PointsFormatError("Feature {} is not a Feature.".format(number))
+        geometry = feature.get("geometry") or {}
+        if not isinstance(geometry, dict) or geometry.get("type") != "Point":
+            raise PointsFormatError("Feature {} is not a Point.".format(number))
+        properties = feature.get("properties")
+        point_id = feature.get("id") or (
+            properties.get("id") if isinstance(properties, dict) else None
+        )
+        try:
+            lng, lat = geometry["coordinates"][:2]
+        except (KeyError, TypeError, ValueError):
+            raise PointsFormatError(
+                "Feature {} has invalid coordinates.".format(number)
+            )
+        yield _point(point_id or number, lng, lat, number)
+
+
+def _point(point_id, lng, lat, number):
+    try:
+        lng, lat = float(lng), float(lat)
+    except (TypeError, ValueError):
+        raise PointsFormatError("Point {} has invalid coordinates.".format(number))
+    if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+        raise PointsFormatError("Point {} is out of range.".format(number))
+    return point_id, lng, lat
+
+
+def _chunks(count, size):
+    for start in range(0, count, size):
+        yield slice(start, min(start + size, count))
+
+
+def assign_nearest_schools(points, max_distance=None, capacity=None, candidates=8):
+    """
+    Assign every ``(id, lng, lat)`` point to its closest school and return
+    ``(id, school_id, distance_km)`` tuples in input order; ``school_id`` and
+    ``distance_km`` are ``None`` for points left unassigned.
+
+    ``max_distance`` (kilometres) leaves points without a school that close
+    unassigned. With ``capacity`` every school takes at most that many
+    points: the ``candidates`` closest open schools of each point are
+    assigned greedily by increasing distance, and the points whose candidates
+    all filled up are tried again against the schools still open.
+
+    Distances are haversine distances on the same sphere as the ``nearest``
+    mode of ``nearby.get_nearby_school``; ties go to the lowest school id.
+    """
+    arrays = LocationArrays(load_location_entries())
+    # Columns in id order, so that argmin and the sorts below break ties by id.
+    by_id = np.argsort(arrays.ids)
+    school_ids = arrays.ids[by_id]
+    school_lngs, school_lats = arrays.lngs[by_id], arrays.lats[by_id]
+
+    count = len(points)
+    lngs = np.radians([point[1] for point in points])
+    lats = np.radians([point[2] for point in points])
+    limit = max_distance * 1000 if max_distance is not None else np.inf
+    assigned = np.full(count, -1, dtype=np.int64)
+    distances = np.full(count, np.nan)
+
+    if count and len(school_ids):
+        if capacity is None:
+            _assign_unbounded(
+                lngs, lats, school_lngs, school_lats, limit, assigned, distances
+            )
+        else:
+            _assign_with_capacity(
+                lngs,
+                lats,
+                school_lngs,
+                school_lats,
+                limit,
+                capacity,
+                candidates,
+                assigned,
+                distances,
+            )
+
+    return [
+        (
+            point[0],
+            int(school_ids[school]) if school >= 0 else None,
+            round(float(distance) / 1000, 3) if school >= 0 else None,
+        )
+        for point, school, distance in zip(points, assigned, distances)
+    ]
+
+
+def _assign_unbounded(lngs, lats, school_lngs, school_lats, limit, assigned, out):
+    for chunk in _chunks(len(lngs), max(1, MAX_CELLS // len(school_lngs))):
+        matrix = haversine(
+            lngs[chunk, None], lats[chunk, None], school_lngs, school_lats
+        )
+        best = matrix.argmin(axis=1)
+        best_distance = matrix[np.arange(len(best)), best]
+        within = best_distance <= limit
+        assigned[chunk] = np.where(within, best, -1)
+        out[chunk] = np.where(within, best_distance, np.nan)
+
+
+def _assign_with_capacity(
+    lngs,
+    lats,
+    school_lngs,
+    school_lats,
+    limit,
+    capacity,
+    candidates,
+    assigned,
+    out,
+):
+    remaining = np.full(len(school_lngs), capacity, dtype=np.int64)
+    pending = np.arange(len(lngs))
+
+    while pending.size:
+        open_schools = np.flatnonzero(remaining > 0)
+        if not open_schools.size:
+            break
+        k = min(candidates, open_schools.size)
+
+        pair_points, pair_schools, pair_distances = [], [], []
+        for chunk in _chunks(len(pending), max(1, MAX_CELLS // open_schools.size)):
+            points = pending[chunk]
+            matrix = haversine(
+                lngs[points, None],
+                lats[points, None],
+                school_lngs[open_schools],
+                school_lats[open_schools],
+            )
+            if k < open_schools.size:
+                nearest = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+            else:
+                nearest = np.broadcast_to(np.arange(k), matrix.shape)
+            nearest_distance = np.take_along_axis(matrix, nearest, axis=1)
+            within = nearest_distance <= limit
+            pair_points.append(np.broadcast_to(points[:, None], nearest.shape)[within])
+            pair_schools.append(open_schools[nearest][within])
+            pair_distances.append(nearest_distance[within])
+
+        pair_points = np.concatenate(pair_points)
+        pair_schools = np.concatenate(pair_schools)
+        pair_distances = np.concatenate(pair_distances)
+
+        for pair in np.lexsort((pair_schools, pair_points, pair_distances)):
+            point, school = pair_points[pair], pair_schools[pair]
+            if assigned[point] >= 0 or not remaining[school]:
+                continue
+            assigned[point] = school
+            out[point] = pair_distances[pair]
+            remaining[school] -= 1
+
+        # Points that had k candidates, all now full, may still have an open
+        # school further away; the others have no open school in range.
+        candidate_counts = np.bincount(pair_points, minlength=len(lngs))
+        pending = pending[(assigned[pending] < 0) & (candidate_counts[pending] == k)]
+
+
+def write_assignments(assignments, file):
+    writer = csv.writer(file)
+    writer.writerow(["id", "school_id", "distance_km"])
+    for point_id, school_id, distance in assignments:
+        if school_id is None:
+            writer.writerow([point_id, "", ""])
+        else:
+            writer.writerow([point_id, school_id, distance])
+
+
+def assignments_csv(assignments):
+    output = io.StringIO()
+    write_assignments(assignments, output)
+    return output.getvalue()
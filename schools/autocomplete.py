@@ -0,0 +1,130 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+TRIGRAM_INDEX = "schools_school_name_trgm"
+
+CACHE_KEY = "school-autocomplete:{}"
+
+# Bonus added to the trigram similarity of names starting with the query,
+# which is what a user typing a name usually wants first.
+PREFIX_BONUS = 0.5
+# With a point, up to DISTANCE_WEIGHT is added to the score of close schools;
+# the bonus halves every DISTANCE_SCALE_KM.
+DISTANCE_WEIGHT = 0.3
+DISTANCE_SCALE_KM = 10
+
+# Points are snapped to a grid of about 5 km, well under DISTANCE_SCALE_KM, so
+# that people typing in the same area share cache entries.
+LOCATION_GRID_DEG = 0.05
+# Results cached per query and point, whatever the limit asked for, which is
+# also the largest limit the autocomplete endpoint accepts.
+CACHED_RESULTS = 50
+
+# Both conditions of the WHERE clause can be answered from the trigram index:
+# ``%`` finds similar names, ILIKE finds names starting with a query that is
+# too short to share trigrams with them.
+AUTOCOMPLETE_SQL = """
+    WITH matches AS (
+        SELECT id, name, location,
+               similarity(name, %(q)s)
+               + CASE WHEN name ILIKE %(prefix)s THEN {prefix_bonus} ELSE 0 END
+               AS score
+        FROM schools_school
+        WHERE name %% %(q)s OR name ILIKE %(prefix)s
+    )
+    SELECT id, name, ST_AsGeoJSON(location) AS geojson, score, {distance} AS distance
+    FROM matches
+    ORDER BY score + {distance_bonus} DESC, id
+    LIMIT %(limit)s
+"""
+
+DISTANCE = (
+    "ST_Distance(location::geography, "
+    "ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography)"
+)
+DISTANCE_BONUS = "{weight} * power(0.5, {distance} / 1000 / {scale})"
+
+
+def build_autocomplete_sql(near):
+    distance = DISTANCE if near else "NULL::float8"
+    return AUTOCOMPLETE_SQL.format(
+        prefix_bonus=PREFIX_BONUS,
+        distance=distance,
+        distance_bonus=(
+            DISTANCE_BONUS.format(
+                weight=DISTANCE_WEIGHT, distance=distance, scale=DISTANCE_SCALE_KM
+            )
+            if near
+            else "0"
+        ),
+    )
+
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def normalize_query(q):
+    return " ".join(q.split()).lower()
+
+
+def snap(value):
+    return round(round(value / LOCATION_GRID_DEG) * LOCATION_GRID_DEG, 6)
+
+
+def cache_key(q, lng=None, lat=None):
+    """
+    Key of the results of a query near a point: the query is normalized and
+    the point snapped to ``LOCATION_GRID_DEG``.
+    """
+    if lng is not None and lat is not None:
+        lng, lat = snap(lng), snap(lat)
+    raw = "{}|{}|{}".format(normalize_query(q), lng, lat)
+    return CACHE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def autocomplete_schools(q, lng=None, lat=None, limit=10):
+    """
+    Return up to ``limit`` schools whose name matches ``q``, best first.
+
+    The score is the trigram similarity of the name, plus ``PREFIX_BONUS`` when
+    the name starts with ``q`` and, given a point, a bonus for schools close to
+    it, measured from the point snapped to ``LOCATION_GRID_DEG``. The best
+    ``CACHED_RESULTS`` are cached for ``SCHOOL_AUTOCOMPLETE_TIMEOUT`` seconds
+    per normalized query and snapped point, so the burst of requests sent
+    while a name is typed and corrected, from anywhere nearby and with any
+    limit, only reaches the database once per distinct prefix.
+    """
+    q = normalize_query(q)
+    near = lng is not None and lat is not None
+    if near:
+        lng, lat = snap(lng), snap(lat)
+    else:
+        lng = lat = None
+    key = cache_key(q, lng, lat)
+    schools = cache.get(key)
+    if schools is not None:
+        return schools[:limit]
+
+    params = {"q": q, "prefix": escape_like(q) + "%", "limit": CACHED_RESULTS}
+    if near:
+        params.update(lng=lng, lat=lat)
+    with connection.cursor() as cursor:
+        cursor.execute(build_autocomplete_sql(near), params)
+        rows = cursor.fetchall()
+
+    schools = [
+        {
+            "id": row[0],
+            "name": row[1],
+            "geometry": row[2],
+            "score": round(row[3], 3),
+            "distance_km": round(row[4] / 1000, 2) if row[4] is not None else None,
+        }
+        for row in rows
+    ]
+    cache.set(key, schools, settings.SCHOOL_AUTOCOMPLETE_TIMEOUT)
+    return schools[:limit]
@@ -0,0 +1,193 @@
+import threading
+
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.db import connection
+
+from .models import School
+
+GENERATION_KEY = "school-catchments:generation"
+
+# Zoom levels with a precomputed simplification. Requests for a zoom level in
+# between get the closest coarser one; above the last level the full-resolution
+# catchment is served.
+ZOOM_LEVELS = (4, 8, 12)
+TILE_SIZE = 256
+
+
+def simplify_tolerance(zoom):
+    """
+    Degrees covered by one pixel at ``zoom`` on the equator.
+    """
+    return 360 / (TILE_SIZE * 2**zoom)
+
+
+def zoom_level(zoom):
+    """
+    Return the precomputed zoom level to serve for ``zoom``, or ``None`` for
+    the full-resolution catchment.
+    """
+    if zoom > ZOOM_LEVELS[-1]:
+        return None
+    return max([level for level in ZOOM_LEVELS if level <= zoom] or [ZOOM_LEVELS[0]])
+
+
+DELETE_SIMPLIFIED_SQL = """
+    DELETE FROM schools_catchmentsimplification WHERE school_id = ANY(%(ids)s)
+"""
+
+INSERT_SIMPLIFIED_SQL = """
+    INSERT INTO schools_catchmentsimplification (school_id, zoom, geometry)
+    SELECT school.id, level.zoom,
+           ST_Multi(ST_SimplifyPreserveTopology(school.catchment, level.tolerance))
+    FROM schools_school AS school,
+         unnest(%(zooms)s::int[], %(tolerances)s::float8[]) AS level(zoom, tolerance)
+    WHERE school.id = ANY(%(ids)s) AND school.catchment IS NOT NULL
+"""
+
+
+def refresh_simplified_catchments(*school_ids):
+    params = {
+        "ids": list(school_ids),
+        "zooms": list(ZOOM_LEVELS),
+        "tolerances": [simplify_tolerance(zoom) for zoom in ZOOM_LEVELS],
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(DELETE_SIMPLIFIED_SQL, params)
+        cursor.execute(INSERT_SIMPLIFIED_SQL, params)
+
+
+CATCHMENTS_SQL = """
+    WITH visible AS ({visible})
+    SELECT json_build_object(
+        'type', 'FeatureCollection',
+        'features', coalesce(
+            json_agg(
+                json_build_object(
+                    'id', school.id,
+                    'type', 'Feature',
+                    'geometry', ST_AsGeoJSON(shape.geometry, 6)::json,
+                    'properties', json_build_object('name', school.name)
+                )
+                ORDER BY school.id
+            ),
+            '[]'::json
+        )
+    )::text
+    FROM schools_school AS school
+    {shape}
+    WHERE school.id IN (SELECT id FROM visible) {bbox}
+"""
+
+SIMPLIFIED_SHAPE = """
+    JOIN schools_catchmentsimplification AS shape
+      ON shape.school_id = school.id AND shape.zoom = %s
+"""
+FULL_SHAPE = """
+    CROSS JOIN LATERAL (SELECT school.catchment AS geometry) AS shape
+"""
+IN_BBOX = "AND shape.geometry && ST_MakeEnvelope(%s, %s, %s, %s, 4326)"
+
+
+def catchment_collection(queryset, zoom, bbox=None):
+    """
+    Return a GeoJSON FeatureCollection, as bytes, of the catchments of the
+    schools of ``queryset`` at the resolution served for ``zoom``, optionally
+    limited to those overlapping ``bbox`` (min_lng, min_lat, max_lng, max_lat).
+    """
+    visible_sql, params = queryset.values("pk").query.sql_with_params()
+    params = list(params)
+    level = zoom_level(zoom)
+    if level is not None:
+        params.append(level)
+    if bbox:
+        params.extend(bbox)
+
+    sql = CATCHMENTS_SQL.format(
+        visible=visible_sql,
+        shape=FULL_SHAPE if level is None else SIMPLIFIED_SHAPE,
+        bbox=IN_BBOX if bbox else "",
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0].encode()
+
+
+# Candidates come from the GiST index on the catchment bounding boxes; only the
+# exact point-in-polygon test runs in Python, against cached prepared
+# geometries.
+CANDIDATES_SQL = """
+    SELECT point.idx, school.id
+    FROM unnest(%(idx)s::int[], %(lng)s::float8[], %(lat)s::float8[])
+         AS point(idx, lng, lat)
+    JOIN schools_school AS school
+      ON school.catchment && ST_SetSRID(ST_MakePoint(point.lng, point.lat), 4326)
+"""
+
+
+class CatchmentIndex:
+    """
+    Per-worker cache of prepared catchment geometries, loaded on first use.
+    Every catchment change bumps a generation counter in the shared cache, and
+    a worker that sees a new generation drops everything it prepared.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prepared = {}
+        self._generation = None
+
+    def _current_generation(self):
+        cache.add(GENERATION_KEY, 0, None)
+        return cache.get(GENERATION_KEY)
+
+    def changed(self):
+        cache.add(GENERATION_KEY, 0, None)
+        cache.incr(GENERATION_KEY)
+
+    def prepared(self, school_ids):
+        generation = self._current_generation()
+        with self._lock:
+            if generation != self._generation:
+                self._prepared, self._generation = {}, generation
+            prepared = self._prepared
+            missing = set(school_ids) - set(prepared)
+
+        if missing:
+            loaded = {
+                school_id: catchment.prepared
+                for school_id, catchment in School.objects.filter(
+                    pk__in=missing, catchment__isnull=False
+                ).values_list("pk", "catchment")
+            }
+            with self._lock:
+                prepared.update(loaded)
+        return prepared
+
+    def lookup_many(self, points):
+        """
+        Return, for each ``(lng, lat)`` of ``points``, the ids of the schools
+        whose catchment covers it; boundaries count as inside.
+        """
+        params = {
+            "idx": list(range(len(points))),
+            "lng": [lng for lng, _ in points],
+            "lat": [lat for _, lat in points],
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(CANDIDATES_SQL, params)
+            candidates = cursor.fetchall()
+
+        prepared = self.prepared({school_id for _, school_id in candidates})
+        results = [[] for _ in points]
+        for index, school_id in sorted(candidates):
+            geometry = prepared.get(school_id)
+            if geometry is not None and geometry.covers(Point(*points[index])):
+                results[index].append(school_id)
+        return results
+
+    def lookup(self, lng, lat):
+        return self.lookup_many([(lng, lat)])[0]
+
+
+catchment_index = CatchmentIndex()
@@ -0,0 +1,223 @@
+from django.db import connection, router, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import m2m_changed
+
+from users.models import User
+
+from .models import Class
+
+ADDED = "added"
+REMOVED = "removed"
+ALREADY_ENROLLED = "already_enrolled"
+NOT_ENROLLED = "not_enrolled"
+NOT_FOUND = "not_found"
+
+Enrollment = Class.students.through
+
+
+def resolve_students(class_obj, national_ids):
+    """
+    Return ``{national_id: (user_id, enrolled)}`` for the students among
+    ``national_ids``, in one query. Unknown ids and users outside the student
+    group are left out.
+    """
+    rows = (
+        User.objects.filter(national_id__in=national_ids)
+        .annotate(
+            is_student=Exists(
+                User.groups.through.objects.filter(
+                    user_id=OuterRef("pk"), group__name="student"
+                )
+            ),
+            enrolled=Exists(
+                Enrollment.objects.filter(class_id=class_obj.pk, user_id=OuterRef("pk"))
+            ),
+        )
+        .filter(is_student=True)
+        .values_list("national_id", "pk", "enrolled")
+    )
+    return {national_id: (pk, enrolled) for national_id, pk, enrolled in rows}
+
+
+def send_students_changed(class_obj, action, user_ids):
+    # bulk_create() and queryset deletes bypass the related manager, so the
+    # receivers keeping authorization contexts and school summaries up to date
+    # are told the same way Class.students.add()/remove() would.
+    m2m_changed.send(
+        sender=Enrollment,
+        instance=class_obj,
+        action=action,
+        reverse=False,
+        model=User,
+        pk_set=set(user_ids),
+        using=router.db_for_write(Enrollment, instance=class_obj),
+    )
+
+
+def update_enrollment(class_obj, add=(), remove=()):
+    """
+    Enroll the students whose national ids are in ``add`` in ``class_obj`` and
+    unenroll those in ``remove``, with a fixed number of queries.
+
+    Return one ``{"national_id", "status"}`` result per distinct national id,
+    in request order.
+    """
+    add = list(dict.fromkeys(add))
+    remove = list(dict.fromkeys(remove))
+    students = resolve_students(class_obj, add + remove)
+
+    results, added, removed = [], [], []
+    for national_id in add:
+        if national_id not in students:
+            outcome = NOT_FOUND
+        elif students[national_id][1]:
+            outcome = ALREADY_ENROLLED
+        else:
+            outcome = ADDED
+            added.append(students[national_id][0])
+        results.append({"national_id": national_id, "status": outcome})
+    for national_id in remove:
+        if national_id not in students:
+            outcome = NOT_FOUND
+        elif not students[national_id][1]:
+            outcome = NOT_ENROLLED
+        else:
+            outcome = REMOVED
+            removed.append(students[national_id][0])
+        results.append({"national_id": national_id, "status": outcome})
+
+    with transaction.atomic():
+        if added:
+            send_students_changed(class_obj, "pre_add", added)
+            Enrollment.objects.bulk_create(
+                [Enrollment(class_id=class_obj.pk, user_id=pk) for pk in added],
+                ignore_conflicts=True,
+            )
+            send_students_changed(class_obj, "post_add", added)
+        if removed:
+            send_students_changed(class_obj, "pre_remove", removed)
+            Enrollment.objects.filter(
+                class_id=class_obj.pk, user_id__in=removed
+            ).delete()
+            send_students_changed(class_obj, "post_remove", removed)
+    return results
+
+
+# Desired rosters arrive as parallel (class id, national id) arrays. Only the
+# difference with the current enrollments is written: rows of synced classes
+# that are not desired are deleted, desired rows that are missing are inserted.
+SYNC_ROSTERS_SQL = """
+    WITH roster AS (
+        SELECT DISTINCT roster.class_id, roster.national_id
+        FROM unnest(%(class_ids)s::int[], %(national_ids)s::text[])
+             AS roster(class_id, national_id)
+    ),
+    desired AS (
+        SELECT roster.class_id, roster.national_id, account.id AS user_id
+        FROM roster
+        JOIN users_user AS account ON account.national_id = roster.national_id
+        WHERE EXISTS (
+            SELECT 1
+            FROM users_user_groups AS membership
+            JOIN auth_group AS role ON role.id = membership.group_id
+            WHERE membership.user_id = account.id AND role.name = 'student'
+        )
+    ),
+    removed AS (
+        DELETE FROM schools_class_students AS enrollment
+        WHERE enrollment.class_id = ANY(%(synced)s)
+          AND NOT EXISTS (
+              SELECT 1 FROM desired
+              WHERE desired.class_id = enrollment.class_id
+                AND desired.user_id = enrollment.user_id
+          )
+        RETURNING enrollment.class_id, enrollment.user_id
+    ),
+    added AS (
+        INSERT INTO schools_class_students (class_id, user_id)
+        SELECT desired.class_id, desired.user_id
+        FROM desired
+        WHERE NOT EXISTS (
+            SELECT 1 FROM schools_class_students AS enrollment
+            WHERE enrollment.class_id = desired.class_id
+              AND enrollment.user_id = desired.user_id
+        )
+        ON CONFLICT DO NOTHING
+        RETURNING class_id, user_id
+    )
+    SELECT 'added', class_id, user_id, NULL::text FROM added
+    UNION ALL
+    SELECT 'removed', class_id, user_id, NULL::text FROM removed
+    UNION ALL
+    SELECT 'not_found', roster.class_id, NULL::int, roster.national_id
+    FROM roster
+    WHERE NOT EXISTS (
+        SELECT 1 FROM desired
+        WHERE desired.class_id = roster.class_id
+          AND desired.national_id = roster.national_id
+    )
+"""
+
+
+def sync_rosters(rosters):
+    """
+    Make the students of each class of ``rosters``, a ``{class: national
+    ids}`` mapping, exactly the students with those national ids.
+
+    The difference is computed and applied by the database in one statement,
+    so a sync costs the same whether nothing or everything changed. Return
+    ``{class_id: {"added", "removed", "not_found"}}``: the numbers of students
+    added and removed, and the national ids matching no student.
+    """
+    class_ids, national_ids = [], []
+    for class_obj, roster in rosters.items():
+        for national_id in roster:
+            class_ids.append(class_obj.pk)
+            national_ids.append(national_id)
+    params = {
+        "class_ids": class_ids,
+        "national_ids": national_ids,
+        "synced": [class_obj.pk for class_obj in rosters],
+    }
+
+    with transaction.atomic():
+        # Serializes concurrent syncs of the same classes.
+        list(
+            Class.objects.select_for_update()
+            .filter(pk__in=params["synced"])
+            .values_list("pk", flat=True)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(SYNC_ROSTERS_SQL, params)
+            rows = cursor.fetchall()
+
+        changes = {
+            class_obj.pk: {ADDED: set(), REMOVED: set(), NOT_FOUND: []}
+            for class_obj in rosters
+        }
+        for outcome, class_id, user_id, national_id in rows:
+            if outcome == NOT_FOUND:
+                changes[class_id][NOT_FOUND].append(national_id)
+            else:
+                changes[class_id][outcome].add(user_id)
+
+        # The rows are already written, so only the post_ actions, which are
+        # the ones the receivers act on, are sent.
+        for class_obj in rosters:
+            if changes[class_obj.pk][ADDED]:
+                send_students_changed(
+                    class_obj, "post_add", changes[class_obj.pk][ADDED]
+                )
+            if changes[class_obj.pk][REMOVED]:
+                send_students_changed(
+                    class_obj, "post_remove", changes[class_obj.pk][REMOVED]
+                )
+
+    return {
+        class_id: {
+            ADDED: len(change[ADDED]),
+            REMOVED: len(change[REMOVED]),
+            NOT_FOUND: sorted(change[NOT_FOUND]),
+        }
+        for class_id, change in changes.items()
+    }
@@ -0,0 +1,48 @@
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Class
+
+CLASS_EXPANSIONS = ("students", "lessons")
+
+
+def class_expansions(request):
+    """
+    Return the nested class fields asked for with ``?expand=students,lessons``.
+    """
+    if request is None:
+        return set()
+    requested = request.query_params.get("expand", "").split(",")
+    return {name.strip() for name in requested} & set(CLASS_EXPANSIONS)
+
+
+def _count(through, column):
+    counts = (
+        through.objects.filter(class_id=OuterRef("pk"))
+        .order_by()
+        .values("class_id")
+        .annotate(count=Count(column))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def class_queryset(queryset, expand=()):
+    """
+    Annotate ``queryset`` with what ``ClassSerializer`` shows: the student and
+    lesson counts, and the prefetched students/lessons of ``expand``. A list of
+    classes then takes one query plus one per expansion.
+    """
+    queryset = queryset.annotate(
+        student_count=_count(Class.students.through, "user_id"),
+        lesson_count=_count(Class.lessons.through, "lesson_id"),
+    )
+    return queryset.prefetch_related(*sorted(expand))
+
+
+def class_prefetch(lookup, expand=()):
+    """
+    Prefetch the class behind the ``lookup`` relation with ``class_queryset``,
+    for serializers nesting ``ClassSerializer``.
+    """
+    return Prefetch(lookup, queryset=class_queryset(Class.objects.all(), expand))
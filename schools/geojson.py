@@ -0,0 +1,68 @@
+import json
+
+from django.db import connection
+
+# Same document as SchoolSerializer(many=True), built by PostGIS. The page of
+# ids comes from the view's queryset so its filtering and pagination apply.
+FEATURE_COLLECTION_SQL = """
+    WITH page AS ({page})
+    SELECT json_build_object(
+        'type', 'FeatureCollection',
+        'features', coalesce(
+            json_agg(
+                json_build_object(
+                    'id', school.id,
+                    'type', 'Feature',
+                    'geometry', ST_AsGeoJSON(school.location, 15)::json,
+                    'properties', json_build_object(
+                        'name', school.name,
+                        'manager', school.manager_id
+                    )
+                )
+                ORDER BY school.id
+            ),
+            '[]'::json
+        )
+    )::text
+    FROM schools_school AS school
+    WHERE school.id IN (SELECT id FROM page)
+"""
+
+
+def feature_collection(queryset):
+    """
+    Return the GeoJSON FeatureCollection of the schools of ``queryset``, in id
+    order, as bytes. ``queryset`` may be sliced.
+    """
+    page_sql, params = queryset.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(FEATURE_COLLECTION_SQL.format(page=page_sql), params)
+        return cursor.fetchone()[0].encode()
+
+
+def paginated_feature_collection(queryset, paginator, request):
+    """
+    Like ``feature_collection`` for the page of ``queryset`` selected by a
+    ``LimitOffsetPagination``, wrapped in its usual envelope.
+    """
+    queryset = queryset.order_by("pk")
+    limit = paginator.get_limit(request)
+    if limit is None:
+        return feature_collection(queryset)
+
+    paginator.request = request
+    paginator.limit = limit
+    paginator.offset = paginator.get_offset(request)
+    paginator.count = paginator.get_count(queryset)
+    page = queryset[paginator.offset:paginator.offset + limit]
+
+    envelope = json.dumps(
+        {
+            "count": paginator.count,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+        }
+    )
+    return b"".join(
+        [envelope[:-1].encode(), b', "results": ', feature_collection(page), b"}"]
+    )
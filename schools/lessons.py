@@ -0,0 +1,90 @@
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Lesson, normalize_lesson_name
+
+GENERATION_KEY = "lesson-catalog:generation"
+
+# Lesson names kept per worker; the catalog starts over once it holds more.
+MAX_SIZE = 10000
+
+
+class LessonCatalog:
+    """
+    Per-worker map of normalized lesson names to lesson ids. Every lesson save
+    or delete bumps a generation counter in the shared cache, and a worker
+    that sees a new generation forgets every name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._generation = None
+
+    def _current_generation(self):
+        cache.add(GENERATION_KEY, 0, None)
+        return cache.get(GENERATION_KEY)
+
+    def changed(self):
+        cache.add(GENERATION_KEY, 0, None)
+        cache.incr(GENERATION_KEY)
+
+    def _cached(self):
+        generation = self._current_generation()
+        with self._lock:
+            if generation != self._generation or len(self._ids) > MAX_SIZE:
+                self._ids, self._generation = {}, generation
+            return self._ids
+
+    def resolve(self, names, create=False):
+        """
+        Return ``{name: lesson id}`` for the ``names`` matching a lesson. With
+        ``create``, lessons are created for the other names, so that every
+        name gets an id.
+        """
+        normalized = {name: normalize_lesson_name(name) for name in names}
+        ids = cached = self._cached()
+        missing = {
+            normalized_name: name
+            for name, normalized_name in normalized.items()
+            if normalized_name and normalized_name not in cached
+        }
+
+        if missing and create:
+            # Concurrent requests creating the same lesson both succeed: the
+            # unique index keeps one row and the conflicting insert is dropped.
+            Lesson.objects.bulk_create(
+                [
+                    Lesson(name=" ".join(name.split()), normalized_name=normalized_name)
+                    for normalized_name, name in missing.items()
+                ],
+                ignore_conflicts=True,
+            )
+        if missing:
+            loaded = dict(
+                Lesson.objects.filter(normalized_name__in=missing).values_list(
+                    "normalized_name", "pk"
+                )
+            )
+            # Ids read inside a transaction may be of lessons it created, which
+            # would be gone if it rolled back: they are cached after the commit.
+            transaction.on_commit(lambda: self._remember(cached, loaded))
+            ids = {**cached, **loaded}
+
+        return {
+            name: ids[normalized_name]
+            for name, normalized_name in normalized.items()
+            if normalized_name in ids
+        }
+
+    def _remember(self, ids, loaded):
+        with self._lock:
+            ids.update(loaded)
+
+    def get_or_create(self, name):
+        return self.resolve([name], create=True)[name]
+
+
+lesson_catalog = LessonCatalog()
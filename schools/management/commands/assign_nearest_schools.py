@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.assignment import (
+    FORMATS,
+    PointsFormatError,
+    assign_nearest_schools,
+    guess_format,
+    read_points,
+    write_assignments,
+)
+from schools.nearby import NEAREST, get_nearby_school
+
+
+class Command(BaseCommand):
+    help = (
+        "Assign every point of a CSV (id, lng, lat) or GeoJSON file to its "
+        "nearest school and write the assignments as CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="CSV or GeoJSON file of points.")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--output", help="Defaults to standard output.")
+        parser.add_argument("--max-distance", type=float, help="Kilometres.")
+        parser.add_argument("--capacity", type=int, help="Points per school.")
+        parser.add_argument(
+            "--candidates",
+            type=int,
+            default=8,
+            help="Closest schools considered per point and round with --capacity.",
+        )
+        parser.add_argument(
+            "--benchmark",
+            type=int,
+            metavar="POINTS",
+            help="Also time the per-point nearby query on the first POINTS "
+            "points and compare its schools with the vectorized ones "
+            "(which only agree without --capacity).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as file:
+                points = read_points(file, options["format"] or guess_format(path))
+        except (OSError, PointsFormatError) as e:
+            raise CommandError(e)
+
+        started = time.perf_counter()
+        assignments = assign_nearest_schools(
+            points,
+            max_distance=options["max_distance"],
+            capacity=options["capacity"],
+            candidates=options["candidates"],
+        )
+        elapsed = time.perf_counter() - started
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as file:
+                write_assignments(assignments, file)
+        else:
+            write_assignments(assignments, self.stdout)
+
+        assigned = sum(1 for _, school_id, _ in assignments if school_id is not None)
+        self.stderr.write(
+            "Assigned {} of {} points in {:.2f} s.".format(
+                assigned, len(points), elapsed
+            )
+        )
+
+        if options["benchmark"]:
+            self.benchmark(points[: options["benchmark"]], assignments, options)
+
+    def benchmark(self, points, assignments, options):
+        started = time.perf_counter()
+        matches = 0
+        for (_, lng, lat), (_, school_id, _) in zip(points, assignments):
+            schools, _ = get_nearby_school(
+                lan=lng,
+                lat=lat,
+                radius=options["max_distance"],
+                mode=NEAREST,
+                limit=1,
+            )
+            nearest_id = schools[0]["id"] if schools else None
+            matches += nearest_id == school_id
+        elapsed = time.perf_counter() - started
+
+        self.stderr.write(
+            "Per-point queries: {} points in {:.2f} s ({:.2f} ms per point); "
+            "{} of them got the same school.".format(
+                len(points), elapsed, elapsed * 1000 / max(len(points), 1), matches
+            )
+        )
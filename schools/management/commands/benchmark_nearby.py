@@ -0,0 +1,124 @@
+import random
+import statistics
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from schools.nearby import GEOGRAPHY_INDEX, NEAREST, RADIUS, build_nearby_sql
+
+# The query used by the nearby endpoint before the geography index existed.
+LEGACY_NEARBY_SQL = """
+    SELECT id, name, manager_id,
+           ST_AsGeoJSON(location) as geojson,
+           ST_Distance(location::geography, ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography) AS distance
+    FROM schools_school
+    WHERE ST_DWithin(location::geography, ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography, %(radius)s)
+    ORDER BY distance ASC
+"""
+
+CREATE_SCHOOLS_SQL = """
+    INSERT INTO schools_school (name, location)
+    SELECT 'Synthetic school ' || i,
+           ST_SetSRID(ST_MakePoint(%(min_lng)s + random() * %(lng_span)s,
+                                   %(min_lat)s + random() * %(lat_span)s), 4326)
+    FROM generate_series(1, %(count)s) AS i
+"""
+
+# Roughly the size of a country, so that a 10 km radius holds a few hundred of
+# 100k schools.
+AREA = {"min_lng": 44.0, "lng_span": 10.0, "min_lat": 30.0, "lat_span": 8.0}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the legacy nearby query with the index-backed radius and "
+        "nearest modes on synthetic schools. Everything runs in a transaction "
+        "that is rolled back; the geography index is dropped inside it to "
+        "measure the legacy plan, which locks schools_school meanwhile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schools", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--radius", type=float, default=10, help="Kilometres.")
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        points = [
+            (
+                AREA["min_lng"] + rng.random() * AREA["lng_span"],
+                AREA["min_lat"] + rng.random() * AREA["lat_span"],
+            )
+            for _ in range(options["queries"])
+        ]
+        radius = options["radius"] * 1000
+        limit = options["limit"]
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT setseed(%s)", [rng.random()])
+                cursor.execute(CREATE_SCHOOLS_SQL, dict(AREA, count=options["schools"]))
+                cursor.execute("ANALYZE schools_school")
+
+                runs = [
+                    (
+                        "radius",
+                        build_nearby_sql(RADIUS),
+                        {"radius": radius},
+                    ),
+                    (
+                        "nearest",
+                        build_nearby_sql(NEAREST, radius=False),
+                        {"limit": limit},
+                    ),
+                ]
+                results = [
+                    (label, self.measure(cursor, sql, params, points))
+                    for label, sql, params in runs
+                ]
+
+                cursor.execute("DROP INDEX {}".format(GEOGRAPHY_INDEX))
+                results.append(
+                    (
+                        "legacy",
+                        self.measure(
+                            cursor, LEGACY_NEARBY_SQL, {"radius": radius}, points
+                        ),
+                    )
+                )
+            transaction.set_rollback(True)
+
+        for label, (timings, nodes) in results:
+            self.stdout.write(
+                "{:<8} mean {:8.2f} ms  median {:8.2f} ms  max {:8.2f} ms".format(
+                    label,
+                    statistics.mean(timings),
+                    statistics.median(timings),
+                    max(timings),
+                )
+            )
+            self.stdout.write("         plan: {}".format(", ".join(nodes)))
+
+    def measure(self, cursor, sql, params, points):
+        timings = []
+        nodes = []
+        for lng, lat in points:
+            cursor.execute(
+                "EXPLAIN (ANALYZE, FORMAT JSON) " + sql,
+                dict(params, lng=lng, lat=lat),
+            )
+            explained = cursor.fetchone()[0][0]
+            timings.append(explained["Planning Time"] + explained["Execution Time"])
+            if not nodes:
+                nodes = list(self.plan_nodes(explained["Plan"]))
+        return timings, nodes
+
+    def plan_nodes(self, plan):
+        node = plan["Node Type"]
+        if "Index Name" in plan:
+            node = "{} on {}".format(node, plan["Index Name"])
+        yield node
+        for child in plan.get("Plans", ()):
+            yield from self.plan_nodes(child)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from schools.timetable import (
+    FORMATS,
+    TimetableFormatError,
+    guess_format,
+    import_timetable,
+    read_timetable,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create classes, with their teachers and lessons, from a CSV (school, "
+        "class, teacher, lessons) or JSON timetable file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="CSV or JSON timetable file.")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only validate the file."
+        )
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as file:
+                rows = read_timetable(file, options["format"] or guess_format(path))
+        except (OSError, TimetableFormatError) as e:
+            raise CommandError(e)
+
+        errors, counts = import_timetable(rows, dry_run=options["dry_run"])
+        if errors:
+            for error in errors:
+                for message in error["errors"]:
+                    self.stderr.write("Row {}: {}".format(error["row"], message))
+            raise CommandError("{} invalid rows, nothing imported.".format(len(errors)))
+
+        self.stdout.write(
+            "{} {} classes, {} lessons and {} class lessons.".format(
+                "Would create" if options["dry_run"] else "Created",
+                counts["classes"],
+                counts["lessons"],
+                counts["class_lessons"],
+            )
+        )
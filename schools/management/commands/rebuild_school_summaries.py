@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from schools.models import SchoolSummary
+from schools.summary import COUNTERS, compute_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every school summary from the source tables and report the "
+        "counters that had drifted. With --check nothing is written and the "
+        "command fails if any summary drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            computed = compute_summaries()
+            stored = SchoolSummary.objects.select_for_update().in_bulk()
+
+            drifted = 0
+            for school_id, counts in computed.items():
+                summary = stored.get(school_id)
+                if summary is None:
+                    self.stdout.write("School {}: no summary".format(school_id))
+                    drifted += 1
+                    continue
+                changes = [
+                    "{} {} -> {}".format(name, getattr(summary, name), counts[name])
+                    for name in COUNTERS
+                    if getattr(summary, name) != counts[name]
+                ]
+                if changes:
+                    self.stdout.write(
+                        "School {}: {}".format(school_id, ", ".join(changes))
+                    )
+                    drifted += 1
+
+            if options["check"]:
+                if drifted:
+                    raise CommandError("{} summaries drifted.".format(drifted))
+                self.stdout.write("All {} summaries are exact.".format(len(computed)))
+                return
+
+            for school_id, counts in computed.items():
+                summary = stored.get(school_id) or SchoolSummary(school_id=school_id)
+                for name in COUNTERS:
+                    setattr(summary, name, counts[name])
+                summary.save()
+            self.stdout.write(
+                "Rebuilt {} summaries, {} had drifted.".format(len(computed), drifted)
+            )
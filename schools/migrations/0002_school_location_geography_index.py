@@ -0,0 +1,17 @@
+# Generated by Django 3.1.7 on 2026-10-17 09:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX schools_school_location_geog_idx ON schools_school USING GIST ((location::geography));',
+            reverse_sql='DROP INDEX IF EXISTS schools_school_location_geog_idx;',
+        ),
+    ]
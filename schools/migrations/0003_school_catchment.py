@@ -0,0 +1,32 @@
+# Generated by Django 3.1.7 on 2026-10-17 13:12
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0002_school_location_geography_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='school',
+            name='catchment',
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(blank=True, null=True, srid=4326),
+        ),
+        migrations.CreateModel(
+            name='CatchmentSimplification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('geometry', django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catchment_simplifications', to='schools.school')),
+            ],
+            options={
+                'unique_together': {('school', 'zoom')},
+            },
+        ),
+    ]
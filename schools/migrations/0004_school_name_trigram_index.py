@@ -0,0 +1,20 @@
+# Generated by Django 3.1.7 on 2026-10-17 14:05
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0003_school_catchment'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='school',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='schools_school_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
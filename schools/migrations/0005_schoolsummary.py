@@ -0,0 +1,27 @@
+# Generated by Django 3.1.7 on 2026-10-17 14:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0004_school_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchoolSummary',
+            fields=[
+                ('school', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='schools.school')),
+                ('classes', models.IntegerField(default=0)),
+                ('students', models.IntegerField(default=0)),
+                ('teachers', models.IntegerField(default=0)),
+                ('assignments', models.IntegerField(default=0)),
+                ('ungraded_solutions', models.IntegerField(default=0)),
+                ('news', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
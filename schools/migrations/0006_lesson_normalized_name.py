@@ -0,0 +1,61 @@
+# Generated by Django 3.1.7 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+def normalize_lesson_name(name):
+    return ' '.join(name.split()).casefold()
+
+
+def merge_duplicate_lessons(apps, schema_editor):
+    """
+    Keep the oldest lesson of every normalized name and move the classes and
+    assignments of the others to it before deleting them.
+    """
+    Lesson = apps.get_model('schools', 'Lesson')
+    ClassLesson = apps.get_model('schools', 'Class').lessons.through
+    Assignment = apps.get_model('assignments', 'Assignment')
+    # Check the foreign keys now rather than at commit, which would leave
+    # trigger events pending on schools_lesson when the unique constraint is
+    # added below.
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+    kept = {}
+    for lesson_id, name in Lesson.objects.order_by('pk').values_list('pk', 'name'):
+        normalized_name = normalize_lesson_name(name)
+        kept_id = kept.setdefault(normalized_name, lesson_id)
+        if kept_id == lesson_id:
+            Lesson.objects.filter(pk=lesson_id).update(
+                name=' '.join(name.split()), normalized_name=normalized_name
+            )
+            continue
+
+        Assignment.objects.filter(lesson_id=lesson_id).update(lesson_id=kept_id)
+        ClassLesson.objects.filter(
+            lesson_id=lesson_id,
+            class_id__in=ClassLesson.objects.filter(lesson_id=kept_id).values('class_id'),
+        ).delete()
+        ClassLesson.objects.filter(lesson_id=lesson_id).update(lesson_id=kept_id)
+        Lesson.objects.filter(pk=lesson_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0002_auto_20250523_0922'),
+        ('schools', '0005_schoolsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_lessons, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lesson',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.gis.db import models as gis_models
+from django.core.exceptions import ValidationError
 from django.db import models
 
 from users.models import User
@@ -8,6 +10,7 @@ from users.models import User
 class School(models.Model):
     name = models.CharField(max_length=255)
     location = gis_models.PointField(srid=4326)
+    catchment = gis_models.MultiPolygonField(srid=4326, null=True, blank=True)
     manager = models.OneToOneField(
         User,
         on_delete=models.SET_NULL,
@@ -16,12 +19,82 @@ class School(models.Model):
         blank=True,
     )
 
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=["name"],
+                name="schools_school_name_trgm",
+                opclasses=["gin_trgm_ops"],
+            )
+        ]
+
     def __str__(self):
         return self.name
 
 
+class CatchmentSimplification(models.Model):
+    """
+    A school's catchment simplified to about one pixel at ``zoom``, kept up to
+    date by ``catchments.refresh_simplified_catchments``.
+    """
+
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, related_name="catchment_simplifications"
+    )
+    zoom = models.PositiveSmallIntegerField()
+    geometry = gis_models.MultiPolygonField(srid=4326)
+
+    class Meta:
+        unique_together = [("school", "zoom")]
+
+    def __str__(self):
+        return f"{self.school} - zoom {self.zoom}"
+
+
+class SchoolSummary(models.Model):
+    """
+    Dashboard counters of a school, maintained by signals and rebuilt by the
+    rebuild_school_summaries command. ``students`` and ``teachers`` count
+    distinct users; ``news`` counts school-wide and class news.
+    """
+
+    school = models.OneToOneField(
+        School, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    classes = models.IntegerField(default=0)
+    students = models.IntegerField(default=0)
+    teachers = models.IntegerField(default=0)
+    assignments = models.IntegerField(default=0)
+    ungraded_solutions = models.IntegerField(default=0)
+    news = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of {self.school}"
+
+
+def normalize_lesson_name(name):
+    """
+    Fold case and whitespace, so that "Math", "math " and "MATH" are one lesson.
+    """
+    return " ".join(name.split()).casefold()
+
+
 class Lesson(models.Model):
     name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, unique=True, editable=False)
+
+    def clean(self):
+        duplicates = Lesson.objects.filter(
+            normalized_name=normalize_lesson_name(self.name)
+        ).exclude(pk=self.pk)
+        if duplicates.exists():
+            raise ValidationError({"name": "A lesson with this name already exists."})
+
+    def save(self, *args, **kwargs):
+        self.name = " ".join(self.name.split())
+        self.normalized_name = normalize_lesson_name(self.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
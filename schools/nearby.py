@@ -0,0 +1,252 @@
+import base64
+import json
+
+from django.db import connection
+
+GEOGRAPHY_INDEX = "schools_school_location_geog_idx"
+
+RADIUS = "radius"
+NEAREST = "nearest"
+MODES = (RADIUS, NEAREST)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(distance, school_id):
+    raw = json.dumps([distance, school_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        distance, school_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(distance), int(school_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor("The cursor is not valid.")
+
+
+# Both modes compare ``location::geography`` so that the planner can use the
+# expression index created by migration 0002 instead of casting every row.
+NEARBY_SQL = """
+    WITH origin AS (
+        SELECT ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography AS geog
+    )
+    SELECT id, name, manager_id, ST_AsGeoJSON(location) AS geojson, distance
+    FROM (
+        SELECT school.id, school.name, school.manager_id, school.location,
+               {distance} AS distance
+        FROM schools_school AS school, origin
+        WHERE {conditions}
+    ) AS nearby
+    {after}
+    ORDER BY distance, id
+    {limit}
+"""
+
+# ``nearest`` mode first walks the index in ``<->`` order to find the distance
+# of the k-th school after the cursor, then reads every school up to that
+# distance. The second step keeps the (distance, id) order exact when several
+# schools share a location, which a bare KNN scan does not guarantee.
+NEAREST_BOUND_SQL = """
+    (
+        SELECT max(knn.distance) FROM (
+            SELECT candidate.location::geography <-> origin.geog AS distance
+            FROM schools_school AS candidate
+            WHERE {conditions}
+            ORDER BY candidate.location::geography <-> origin.geog
+            LIMIT %(limit)s
+        ) AS knn
+    )
+"""
+
+SPHEROID_DISTANCE = "ST_Distance({table}.location::geography, origin.geog)"
+SPHERE_DISTANCE = "{table}.location::geography <-> origin.geog"
+WITHIN_RADIUS = "ST_DWithin({table}.location::geography, origin.geog, %(radius)s)"
+AFTER_CURSOR = "({distance}, {id}) > (%(after_distance)s, %(after_id)s)"
+# The millimetre of slack absorbs rounding differences between ST_DWithin and
+# ``<->``; the extra rows it lets through are cut by the outer LIMIT.
+WITHIN_BOUND = "ST_DWithin(school.location::geography, origin.geog, {} + 0.001, false)"
+
+
+def where(conditions):
+    return " AND ".join(conditions) if conditions else "TRUE"
+
+
+def build_nearby_sql(mode=RADIUS, radius=True, limit=False, after=False):
+    """
+    Return the nearby SQL for ``mode``. Besides ``lng``/``lat`` the query takes
+    ``radius`` (metres), ``limit`` and ``after_distance``/``after_id`` when the
+    matching flag is set; ``nearest`` mode always takes ``limit``.
+
+    ``radius`` mode orders by the spheroid distance of ST_Distance, ``nearest``
+    by the sphere distance of ``<->``, so distances of the two modes can differ
+    by a few metres per kilometre.
+    """
+    conditions = []
+    if radius:
+        conditions.append(WITHIN_RADIUS.format(table="school"))
+
+    if mode == NEAREST:
+        distance = SPHERE_DISTANCE.format(table="school")
+        bound_conditions = []
+        if radius:
+            bound_conditions.append(WITHIN_RADIUS.format(table="candidate"))
+        if after:
+            bound_conditions.append(
+                AFTER_CURSOR.format(
+                    distance=SPHERE_DISTANCE.format(table="candidate"),
+                    id="candidate.id",
+                )
+            )
+        bound = NEAREST_BOUND_SQL.format(conditions=where(bound_conditions))
+        conditions.append(WITHIN_BOUND.format(bound))
+        limit = True
+    else:
+        distance = SPHEROID_DISTANCE.format(table="school")
+
+    return NEARBY_SQL.format(
+        distance=distance,
+        conditions=where(conditions),
+        after=(
+            "WHERE " + AFTER_CURSOR.format(distance="distance", id="id")
+            if after
+            else ""
+        ),
+        limit="LIMIT %(limit)s" if limit else "",
+    )
+
+
+def format_nearby_row(row):
+    return {
+        "id": row[0],
+        "name": row[1],
+        "manager": row[2],
+        "geometry": row[3],
+        "distance_km": round(row[4] / 1000, 2),
+    }
+
+
+def get_nearby_school(lan, lat, radius=None, mode=RADIUS, limit=None, cursor=None):
+    """
+    Return the schools around (``lan``, ``lat``) ordered by distance.
+
+    ``radius`` is in kilometres and is required in ``radius`` mode; in
+    ``nearest`` mode it is an optional upper bound and ``limit`` is required.
+    When ``limit`` is given, the second value returned is the cursor of the
+    next page (or ``None``), which can be passed back as ``cursor``.
+    """
+    if mode == RADIUS and radius is None:
+        raise ValueError("A radius is required in radius mode.")
+    if mode == NEAREST and not limit:
+        raise ValueError("A limit is required in nearest mode.")
+
+    params = {"lng": lan, "lat": lat}
+    if radius is not None:
+        params["radius"] = radius * 1000
+    if limit:
+        params["limit"] = limit
+    if cursor:
+        params["after_distance"], params["after_id"] = decode_cursor(cursor)
+
+    sql = build_nearby_sql(
+        mode=mode,
+        radius=radius is not None,
+        limit=bool(limit),
+        after=bool(cursor),
+    )
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    sorted_schools = [format_nearby_row(row) for row in rows]
+    next_cursor = None
+    if limit and len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1][4], rows[-1][0])
+    return sorted_schools, next_cursor
+
+
+# One statement for a whole batch: the points are passed as parallel arrays,
+# unnested into rows and joined laterally to the per-point nearby query, which
+# still uses the geography index. Points without any school keep one row with
+# NULL columns so every input index shows up in the result.
+BATCH_NEARBY_SQL = """
+    WITH origin AS (
+        SELECT idx, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::geography AS geog,
+               radius, lim
+        FROM unnest(%(idx)s::int[], %(lng)s::float8[], %(lat)s::float8[],
+                    %(radius)s::float8[], %(limit)s::int[])
+             AS point(idx, lng, lat, radius, lim)
+    )
+    SELECT origin.idx, nearby.id, nearby.name, nearby.manager_id,
+           ST_AsGeoJSON(nearby.location), nearby.distance
+    FROM origin
+    LEFT JOIN LATERAL (
+        SELECT school.id, school.name, school.manager_id, school.location,
+               {distance} AS distance
+        FROM schools_school AS school
+        WHERE {conditions}
+        ORDER BY {order}
+        LIMIT origin.lim
+    ) AS nearby ON TRUE
+    ORDER BY origin.idx, nearby.distance, nearby.id
+"""
+
+BATCH_WITHIN_RADIUS = (
+    "ST_DWithin(school.location::geography, origin.geog, origin.radius * 1000)"
+)
+
+
+def build_batch_nearby_sql(mode=RADIUS):
+    """
+    In ``nearest`` mode each point walks the index in ``<->`` order; unlike
+    ``get_nearby_school`` schools at exactly the same distance as the last
+    one returned are not guaranteed to be chosen by id.
+    """
+    if mode == NEAREST:
+        return BATCH_NEARBY_SQL.format(
+            distance=SPHERE_DISTANCE.format(table="school"),
+            conditions="origin.radius IS NULL OR " + BATCH_WITHIN_RADIUS,
+            order=SPHERE_DISTANCE.format(table="school"),
+        )
+    return BATCH_NEARBY_SQL.format(
+        distance=SPHEROID_DISTANCE.format(table="school"),
+        conditions=BATCH_WITHIN_RADIUS,
+        order="distance, school.id",
+    )
+
+
+def iter_nearby_schools_batch(points, mode=RADIUS, chunk_size=2000):
+    """
+    Resolve many points with one query and yield ``(index, schools)`` pairs in
+    input order; each point is a dict with ``lng``, ``lat`` and optionally
+    ``radius`` (kilometres) and ``limit``.
+
+    Rows are read through a server-side cursor in chunks of ``chunk_size``, so
+    large batches can be streamed without holding every row in memory.
+    """
+    params = {
+        "idx": list(range(len(points))),
+        "lng": [point["lng"] for point in points],
+        "lat": [point["lat"] for point in points],
+        "radius": [point.get("radius") for point in points],
+        "limit": [point.get("limit") for point in points],
+    }
+
+    with connection.chunked_cursor() as db_cursor:
+        db_cursor.execute(build_batch_nearby_sql(mode), params)
+        index, schools = None, []
+        while True:
+            rows = db_cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                if row[0] != index:
+                    if index is not None:
+                        yield index, schools
+                    index, schools = row[0], []
+                if row[1] is not None:
+                    schools.append(format_nearby_row(row[1:]))
+        if index is not None:
+            yield index, schools
@@ -1,10 +1,14 @@
-from rest_framework.permissions import BasePermission
 from django.contrib.auth.models import Group
+from rest_framework.permissions import BasePermission
+
+from users.authorization import get_authorization_context, has_role
+from users.identity import get_shared_object
+
 from .models import Class
 
 
 def in_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return has_role(user, group_name)
 
 
 class IsTeacher(BasePermission):
@@ -42,15 +46,15 @@ class IsTeacherOfClass(BasePermission):
         if not class_id:
             return False
         try:
-            class_obj = Class.objects.get(id=class_id)
-            return request.user == class_obj.teacher
-        except Class.DoesNotExist:
+            return get_authorization_context(request.user).teaches(int(class_id))
+        except ValueError:
             return False
 
 
 class IsManagerOfSchool(BasePermission):
     def has_permission(self, request, view):
-        return hasattr(request.user, "school_manager")
+        context = get_authorization_context(request.user)
+        return context.managed_school_id is not None
 
 
 class IsManagerOfClass(BasePermission):
@@ -59,10 +63,10 @@ class IsManagerOfClass(BasePermission):
         if not class_id:
             return False
         try:
-            class_obj = Class.objects.get(id=class_id)
-            return request.user == class_obj.school.manager
+            class_obj = get_shared_object(request, view)
         except Class.DoesNotExist:
             return False
+        return get_authorization_context(request.user).manages(class_obj.school_id)
 
 
 class IsStudentOfClass(BasePermission):
@@ -71,7 +75,7 @@ class IsStudentOfClass(BasePermission):
         if not class_id:
             return False
         try:
-            class_obj = Class.objects.get(id=class_id)
-            return class_obj.students.filter(id=request.user.id).exists()
-        except Class.DoesNotExist:
+            context = get_authorization_context(request.user)
+            return context.is_enrolled_in(int(class_id))
+        except ValueError:
             return False
@@ -0,0 +1,33 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class MVTRenderer(BaseRenderer):
+    """
+    Passes rendered Mapbox Vector Tiles through unchanged. Error responses,
+    which are not tiles, are sent without a body.
+    """
+
+    media_type = "application/vnd.mapbox-vector-tile"
+    format = "mvt"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return b""
+
+
+class GeoJSONRenderer(JSONRenderer):
+    """
+    Passes GeoJSON already rendered by the database through unchanged and
+    renders anything else, such as errors, as JSON.
+    """
+
+    media_type = "application/geo+json"
+    format = "geojson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,38 @@
+from django.db.models import Exists, OuterRef, Q
+
+from users.models import User
+
+from .models import Class
+
+ROSTER_FIELDS = ["id", "username", "first_name", "last_name", "national_id", "email"]
+
+
+def school_roster(school_id, role, search=None, class_id=None):
+    """
+    Return the users with ``role`` ("student" or "teacher") in a class of the
+    school, as ``values()`` rows ordered by name.
+
+    Membership and role are tested with EXISTS subqueries on the indexed
+    through tables, so every user comes out once without a DISTINCT over the
+    joined rows.
+    """
+    classes = Class.objects.filter(school_id=school_id)
+    if class_id is not None:
+        classes = classes.filter(pk=class_id)
+    if role == "student":
+        classes = classes.filter(students=OuterRef("pk"))
+    else:
+        classes = classes.filter(teacher_id=OuterRef("pk"))
+    in_group = User.groups.through.objects.filter(
+        user_id=OuterRef("pk"), group__name=role
+    )
+
+    users = User.objects.filter(Exists(classes), Exists(in_group))
+    if search:
+        users = users.filter(
+            Q(first_name__icontains=search)
+            | Q(last_name__icontains=search)
+            | Q(username__icontains=search)
+            | Q(national_id__startswith=search)
+        )
+    return users.order_by("last_name", "first_name", "id").values(*ROSTER_FIELDS)
@@ -1,12 +1,16 @@
 from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import MultiPolygon
 from django.core.exceptions import ValidationError
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
+from assignments import gradebook
 from users.models import *
 from users.serializers import *
 
-from .models import Class, Lesson, School
+from . import assignment, autocomplete, nearby, timetable
+from .expansions import class_expansions
+from .models import Class, Lesson, School, SchoolSummary
 
 
 class SchoolSerializer(GeoFeatureModelSerializer):
@@ -21,6 +25,147 @@ class SchoolSerializer(GeoFeatureModelSerializer):
         return value
 
 
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(min_value=0, required=False)
+    mode = serializers.ChoiceField(choices=nearby.MODES, default=nearby.RADIUS)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+    cursor = serializers.CharField(required=False)
+
+    def validate_cursor(self, value):
+        try:
+            nearby.decode_cursor(value)
+        except nearby.InvalidCursor as e:
+            raise ValidationError(str(e))
+        return value
+
+    def validate(self, data):
+        if data["mode"] == nearby.RADIUS:
+            data.setdefault("radius", 10)
+        elif "limit" not in data:
+            raise ValidationError("A limit is required in nearest mode.")
+        return data
+
+
+class NearbyPointSerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(min_value=0, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+
+
+class NearbyBatchSerializer(serializers.Serializer):
+    points = serializers.ListField(
+        child=NearbyPointSerializer(), min_length=1, max_length=10000
+    )
+    mode = serializers.ChoiceField(choices=nearby.MODES, default=nearby.RADIUS)
+    radius = serializers.FloatField(min_value=0, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, required=False)
+
+    def validate(self, data):
+        default_radius = data.get("radius")
+        if data["mode"] == nearby.RADIUS and default_radius is None:
+            default_radius = 10
+        for point in data["points"]:
+            point.setdefault("radius", default_radius)
+            point.setdefault("limit", data.get("limit"))
+            if data["mode"] == nearby.NEAREST and not point["limit"]:
+                raise ValidationError("A limit is required in nearest mode.")
+        return data
+
+
+class SchoolAssignmentSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=assignment.FORMATS, required=False)
+    max_distance = serializers.FloatField(min_value=0, required=False)
+    capacity = serializers.IntegerField(min_value=1, required=False)
+
+
+class SchoolSummarySerializer(serializers.ModelSerializer):
+    open_assignments = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = SchoolSummary
+        fields = [
+            "school",
+            "classes",
+            "students",
+            "teachers",
+            "assignments",
+            "open_assignments",
+            "ungraded_solutions",
+            "news",
+            "updated_at",
+        ]
+
+
+class RosterQuerySerializer(serializers.Serializer):
+    search = serializers.CharField(max_length=150, required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # ``class`` is a keyword and cannot be declared as an attribute.
+        fields["class"] = serializers.IntegerField(required=False, source="class_id")
+        return fields
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    lng = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=autocomplete.CACHED_RESULTS, default=10
+    )
+
+    def validate(self, data):
+        if ("lat" in data) != ("lng" in data):
+            raise ValidationError("Provide both lat and lng, or neither.")
+        return data
+
+
+class SchoolCatchmentSerializer(GeoFeatureModelSerializer):
+    class Meta:
+        model = School
+        fields = ["id", "name"]
+        read_only_fields = ["name"]
+        geo_field = "catchment"
+
+    def validate_catchment(self, value):
+        if value is not None and value.geom_type == "Polygon":
+            value = MultiPolygon(value, srid=value.srid)
+        if value is not None and value.geom_type != "MultiPolygon":
+            raise ValidationError("A catchment must be a Polygon or MultiPolygon.")
+        return value
+
+
+class CatchmentQuerySerializer(serializers.Serializer):
+    zoom = serializers.IntegerField(min_value=0, max_value=22, default=0)
+    bbox = serializers.CharField(
+        required=False, help_text="min_lng,min_lat,max_lng,max_lat"
+    )
+
+    def validate_bbox(self, value):
+        try:
+            bbox = [float(part) for part in value.split(",")]
+        except ValueError:
+            bbox = []
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise ValidationError("Expected min_lng,min_lat,max_lng,max_lat.")
+        return bbox
+
+
+class CatchmentPointSerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class CatchmentBatchSerializer(serializers.Serializer):
+    points = serializers.ListField(
+        child=CatchmentPointSerializer(), min_length=1, max_length=10000
+    )
+
+
 class LessonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lesson
@@ -28,12 +173,38 @@ class LessonSerializer(serializers.ModelSerializer):
 
 
 class ClassSerializer(serializers.ModelSerializer):
-    lessons = LessonSerializer(many=True, read_only=True)
-    students = UserSerializer(many=True, read_only=True)
+    """
+    Compact by default. ``students`` and ``lessons`` are nested only when asked
+    for with ``?expand=``; querysets should go through
+    ``expansions.class_queryset`` so the counts and expansions are not loaded
+    per class.
+    """
+
+    student_count = serializers.SerializerMethodField()
+    lesson_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Class
-        fields = ["id", "name", "teacher", "school", "students", "lessons"]
+        fields = ["id", "name", "teacher", "school", "student_count", "lesson_count"]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = class_expansions(self.context.get("request"))
+        if "students" in expand:
+            fields["students"] = UserSerializer(many=True, read_only=True)
+        if "lessons" in expand:
+            fields["lessons"] = LessonSerializer(many=True, read_only=True)
+        return fields
+
+    def get_student_count(self, obj):
+        if hasattr(obj, "student_count"):
+            return obj.student_count
+        return obj.students.count()
+
+    def get_lesson_count(self, obj):
+        if hasattr(obj, "lesson_count"):
+            return obj.lesson_count
+        return obj.lessons.count()
 
 
 class CreateClassSerializer(serializers.ModelSerializer):
@@ -49,6 +220,78 @@ class CreateClassSerializer(serializers.ModelSerializer):
         return data
 
 
+class BulkEnrollmentSerializer(serializers.Serializer):
+    add = serializers.ListField(
+        child=serializers.CharField(max_length=10), max_length=1000, default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.CharField(max_length=10), max_length=1000, default=list
+    )
+
+    def validate(self, data):
+        if not data["add"] and not data["remove"]:
+            raise ValidationError("Provide national ids to add or remove.")
+        if set(data["add"]) & set(data["remove"]):
+            raise ValidationError("A national id cannot be both added and removed.")
+        return data
+
+
+class TimetableImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=timetable.FORMATS, required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+
+class GradebookExportSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=gradebook.FORMATS, default=gradebook.CSV)
+
+
+class ClassRankingQuerySerializer(serializers.Serializer):
+    lesson = serializers.IntegerField(required=False)
+
+
+class ClassRankingSerializer(serializers.Serializer):
+    student = serializers.IntegerField(source="student_id")
+    username = serializers.CharField(source="student__username")
+    first_name = serializers.CharField(source="student__first_name")
+    last_name = serializers.CharField(source="student__last_name")
+    average = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        source="student_average",
+        coerce_to_string=False,
+    )
+    graded = serializers.IntegerField(source="solutions")
+    rank = serializers.IntegerField()
+
+
+class RosterSyncSerializer(serializers.Serializer):
+    # An empty list is a valid roster: it unenrolls every student.
+    students = serializers.ListField(
+        child=serializers.CharField(max_length=10), allow_empty=True, max_length=5000
+    )
+
+
+class ClassRosterSerializer(RosterSyncSerializer):
+    def get_fields(self):
+        fields = super().get_fields()
+        # ``class`` is a keyword and cannot be declared as an attribute.
+        fields["class"] = serializers.IntegerField(source="class_id")
+        return fields
+
+
+class RosterSyncBatchSerializer(serializers.Serializer):
+    rosters = serializers.ListField(
+        child=ClassRosterSerializer(), min_length=1, max_length=500
+    )
+
+    def validate_rosters(self, rosters):
+        class_ids = [roster["class_id"] for roster in rosters]
+        if len(set(class_ids)) != len(class_ids):
+            raise ValidationError("Each class can only be listed once.")
+        return rosters
+
+
 """
 
 POST /schools/
@@ -0,0 +1,219 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+
+from users.authorization import membership_changed
+
+from .catchments import catchment_index, refresh_simplified_catchments
+from .lessons import lesson_catalog
+from .models import Class, Lesson, School
+from .spatial_index import school_location_index
+from .summary import (
+    adjust_school_summary,
+    class_school_ids,
+    rebuild_school_summary_on_commit,
+    refresh_member_counts,
+)
+from .tiles import invalidate_tiles
+
+
+@receiver(m2m_changed, sender=Class.students.through)
+def class_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # ``user.class_students`` was changed: ``instance`` is the student.
+        if action in ("post_add", "post_remove", "post_clear"):
+            membership_changed(instance.pk)
+        return
+
+    if action == "pre_clear":
+        instance._cleared_student_ids = list(
+            instance.students.values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        membership_changed(*getattr(instance, "_cleared_student_ids", ()))
+    elif action in ("post_add", "post_remove"):
+        membership_changed(*pk_set)
+
+
+@receiver(pre_save, sender=Class)
+def remember_previous_class(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = (
+            Class.objects.filter(pk=instance.pk)
+            .values_list("teacher_id", "school_id")
+            .first()
+        )
+    (
+        instance._previous_teacher_id,
+        instance._previous_school_id,
+    ) = previous or (None, None)
+
+
+@receiver(post_save, sender=Class)
+def class_saved(sender, instance, **kwargs):
+    previous_teacher_id = getattr(instance, "_previous_teacher_id", None)
+    if previous_teacher_id != instance.teacher_id:
+        membership_changed(instance.teacher_id, previous_teacher_id)
+
+
+@receiver(pre_delete, sender=Class)
+def remember_class_members(sender, instance, **kwargs):
+    instance._deleted_student_ids = list(instance.students.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Class)
+def class_deleted(sender, instance, **kwargs):
+    membership_changed(
+        instance.teacher_id, *getattr(instance, "_deleted_student_ids", ())
+    )
+
+
+@receiver(pre_save, sender=School)
+def remember_previous_school(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = (
+            School.objects.filter(pk=instance.pk)
+            .values_list("manager_id", "name", "location")
+            .first()
+        )
+    (
+        instance._previous_manager_id,
+        instance._previous_name,
+        instance._previous_location,
+    ) = previous or (None, None, None)
+
+
+@receiver(post_save, sender=School)
+def school_saved(sender, instance, **kwargs):
+    previous_manager_id = getattr(instance, "_previous_manager_id", None)
+    if previous_manager_id != instance.manager_id:
+        membership_changed(instance.manager_id, previous_manager_id)
+
+
+@receiver(post_delete, sender=School)
+def school_deleted(sender, instance, **kwargs):
+    membership_changed(instance.manager_id)
+
+
+@receiver(post_save, sender=School)
+def index_school_location(sender, instance, **kwargs):
+    if not settings.SCHOOL_LOCATION_INDEX:
+        return
+    entry = (
+        instance.pk,
+        instance.name,
+        instance.manager_id,
+        instance.location.x,
+        instance.location.y,
+    )
+    transaction.on_commit(lambda: school_location_index.upsert(*entry))
+
+
+@receiver(post_delete, sender=School)
+def unindex_school_location(sender, instance, **kwargs):
+    if not settings.SCHOOL_LOCATION_INDEX:
+        return
+    school_id = instance.pk
+    transaction.on_commit(lambda: school_location_index.remove(school_id))
+
+
+@receiver(post_save, sender=School)
+def invalidate_school_tiles(sender, instance, created, **kwargs):
+    previous_location = getattr(instance, "_previous_location", None)
+    if (
+        not created
+        and previous_location == instance.location
+        and getattr(instance, "_previous_name", None) == instance.name
+    ):
+        return
+    points = [(instance.location.x, instance.location.y)]
+    if previous_location is not None:
+        points.append((previous_location.x, previous_location.y))
+    transaction.on_commit(lambda: invalidate_tiles(*points))
+
+
+@receiver(post_delete, sender=School)
+def invalidate_deleted_school_tiles(sender, instance, **kwargs):
+    point = (instance.location.x, instance.location.y)
+    transaction.on_commit(lambda: invalidate_tiles(point))
+
+
+@receiver(pre_save, sender=School)
+def remember_catchment_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "catchment" not in update_fields:
+        instance._catchment_changed = False
+    elif not instance.pk:
+        instance._catchment_changed = instance.catchment is not None
+    elif instance.catchment is None:
+        instance._catchment_changed = School.objects.filter(
+            pk=instance.pk, catchment__isnull=False
+        ).exists()
+    else:
+        instance._catchment_changed = not School.objects.filter(
+            pk=instance.pk, catchment__equals=instance.catchment
+        ).exists()
+
+
+@receiver(post_save, sender=School)
+def refresh_catchment(sender, instance, **kwargs):
+    if not getattr(instance, "_catchment_changed", False):
+        return
+    refresh_simplified_catchments(instance.pk)
+    transaction.on_commit(catchment_index.changed)
+
+
+@receiver(post_delete, sender=School)
+def forget_catchment(sender, instance, **kwargs):
+    if instance.catchment is not None:
+        transaction.on_commit(catchment_index.changed)
+
+
+@receiver(m2m_changed, sender=Class.students.through)
+def summarize_enrollments(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_member_counts(instance.school_id)
+        return
+
+    # ``user.class_students`` was changed: ``pk_set`` holds class ids.
+    if action == "pre_clear":
+        instance._cleared_school_ids = class_school_ids(
+            instance.class_students.values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        refresh_member_counts(*getattr(instance, "_cleared_school_ids", ()))
+    elif action in ("post_add", "post_remove"):
+        refresh_member_counts(*class_school_ids(pk_set))
+
+
+@receiver(post_save, sender=Class)
+def summarize_class_saved(sender, instance, created, **kwargs):
+    previous_school_id = getattr(instance, "_previous_school_id", None)
+    if created:
+        adjust_school_summary(instance.school_id, classes=1)
+        refresh_member_counts(instance.school_id)
+    elif previous_school_id != instance.school_id:
+        rebuild_school_summary_on_commit(previous_school_id, instance.school_id)
+    elif getattr(instance, "_previous_teacher_id", None) != instance.teacher_id:
+        refresh_member_counts(instance.school_id)
+
+
+@receiver(post_delete, sender=Class)
+def summarize_class_deleted(sender, instance, **kwargs):
+    # The class's assignments, solutions and news are deleted with it.
+    rebuild_school_summary_on_commit(instance.school_id)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def forget_lesson_names(sender, instance, **kwargs):
+    transaction.on_commit(lesson_catalog.changed)
@@ -0,0 +1,281 @@
+import json
+import random
+import threading
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+
+from . import nearby
+
+EARTH_RADIUS_M = 6371008.8
+
+GENERATION_KEY = "school-location-index:generation"
+CHANGE_KEY = "school-location-index:change:{}"
+
+# Seconds a change stays in the shared cache for other workers to replay, and
+# how many changes a worker replays before it reloads from the database
+# instead.
+CHANGE_TIMEOUT = 60 * 60
+MAX_REPLAY = 100
+
+
+def haversine(lng, lat, lngs, lats):
+    """
+    Great-circle distances in metres from one point to arrays of points; all
+    coordinates are in radians.
+    """
+    sin_dlat = np.sin((lats - lat) / 2)
+    sin_dlng = np.sin((lngs - lng) / 2)
+    a = sin_dlat**2 + np.cos(lat) * np.cos(lats) * sin_dlng**2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def point_geojson(lng, lat):
+    return json.dumps(
+        {"type": "Point", "coordinates": [lng, lat]}, separators=(",", ":")
+    )
+
+
+def load_location_entries():
+    """
+    Return ``{school_id: (name, manager_id, lng, lat)}`` for every school.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, name, manager_id, ST_X(location), ST_Y(location) "
+            "FROM schools_school"
+        )
+        rows = cursor.fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+
+class LocationArrays:
+    """
+    Immutable snapshot of the indexed schools, sorted by latitude so that a
+    radius search only computes distances inside a latitude band.
+    """
+
+    def __init__(self, entries):
+        items = sorted(entries.items(), key=lambda item: item[1][3])
+        self.ids = np.array([school_id for school_id, _ in items], dtype=np.int64)
+        self.names = [entry[0] for _, entry in items]
+        self.manager_ids = [entry[1] for _, entry in items]
+        self.lngs_deg = np.array([entry[2] for _, entry in items], dtype=np.float64)
+        self.lats_deg = np.array([entry[3] for _, entry in items], dtype=np.float64)
+        self.lngs = np.radians(self.lngs_deg)
+        self.lats = np.radians(self.lats_deg)
+
+    def _copy(self, ids, names, manager_ids, lngs_deg, lats_deg, lngs, lats):
+        arrays = object.__new__(LocationArrays)
+        arrays.ids, arrays.names, arrays.manager_ids = ids, names, manager_ids
+        arrays.lngs_deg, arrays.lats_deg = lngs_deg, lats_deg
+        arrays.lngs, arrays.lats = lngs, lats
+        return arrays
+
+    def without(self, school_id):
+        """
+        Return a snapshot without ``school_id``, or this one when it is not
+        indexed.
+        """
+        positions = np.flatnonzero(self.ids == school_id)
+        if not len(positions):
+            return self
+        position = int(positions[0])
+        names, manager_ids = list(self.names), list(self.manager_ids)
+        del names[position], manager_ids[position]
+        return self._copy(
+            np.delete(self.ids, position),
+            names,
+            manager_ids,
+            np.delete(self.lngs_deg, position),
+            np.delete(self.lats_deg, position),
+            np.delete(self.lngs, position),
+            np.delete(self.lats, position),
+        )
+
+    def with_entry(self, school_id, entry):
+        """
+        Return a snapshot where ``school_id`` has ``(name, manager_id, lng,
+        lat)``, inserted at its place in latitude order.
+        """
+        arrays = self.without(school_id)
+        name, manager_id, lng, lat = entry
+        lng_r, lat_r = np.radians(lng), np.radians(lat)
+        position = int(np.searchsorted(arrays.lats, lat_r, side="right"))
+        names, manager_ids = list(arrays.names), list(arrays.manager_ids)
+        names.insert(position, name)
+        manager_ids.insert(position, manager_id)
+        return self._copy(
+            np.insert(arrays.ids, position, school_id),
+            names,
+            manager_ids,
+            np.insert(arrays.lngs_deg, position, lng),
+            np.insert(arrays.lats_deg, position, lat),
+            np.insert(arrays.lngs, position, lng_r),
+            np.insert(arrays.lats, position, lat_r),
+        )
+
+    def candidates(self, lat, radius_m):
+        if radius_m is None:
+            return slice(None)
+        band = radius_m / EARTH_RADIUS_M
+        start = np.searchsorted(self.lats, lat - band, side="left")
+        stop = np.searchsorted(self.lats, lat + band, side="right")
+        return slice(start, stop)
+
+    def row(self, position, distance):
+        return {
+            "id": int(self.ids[position]),
+            "name": self.names[position],
+            "manager": self.manager_ids[position],
+            "geometry": point_geojson(
+                float(self.lngs_deg[position]), float(self.lats_deg[position])
+            ),
+            "distance_km": round(float(distance) / 1000, 2),
+        }
+
+
+class SchoolLocationIndex:
+    """
+    Per-worker copy of every school location answering the same radius and
+    nearest queries as ``nearby.get_nearby_school``, with haversine distances
+    computed in NumPy instead of a PostGIS round-trip.
+
+    Saves and deletes in this worker are applied to the arrays in place, and
+    logged in the shared cache under a generation counter they bump. A worker
+    that sees a generation it did not produce replays the changes logged since
+    its own, and only reloads from the database when some are missing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._arrays = None
+        self._generation = None
+
+    def load(self):
+        entries = load_location_entries()
+        with self._lock:
+            self._entries = entries
+            self._arrays = LocationArrays(entries)
+
+    def arrays(self):
+        generation = self._current_generation()
+        if generation != self._generation or self._arrays is None:
+            if not self._replay(generation):
+                self.load()
+            self._generation = generation
+        return self._arrays
+
+    def upsert(self, school_id, name, manager_id, lng, lat):
+        self._change(school_id, (name, manager_id, lng, lat))
+
+    def remove(self, school_id):
+        self._change(school_id, None)
+
+    def _apply(self, school_id, entry):
+        # Called with the lock held. Return whether anything changed.
+        if entry is None:
+            if self._entries.pop(school_id, None) is None:
+                return False
+            if self._arrays is not None:
+                self._arrays = self._arrays.without(school_id)
+        else:
+            if self._entries.get(school_id) == entry:
+                return False
+            self._entries[school_id] = entry
+            if self._arrays is not None:
+                self._arrays = self._arrays.with_entry(school_id, entry)
+        return True
+
+    def _change(self, school_id, entry):
+        with self._lock:
+            # A worker that has not loaded yet cannot tell a change from a
+            # no-op, so it logs everything.
+            if not self._apply(school_id, entry) and self._arrays is not None:
+                return
+            generation = self._bump_generation()
+            cache.set(CHANGE_KEY.format(generation), (school_id, entry), CHANGE_TIMEOUT)
+            # Only adopt the new generation if no other worker changed anything
+            # since this one was last in sync; otherwise arrays() replays their
+            # changes and this one in order.
+            if self._generation is not None and generation == self._generation + 1:
+                self._generation = generation
+
+    def _replay(self, generation):
+        if self._arrays is None or self._generation is None:
+            return False
+        numbers = range(self._generation + 1, generation + 1)
+        if not 0 < len(numbers) <= MAX_REPLAY:
+            return False
+        keys = [CHANGE_KEY.format(number) for number in numbers]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        with self._lock:
+            for key in keys:
+                self._apply(*changes[key])
+        return True
+
+    def _current_generation(self):
+        self._add_generation()
+        return cache.get(GENERATION_KEY)
+
+    def _bump_generation(self):
+        self._add_generation()
+        return cache.incr(GENERATION_KEY)
+
+    def _add_generation(self):
+        # A counter created again after an eviction starts far from the old
+        # one, so that changes still logged under old numbers are not replayed.
+        cache.add(GENERATION_KEY, random.getrandbits(48), None)
+
+    def search(
+        self, lan, lat, radius=None, mode=nearby.RADIUS, limit=None, cursor=None
+    ):
+        """
+        Same arguments and return value as ``nearby.get_nearby_school``.
+        """
+        if mode == nearby.RADIUS and radius is None:
+            raise ValueError("A radius is required in radius mode.")
+        if mode == nearby.NEAREST and not limit:
+            raise ValueError("A limit is required in nearest mode.")
+
+        arrays = self.arrays()
+        lng_r, lat_r = np.radians(lan), np.radians(lat)
+        radius_m = radius * 1000 if radius is not None else None
+
+        window = arrays.candidates(lat_r, radius_m)
+        positions = np.arange(len(arrays.ids))[window]
+        distances = haversine(lng_r, lat_r, arrays.lngs[window], arrays.lats[window])
+        ids = arrays.ids[window]
+
+        mask = np.ones(len(positions), dtype=bool)
+        if radius_m is not None:
+            mask &= distances <= radius_m
+        if cursor:
+            after_distance, after_id = nearby.decode_cursor(cursor)
+            mask &= (distances > after_distance) | (
+                (distances == after_distance) & (ids > after_id)
+            )
+        positions, distances, ids = positions[mask], distances[mask], ids[mask]
+
+        if limit and len(distances) > limit:
+            # Keep everything up to the limit-th distance so ties are ordered
+            # by id below, like the SQL engine does.
+            kth = np.partition(distances, limit - 1)[limit - 1]
+            keep = distances <= kth
+            positions, distances, ids = positions[keep], distances[keep], ids[keep]
+
+        order = np.lexsort((ids, distances))[:limit]
+        rows = [arrays.row(positions[i], distances[i]) for i in order]
+
+        next_cursor = None
+        if limit and len(order) == limit:
+            last = order[-1]
+            next_cursor = nearby.encode_cursor(float(distances[last]), int(ids[last]))
+        return rows, next_cursor
+
+
+school_location_index = SchoolLocationIndex()
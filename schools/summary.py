@@ -0,0 +1,126 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Class, SchoolSummary
+
+COUNTERS = (
+    "classes",
+    "students",
+    "teachers",
+    "assignments",
+    "ungraded_solutions",
+    "news",
+)
+
+# One row of counters per school, recomputed from the source tables. Used to
+# create missing rows, after structural changes such as a class moving to
+# another school, and by the rebuild_school_summaries command.
+SUMMARY_SQL = """
+    SELECT school.id,
+           (SELECT count(*) FROM schools_class AS school_class
+            WHERE school_class.school_id = school.id) AS classes,
+           (SELECT count(DISTINCT enrollment.user_id)
+            FROM schools_class_students AS enrollment
+            JOIN schools_class AS school_class ON school_class.id = enrollment.class_id
+            WHERE school_class.school_id = school.id) AS students,
+           (SELECT count(DISTINCT school_class.teacher_id) FROM schools_class AS school_class
+            WHERE school_class.school_id = school.id) AS teachers,
+           (SELECT count(*) FROM assignments_assignment AS assignment
+            JOIN schools_class AS school_class ON school_class.id = assignment.class_obj_id
+            WHERE school_class.school_id = school.id) AS assignments,
+           (SELECT count(*) FROM assignments_solution AS solution
+            JOIN assignments_assignment AS assignment
+              ON assignment.id = solution.assignment_id
+            JOIN schools_class AS school_class ON school_class.id = assignment.class_obj_id
+            WHERE school_class.school_id = school.id
+              AND solution.grade IS NULL) AS ungraded_solutions,
+           (SELECT count(*) FROM news_news AS news
+            LEFT JOIN schools_class AS school_class ON school_class.id = news.class_obj_id
+            WHERE coalesce(news.school_id, school_class.school_id) = school.id) AS news
+    FROM schools_school AS school
+    {where}
+    ORDER BY school.id
+"""
+
+
+def compute_summaries(school_ids=None):
+    """
+    Return ``{school_id: {counter: value}}`` computed from the source tables,
+    for every school or only ``school_ids``.
+    """
+    where, params = "", []
+    if school_ids is not None:
+        where, params = "WHERE school.id = ANY(%s)", [list(school_ids)]
+    with connection.cursor() as cursor:
+        cursor.execute(SUMMARY_SQL.format(where=where), params)
+        rows = cursor.fetchall()
+    return {row[0]: dict(zip(COUNTERS, row[1:])) for row in rows}
+
+
+def rebuild_school_summary(*school_ids):
+    school_ids = {school_id for school_id in school_ids if school_id is not None}
+    if not school_ids:
+        return
+    for school_id, counts in compute_summaries(school_ids).items():
+        SchoolSummary.objects.update_or_create(school_id=school_id, defaults=counts)
+
+
+def rebuild_school_summary_on_commit(*school_ids):
+    # Deferred so that a school deleted in the same transaction, whose summary
+    # row is deleted with it, does not get a new one.
+    transaction.on_commit(lambda: rebuild_school_summary(*school_ids))
+
+
+def adjust_school_summary(school_id, **deltas):
+    """
+    Add ``deltas`` to the counters of a school. A school without a summary row
+    yet gets one computed from scratch after the commit.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if school_id is None or not deltas:
+        return
+    updated = SchoolSummary.objects.filter(school_id=school_id).update(
+        updated_at=timezone.now(),
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+    if not updated:
+        rebuild_school_summary_on_commit(school_id)
+
+
+MEMBERS_SQL = """
+    SELECT school_class.school_id,
+           count(DISTINCT enrollment.user_id) AS students,
+           count(DISTINCT school_class.teacher_id) AS teachers
+    FROM schools_class AS school_class
+    LEFT JOIN schools_class_students AS enrollment ON enrollment.class_id = school_class.id
+    WHERE school_class.school_id = ANY(%s)
+    GROUP BY school_class.school_id
+"""
+
+
+def refresh_member_counts(*school_ids):
+    """
+    Recount the distinct students and teachers of schools whose enrollments or
+    teachers changed: a user can belong to several classes of one school, so
+    a single enrollment does not tell whether the school count moves.
+    """
+    school_ids = {school_id for school_id in school_ids if school_id is not None}
+    if not school_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(MEMBERS_SQL, [list(school_ids)])
+        counts = {row[0]: row[1:] for row in cursor.fetchall()}
+    for school_id in school_ids:
+        students, teachers = counts.get(school_id, (0, 0))
+        updated = SchoolSummary.objects.filter(school_id=school_id).update(
+            students=students, teachers=teachers, updated_at=timezone.now()
+        )
+        if not updated:
+            rebuild_school_summary_on_commit(school_id)
+
+
+def class_school_ids(class_ids):
+    return set(
+        Class.objects.filter(pk__in=class_ids).values_list("school_id", flat=True)
+    )
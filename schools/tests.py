@@ -1,11 +1,31 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.contrib.gis.geos import Point
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APIClient, APITestCase
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from assignments.models import Assignment, Solution
+from news.models import News
 
-from .models import Class, School
+from .catchments import ZOOM_LEVELS
+from .models import Class, Lesson, School
+from .nearby import get_nearby_school
+from .renderers import MVTRenderer
+from .rosters import ROSTER_FIELDS
+from .spatial_index import SchoolLocationIndex, school_location_index
+from .tiles import tile_cache, tile_for_point
 
 User = get_user_model()
 
@@ -44,6 +64,29 @@ class SchoolViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data), 1)
 
+    def test_list_schools_as_geojson(self):
+        self.authenticate_as_admin()
+        School.objects.create(name="Second", location=Point(11.5, 21.25))
+        url = reverse("school-list")
+        expected = json.loads(self.client.get(url, {"limit": 1, "offset": 1}).content)
+        response = self.client.get(
+            url, {"limit": 1, "offset": 1}, HTTP_ACCEPT="application/geo+json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        self.assertEqual(json.loads(response.content), expected)
+        self.assertEqual(
+            expected["results"]["features"][0]["properties"]["name"], "Second"
+        )
+
+    def test_list_schools_as_geojson_is_scoped_to_manager(self):
+        manager_group, _ = Group.objects.get_or_create(name="manager")
+        self.user.groups.add(manager_group)
+        School.objects.create(name="Other", location=Point(11.5, 21.25))
+        response = self.client.get(reverse("school-list"), {"format": "geojson"})
+        features = json.loads(response.content)["results"]["features"]
+        self.assertEqual([f["id"] for f in features], [self.school.id])
+
     def test_create_school(self):
         url = reverse("school-list")
         self.authenticate_as_admin()
@@ -171,6 +214,179 @@ class SchoolViewSetTests(APITestCase):
         self.assertEqual(names[0], self.school.name)
         self.assertEqual(names[1], far_school.name)
 
+    def test_nearest_nearby_pages_with_cursor(self):
+        manager1 = User.objects.create_user(
+            username="manager1",
+            password="pass1234",
+            email="avv@b.com",
+            national_id="1234567790",
+        )
+        second = School.objects.create(
+            name="Second", manager=manager1, location=Point(10.0, 20.5)
+        )
+        url = reverse("school-nearby")
+        data = {"lng": 10.0, "lat": 20.0, "mode": "nearest", "limit": 1}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([s["id"] for s in response.data], [self.school.id])
+
+        data["cursor"] = response["X-Next-Cursor"]
+        response = self.client.post(url, data, format="json")
+        self.assertEqual([s["id"] for s in response.data], [second.id])
+        self.assertGreater(response.data[0]["distance_km"], 50)
+
+    def test_nearest_nearby_requires_limit(self):
+        url = reverse("school-nearby")
+        data = {"lng": 10.0, "lat": 20.0, "mode": "nearest"}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_nearby_streams_results_per_point(self):
+        url = reverse("school-nearby-batch")
+        data = {
+            "radius": 50,
+            "points": [
+                {"lng": 10.0, "lat": 20.0},
+                {"lng": -40.0, "lat": -20.0},
+                {"lng": 10.0, "lat": 20.3, "radius": 10},
+            ],
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(set(results), {"0", "1", "2"})
+        self.assertEqual([s["id"] for s in results["0"]], [self.school.id])
+        self.assertEqual(results["1"], [])
+        self.assertEqual(results["2"], [])
+
+    def test_batch_nearby_requires_points(self):
+        url = reverse("school-nearby-batch")
+        response = self.client.post(url, {"points": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_students_roster(self):
+        manager_group, _ = Group.objects.get_or_create(name="manager")
+        student_group, _ = Group.objects.get_or_create(name="student")
+        self.user.groups.add(manager_group)
+        first = Class.objects.create(name="First", school=self.school)
+        second = Class.objects.create(name="Second", school=self.school)
+        students = []
+        for number, last_name in enumerate(["Young", "Adams", "Baker"]):
+            student = User.objects.create_user(
+                username="student{}".format(number),
+                password="s",
+                email="s{}@b.com".format(number),
+                national_id="55500000{}0".format(number),
+                last_name=last_name,
+            )
+            student.groups.add(student_group)
+            students.append(student)
+        first.students.add(*students)
+        second.students.add(students[0])
+
+        url = reverse("school-students", args=[self.school.id])
+        response = self.client.get(url, {"limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(
+            [row["last_name"] for row in response.data["results"]], ["Adams", "Baker"]
+        )
+        self.assertEqual(set(response.data["results"][0]), set(ROSTER_FIELDS))
+
+        response = self.client.get(url, {"search": "youn"})
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [students[0].id]
+        )
+        response = self.client.get(url, {"class": second.id})
+        self.assertEqual(
+            [row["id"] for row in response.data["results"]], [students[0].id]
+        )
+
+    def test_autocomplete(self):
+        School.objects.create(name="Quillfield Academy", location=Point(30.0, 40.0))
+        School.objects.create(name="Quillfield Primary", location=Point(10.0, 20.1))
+        School.objects.create(name="Riverside", location=Point(10.0, 20.0))
+        url = reverse("school-autocomplete")
+
+        response = self.client.get(url, {"q": "quillf"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [s["name"] for s in response.data]
+        self.assertEqual(sorted(names), ["Quillfield Academy", "Quillfield Primary"])
+
+        response = self.client.get(url, {"q": "quillfield", "lat": 20.0, "lng": 10.0})
+        self.assertEqual(response.data[0]["name"], "Quillfield Primary")
+        self.assertLess(response.data[0]["distance_km"], 20)
+
+    def test_autocomplete_cache_is_shared_nearby(self):
+        cache.clear()
+        School.objects.create(name="Quillfield Primary", location=Point(10.0, 20.1))
+        url = reverse("school-autocomplete")
+        self.client.get(url, {"q": "Quillfield", "lat": 20.001, "lng": 10.001})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, {"q": " quillfield", "lat": 19.999, "lng": 10.004, "limit": 1}
+            )
+        self.assertEqual([s["name"] for s in response.data], ["Quillfield Primary"])
+
+    def test_autocomplete_requires_both_coordinates(self):
+        url = reverse("school-autocomplete")
+        response = self.client.get(url, {"q": "school", "lat": 20.0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_assign_nearest_schools(self):
+        manager1 = User.objects.create_user(
+            username="manager1",
+            password="pass1234",
+            email="avv@b.com",
+            national_id="1234567790",
+        )
+        other = School.objects.create(
+            name="Other", manager=manager1, location=Point(12.0, 20.0)
+        )
+        upload = SimpleUploadedFile(
+            "points.csv",
+            b"id,lng,lat\na,10.1,20.0\nb,11.9,20.0\nc,10.0,30.0\n",
+            content_type="text/csv",
+        )
+        self.authenticate_as_admin()
+        url = reverse("school-assign-nearest")
+        response = self.client.post(
+            url, {"file": upload, "max_distance": 100}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(response.content.decode())))
+        self.assertEqual(
+            [(row["id"], row["school_id"]) for row in rows],
+            [("a", str(self.school.id)), ("b", str(other.id)), ("c", "")],
+        )
+
+    def test_assign_nearest_schools_rejects_malformed_geojson(self):
+        self.authenticate_as_admin()
+        url = reverse("school-assign-nearest")
+        for collection in (
+            {"type": "FeatureCollection", "features": {"type": "Feature"}},
+            {"type": "FeatureCollection", "features": ["feature"]},
+            {"features": [{"geometry": "Point"}]},
+            {"features": [{"geometry": {"type": "Point"}}]},
+            {"features": [{"geometry": {"type": "Point", "coordinates": 10.1}}]},
+            {"features": [{"geometry": {"type": "Point", "coordinates": [10.1]}}]},
+        ):
+            upload = SimpleUploadedFile(
+                "points.geojson",
+                json.dumps(collection).encode(),
+                content_type="application/geo+json",
+            )
+            response = self.client.post(url, {"file": upload}, format="multipart")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("file", response.data)
+
+    def test_assign_nearest_schools_is_admin_only(self):
+        upload = SimpleUploadedFile("points.csv", b"id,lng,lat\na,10.1,20.0\n")
+        url = reverse("school-assign-nearest")
+        response = self.client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
 
 class ClassViewSetTests(APITestCase):
     def setUp(self):
@@ -222,6 +438,36 @@ class ClassViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data), 1)
 
+    def test_list_classes_is_compact_by_default(self):
+        self.classroom.students.add(self.student)
+        response = self.client.get(reverse("class-list"))
+        row = response.data["results"][0]
+        self.assertEqual(row["student_count"], 1)
+        self.assertNotIn("students", row)
+
+        response = self.client.get(reverse("class-list"), {"expand": "students"})
+        row = response.data["results"][0]
+        self.assertEqual([s["id"] for s in row["students"]], [self.student.id])
+        self.assertNotIn("lessons", row)
+
+    def test_expanded_class_list_uses_fixed_queries(self):
+        self.authenticate_as_admin()
+        url = reverse("class-list")
+        params = {"expand": "students,lessons"}
+        self.client.get(url, params)
+        with CaptureQueriesContext(connection) as one_class:
+            self.client.get(url, params)
+
+        lesson = Lesson.objects.create(name="Math")
+        for number in range(3):
+            classroom = Class.objects.create(name=str(number), school=self.school)
+            classroom.students.add(self.student)
+            classroom.lessons.add(lesson)
+        with CaptureQueriesContext(connection) as four_classes:
+            response = self.client.get(url, params)
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertEqual(len(four_classes), len(one_class))
+
     def test_create_class(self):
         self.authenticate_as_admin()
         url = reverse("class-list")
@@ -262,3 +508,555 @@ class ClassViewSetTests(APITestCase):
             url, data={"national_id": self.student.national_id}, format="json"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_students(self):
+        url = reverse("class-bulk-students", args=[self.classroom.id])
+        data = {"add": [self.student.national_id, self.user.national_id, "0000000000"]}
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["added"], 1)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["added", "not_found", "not_found"],
+        )
+        self.assertEqual(list(self.classroom.students.all()), [self.student])
+
+        data = {"add": [self.student.national_id], "remove": ["0000000000"]}
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["already_enrolled", "not_found"],
+        )
+
+        data = {"remove": [self.student.national_id]}
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.data["removed"], 1)
+        self.assertFalse(self.classroom.students.exists())
+
+    def test_replace_roster(self):
+        url = reverse("class-roster", args=[self.classroom.id])
+        data = {"students": [self.student.national_id, "0000000000"]}
+        response = self.client.put(url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data, {"added": 1, "removed": 0, "not_found": ["0000000000"]}
+        )
+        self.assertEqual(list(self.classroom.students.all()), [self.student])
+
+        response = self.client.put(url, data=data, format="json")
+        self.assertEqual(response.data["added"], 0)
+
+        response = self.client.put(url, data={"students": []}, format="json")
+        self.assertEqual(response.data["removed"], 1)
+        self.assertFalse(self.classroom.students.exists())
+
+    def test_roster_sync(self):
+        other = Class.objects.create(
+            name="Other Class", school=self.school, teacher=self.user
+        )
+        other.students.add(self.student)
+        self.authenticate_as_admin()
+        data = {
+            "rosters": [
+                {"class": self.classroom.id, "students": [self.student.national_id]},
+                {"class": other.id, "students": []},
+            ]
+        }
+        response = self.client.post(reverse("class-roster-sync"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {
+                row["class"]: (row["added"], row["removed"])
+                for row in response.data["results"]
+            },
+            {self.classroom.id: (1, 0), other.id: (0, 1)},
+        )
+        self.assertEqual(list(self.student.class_students.all()), [self.classroom])
+
+        data = {"rosters": [{"class": 0, "students": []}]}
+        response = self.client.post(reverse("class-roster-sync"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rosters_are_not_changed_by_students_or_teachers(self):
+        self.classroom.students.add(self.student)
+        self.client.force_authenticate(user=self.student)
+        url = reverse("class-roster", args=[self.classroom.id])
+        response = self.client.put(url, data={"students": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        teacher = User.objects.create_user(
+            username="teacher2",
+            password="t",
+            email="t2@b.com",
+            national_id="1134567891",
+        )
+        teacher.groups.add(Group.objects.get(name="teacher"))
+        other = Class.objects.create(name="Other", school=self.school, teacher=teacher)
+        self.client.force_authenticate(user=teacher)
+        data = {"rosters": [{"class": other.id, "students": []}]}
+        response = self.client.post(reverse("class-roster-sync"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(list(self.classroom.students.all()), [self.student])
+
+    def test_add_lesson_reuses_normalized_name(self):
+        lesson = Lesson.objects.create(name="Math")
+        url = reverse("class-add-lesson", args=[self.classroom.id])
+        response = self.client.post(url, {"name": "  MATH "}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.classroom.lessons.all()), [lesson])
+        self.assertEqual(Lesson.objects.count(), 1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Lesson.objects.create(name="math")
+
+    def test_class_is_loaded_once_per_request(self):
+        manager = User.objects.create_user(
+            username="principal",
+            password="p",
+            email="p@b.com",
+            national_id="1212121212",
+        )
+        manager.groups.add(Group.objects.get_or_create(name="manager")[0])
+        self.school.manager = manager
+        self.school.save()
+        self.client.force_authenticate(user=manager)
+        url = reverse("class-lessons", args=[self.classroom.id])
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        class_loads = [
+            query["sql"]
+            for query in queries.captured_queries
+            if 'FROM "schools_class" ' in query["sql"]
+        ]
+        # IsManagerOfClass loads the class and the view reuses it.
+        self.assertEqual(len(class_loads), 1)
+
+        # Admins see every class but are none of its teacher, students or
+        # manager: the permission classes of the action do run.
+        self.authenticate_as_admin()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_timetable(self):
+        Lesson.objects.create(name="Math")
+        self.authenticate_as_admin()
+        content = (
+            "school,class,teacher,lessons\n"
+            f"{self.school.id},7A,{self.user.national_id},Math;Art\n"
+            f"{self.school.id},7B,,Art\n"
+        )
+        upload = SimpleUploadedFile("timetable.csv", content.encode())
+        response = self.client.post(
+            reverse("class-import"), {"file": upload}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data, {"classes": 2, "lessons": 1, "class_lessons": 3}
+        )
+        created = Class.objects.get(name="7A")
+        self.assertEqual(created.teacher, self.user)
+        self.assertEqual(
+            sorted(created.lessons.values_list("name", flat=True)), ["Art", "Math"]
+        )
+        self.assertEqual(Lesson.objects.filter(name="Math").count(), 1)
+
+    def test_import_timetable_reports_every_invalid_row(self):
+        self.authenticate_as_admin()
+        content = (
+            "school,class,teacher,lessons\n"
+            f"{self.school.id},Test Class,,\n"
+            f"0,8A,{self.student.national_id},\n"
+            f"{self.school.id},8B,,Math\n"
+        )
+        upload = SimpleUploadedFile("timetable.csv", content.encode())
+        response = self.client.post(
+            reverse("class-import"), {"file": upload}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1, 2])
+        self.assertEqual(len(response.data["errors"][1]["errors"]), 2)
+        self.assertFalse(Class.objects.filter(name="8B").exists())
+
+    def test_import_timetable_rejects_non_decimal_school_ids(self):
+        self.authenticate_as_admin()
+        content = "school,class,teacher,lessons\n\u00b2,8A,,\n"
+        upload = SimpleUploadedFile("timetable.csv", content.encode())
+        response = self.client.post(
+            reverse("class-import"), {"file": upload}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1])
+
+    def test_import_timetable_is_admin_only(self):
+        content = f"school,class,teacher,lessons\n{self.school.id},8C,,Math\n"
+        for user in (self.student, self.user):
+            self.client.force_authenticate(user=user)
+            upload = SimpleUploadedFile("timetable.csv", content.encode())
+            response = self.client.post(
+                reverse("class-import"), {"file": upload}, format="multipart"
+            )
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Class.objects.filter(name="8C").exists())
+        self.assertFalse(Lesson.objects.filter(name="Math").exists())
+
+    def test_bulk_students_is_teacher_only(self):
+        self.classroom.students.add(self.student)
+        self.client.force_authenticate(user=self.student)
+        url = reverse("class-bulk-students", args=[self.classroom.id])
+        data = {"remove": [self.student.national_id]}
+        response = self.client.post(url, data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(list(self.classroom.students.all()), [self.student])
+
+    def test_bulk_students_requires_ids(self):
+        url = reverse("class-bulk-students", args=[self.classroom.id])
+        response = self.client.post(url, data={}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def create_graded_assignment(self, title, max_grade, grades):
+        lesson, _ = Lesson.objects.get_or_create(name="Math")
+        assignment = Assignment.objects.create(
+            title=title,
+            grade=max_grade,
+            deadline=date.today() - timedelta(days=1),
+            lesson=lesson,
+            class_obj=self.classroom,
+        )
+        for student, grade in grades.items():
+            Solution.objects.create(
+                context="answer", student=student, assignment=assignment, grade=grade
+            )
+        return assignment
+
+    def test_gradebook(self):
+        other = User.objects.create_user(
+            username="other", password="o", email="o@b.com", national_id="1239567890"
+        )
+        self.classroom.students.add(self.student, other)
+        first = self.create_graded_assignment("Quiz", 20, {self.student: 10})
+        second = self.create_graded_assignment(
+            "Exam", 50, {self.student: 50, other: 25}
+        )
+
+        url = reverse("class-gradebook", args=[self.classroom.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [a["id"] for a in response.data["assignments"]], [first.id, second.id]
+        )
+        self.assertEqual(
+            [a["average"] for a in response.data["assignments"]], [10.0, 37.5]
+        )
+        rows = {row["id"]: row for row in response.data["students"]}
+        self.assertEqual(rows[self.student.id]["grades"], [10.0, 50.0])
+        self.assertEqual(rows[self.student.id]["average"], 75.0)
+        self.assertEqual(rows[other.id]["grades"], [None, 25.0])
+        self.assertEqual(rows[other.id]["average"], 50.0)
+        self.assertEqual(response.data["average"], 66.67)
+
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_gradebook_csv_export(self):
+        self.classroom.students.add(self.student)
+        self.create_graded_assignment("Quiz", 20, {self.student: 15})
+
+        url = reverse("class-gradebook-export", args=[self.classroom.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][-2:], ["Quiz", "Average (%)"])
+        self.assertEqual(rows[1][:2], [str(self.student.id), "student"])
+        self.assertEqual(rows[1][-2:], ["15.0", "75.0"])
+        self.assertEqual(rows[2][-2:], ["15.0", "75.0"])
+
+        response = self.client.get(url, {"output": "pdf"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.student)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_gradebook_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        self.classroom.students.add(self.student)
+        self.create_graded_assignment("Quiz", 20, {self.student: 15})
+
+        url = reverse("class-gradebook-export", args=[self.classroom.id])
+        response = self.client.get(url, {"output": "xlsx"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Disposition"].endswith('.xlsx"'))
+        workbook = load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook["Gradebook"].values)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][:2], ("Student ID", "Username"))
+        self.assertEqual(rows[0][-2:], ("Quiz", "Average (%)"))
+        self.assertEqual(rows[1][:2], (self.student.id, "student"))
+        self.assertEqual(rows[1][-2:], (15, 75))
+        self.assertEqual(rows[2][1], "Average")
+        self.assertEqual(rows[2][-2:], (15, 75))
+
+
+@override_settings(SCHOOL_LOCATION_INDEX=True)
+class SchoolLocationIndexTests(APITransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user",
+            password="u",
+            email="u@b.com",
+            national_id="1234567890",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.near = School.objects.create(name="Near", location=Point(10.0, 20.0))
+        self.far = School.objects.create(name="Far", location=Point(10.0, 20.5))
+        school_location_index.load()
+
+    def nearby_ids(self, **data):
+        data = dict({"lng": 10.0, "lat": 20.0}, **data)
+        response = self.client.post(reverse("school-nearby"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [s["id"] for s in response.data]
+
+    def test_matches_database_engine(self):
+        for params in [
+            {"lan": 10.0, "lat": 20.0, "radius": 100},
+            {"lan": 10.0, "lat": 20.0, "mode": "nearest", "limit": 1},
+        ]:
+            indexed, _ = school_location_index.search(**params)
+            queried, _ = get_nearby_school(**params)
+            self.assertEqual([s["id"] for s in indexed], [s["id"] for s in queried])
+            for a, b in zip(indexed, queried):
+                self.assertAlmostEqual(a["distance_km"], b["distance_km"], delta=0.5)
+
+    def test_answers_without_database(self):
+        self.nearby_ids(radius=10)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nearby_ids(radius=10), [self.near.id])
+            self.assertEqual(
+                self.nearby_ids(mode="nearest", limit=2), [self.near.id, self.far.id]
+            )
+
+    def test_follows_location_changes(self):
+        self.far.location = Point(10.0, 20.01)
+        self.far.save()
+        self.assertEqual(self.nearby_ids(radius=10), [self.near.id, self.far.id])
+
+    def test_other_workers_replay_changes(self):
+        worker = SchoolLocationIndex()
+        worker.arrays()
+        self.far.location = Point(10.0, 20.01)
+        self.far.save()
+        self.near.delete()
+        with self.assertNumQueries(0):
+            rows, _ = worker.search(10.0, 20.0, radius=10)
+        self.assertEqual([row["id"] for row in rows], [self.far.id])
+
+        self.near.delete()
+        self.assertEqual(self.nearby_ids(radius=10), [self.far.id])
+
+
+class SchoolTileTests(APITransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user",
+            password="u",
+            email="u@b.com",
+            national_id="1234567890",
+        )
+        self.client.force_authenticate(user=self.user)
+        self.school = School.objects.create(name="Tiled", location=Point(10.0, 20.0))
+        tile_cache().clear()
+
+    def get_tile(self, z, lng=10.0, lat=20.0):
+        x, y = tile_for_point(lng, lat, z)
+        return self.client.get(reverse("school-tile", args=[z, x, y]))
+
+    def test_renders_clustered_and_plain_tiles(self):
+        School.objects.create(name="Neighbour", location=Point(10.001, 20.001))
+        for z in (2, 16):
+            response = self.get_tile(z)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], MVTRenderer.media_type)
+            self.assertIn(b"schools", response.content)
+        self.assertIn(b"Neighbour", self.get_tile(16).content)
+        self.assertNotIn(b"Neighbour", self.get_tile(2).content)
+
+    def test_invalid_tile(self):
+        response = self.client.get(reverse("school-tile", args=[3, 8, 0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_moved_school_invalidates_its_tiles(self):
+        self.assertIn(b"Tiled", self.get_tile(16).content)
+        self.school.location = Point(-40.0, -20.0)
+        self.school.save()
+        self.assertNotIn(b"Tiled", self.get_tile(16).content)
+        self.assertIn(b"Tiled", self.get_tile(16, lng=-40.0, lat=-20.0).content)
+
+
+class CatchmentTests(APITransactionTestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin",
+            email="admin@admin.com",
+            password="admin",
+            national_id="1111111111",
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        self.school = School.objects.create(
+            name="Catchment",
+            location=Point(10.0, 20.0),
+            catchment=MultiPolygon(Polygon.from_bbox((9.5, 19.5, 10.5, 20.5))),
+        )
+
+    def lookup(self, lng, lat):
+        url = reverse("school-catchment-lookup")
+        response = self.client.post(url, {"lng": lng, "lat": lat}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_lookup(self):
+        self.assertEqual(self.lookup(10.2, 20.2), [self.school.id])
+        self.assertEqual(self.lookup(11.0, 20.0), [])
+
+    def test_batch_lookup(self):
+        url = reverse("school-catchment-lookup-batch")
+        data = {"points": [{"lng": 11.0, "lat": 20.0}, {"lng": 10.0, "lat": 20.5}]}
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.data, {"0": [], "1": [self.school.id]})
+
+    def test_simplified_catchments_per_zoom(self):
+        self.assertEqual(
+            sorted(
+                self.school.catchment_simplifications.values_list("zoom", flat=True)
+            ),
+            list(ZOOM_LEVELS),
+        )
+        for zoom in (0, 9, 18):
+            response = self.client.get(reverse("school-catchments"), {"zoom": zoom})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            features = json.loads(response.content)["features"]
+            self.assertEqual([f["id"] for f in features], [self.school.id])
+
+        response = self.client.get(
+            reverse("school-catchments"), {"bbox": "30,30,31,31"}
+        )
+        self.assertEqual(json.loads(response.content)["features"], [])
+
+    def test_changed_catchment_is_used_for_lookups(self):
+        self.assertEqual(self.lookup(10.2, 20.2), [self.school.id])
+        url = reverse("school-catchment", args=[self.school.id])
+        data = {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]],
+            },
+            "properties": {},
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.lookup(10.2, 20.2), [])
+        self.assertEqual(self.lookup(0.5, 0.5), [self.school.id])
+
+    def test_catchment_is_set_by_admins_only(self):
+        manager = User.objects.create_user(
+            username="manager",
+            password="m",
+            email="m@b.com",
+            national_id="1234567890",
+        )
+        manager.groups.add(Group.objects.get_or_create(name="manager")[0])
+        self.school.manager = manager
+        self.school.save()
+        self.client.force_authenticate(user=manager)
+        url = reverse("school-catchment", args=[self.school.id])
+        data = {"type": "Feature", "geometry": None, "properties": {}}
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.lookup(10.2, 20.2), [self.school.id])
+
+
+class SchoolSummaryTests(APITransactionTestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(
+            username="manager",
+            password="m",
+            email="m@b.com",
+            national_id="1234567890",
+        )
+        manager_group, _ = Group.objects.get_or_create(name="manager")
+        self.manager.groups.add(manager_group)
+        self.client.force_authenticate(user=self.manager)
+        self.school = School.objects.create(
+            name="Summary", manager=self.manager, location=Point(10.0, 20.0)
+        )
+
+    def create_user(self, username, national_id):
+        return User.objects.create_user(
+            username=username,
+            password="p",
+            email="{}@b.com".format(username),
+            national_id=national_id,
+        )
+
+    def test_counters_follow_changes(self):
+        teacher = self.create_user("teacher", "2000000000")
+        student = self.create_user("student", "3000000000")
+        first = Class.objects.create(name="A", school=self.school, teacher=teacher)
+        second = Class.objects.create(name="B", school=self.school, teacher=teacher)
+        first.students.add(student)
+        second.students.add(student)
+
+        lesson = Lesson.objects.create(name="Math")
+        assignment = Assignment.objects.create(
+            title="Homework",
+            grade=20,
+            deadline=date.today() + timedelta(days=1),
+            lesson=lesson,
+            class_obj=first,
+        )
+        Assignment.objects.create(
+            title="Past",
+            grade=20,
+            deadline=date.today() - timedelta(days=1),
+            lesson=lesson,
+            class_obj=first,
+        )
+        solution = Solution.objects.create(student=student, assignment=assignment)
+        News.objects.create(
+            title="Hello", content="...", creator=self.manager, school=self.school
+        )
+        News.objects.create(
+            title="Class", content="...", creator=teacher, class_obj=second
+        )
+
+        url = reverse("school-summary", args=[self.school.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = {
+            "classes": 2,
+            "students": 1,
+            "teachers": 1,
+            "assignments": 2,
+            "open_assignments": 1,
+            "ungraded_solutions": 1,
+            "news": 2,
+        }
+        self.assertEqual({k: response.data[k] for k in expected}, expected)
+
+        solution.grade = 18
+        solution.save()
+        first.students.remove(student)
+        second.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.data["ungraded_solutions"], 0)
+        self.assertEqual(response.data["students"], 0)
+        self.assertEqual(response.data["classes"], 1)
+        self.assertEqual(response.data["news"], 1)
+
+        call_command("rebuild_school_summaries", "--check", stdout=io.StringIO())
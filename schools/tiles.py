@@ -0,0 +1,133 @@
+import math
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+MAX_ZOOM = 22
+# Up to this zoom level, schools sharing a grid cell are rendered as one
+# clustered point; above it every school is a point of its own.
+CLUSTER_MAX_ZOOM = 12
+# Grid cells per tile side when clustering. Cells are aligned on the tile grid
+# so that a cluster never spans two tiles.
+CLUSTER_CELLS = 16
+
+EXTENT = 4096
+BUFFER = 64
+LAYER = "schools"
+WORLD_SIZE = 2 * 20037508.342789244
+MAX_LATITUDE = 85.0511287798066
+
+CACHE_KEY = "school-tile:{}/{}/{}"
+
+TILE_POINTS_SQL = """
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom
+    ),
+    points AS (
+        SELECT school.id, school.name, ST_Transform(school.location, 3857) AS geom
+        FROM schools_school AS school, bounds
+        WHERE school.location && ST_Transform(bounds.geom, 4326)
+    )
+"""
+
+SCHOOLS_TILE_SQL = (
+    TILE_POINTS_SQL
+    + """
+    SELECT ST_AsMVT(tile, %(layer)s, %(extent)s, 'geom')
+    FROM (
+        SELECT points.id, points.name, 1 AS count,
+               ST_AsMVTGeom(points.geom, bounds.geom, %(extent)s, %(buffer)s, true)
+               AS geom
+        FROM points, bounds
+    ) AS tile
+"""
+)
+
+CLUSTERS_TILE_SQL = (
+    TILE_POINTS_SQL
+    + """
+    , clusters AS (
+        SELECT min(points.id) AS id, count(*) AS count,
+               ST_Centroid(ST_Collect(points.geom)) AS geom
+        FROM points
+        GROUP BY ST_SnapToGrid(points.geom, -%(half_world)s, -%(half_world)s,
+                               %(cell)s, %(cell)s)
+    )
+    SELECT ST_AsMVT(tile, %(layer)s, %(extent)s, 'geom')
+    FROM (
+        SELECT clusters.id, clusters.count,
+               ST_AsMVTGeom(clusters.geom, bounds.geom, %(extent)s, %(buffer)s, true)
+               AS geom
+        FROM clusters, bounds
+    ) AS tile
+"""
+)
+
+
+def tile_cache():
+    return caches[settings.SCHOOL_TILE_CACHE]
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_for_point(lng, lat, z):
+    """
+    Return the ``(x, y)`` of the zoom ``z`` tile containing (``lng``, ``lat``).
+    """
+    n = 2**z
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+    x = int((lng + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def render_tile(z, x, y):
+    """
+    Render the ``schools`` layer of a tile. Clustered points carry the lowest
+    school id and the number of schools in ``count``; single schools also
+    carry their ``name``.
+    """
+    params = {
+        "z": z,
+        "x": x,
+        "y": y,
+        "layer": LAYER,
+        "extent": EXTENT,
+        "buffer": BUFFER,
+    }
+    if z <= CLUSTER_MAX_ZOOM:
+        sql = CLUSTERS_TILE_SQL
+        params.update(half_world=WORLD_SIZE / 2, cell=WORLD_SIZE / 2**z / CLUSTER_CELLS)
+    else:
+        sql = SCHOOLS_TILE_SQL
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        tile = cursor.fetchone()[0]
+    return bytes(tile or b"")
+
+
+def get_tile(z, x, y):
+    cache = tile_cache()
+    key = CACHE_KEY.format(z, x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(z, x, y)
+        cache.set(key, tile, settings.SCHOOL_TILE_TIMEOUT)
+    return tile
+
+
+def invalidate_tiles(*points):
+    """
+    Drop the cached tiles of every zoom level containing one of ``points``,
+    given as ``(lng, lat)`` pairs.
+    """
+    keys = set()
+    for lng, lat in points:
+        for z in range(MAX_ZOOM + 1):
+            keys.add(CACHE_KEY.format(z, *tile_for_point(lng, lat, z)))
+    if keys:
+        tile_cache().delete_many(list(keys))
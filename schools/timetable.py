@@ -0,0 +1,184 @@
+import csv
+import json
+
+from django.db import transaction
+
+from users.authorization import membership_changed
+from users.models import User
+
+from .lessons import lesson_catalog
+from .models import Class, School, normalize_lesson_name
+from .summary import rebuild_school_summary_on_commit
+
+CSV = "csv"
+JSON = "json"
+FORMATS = (CSV, JSON)
+
+# Separator of the lesson names in the ``lessons`` column of CSV files.
+LESSON_SEPARATOR = ";"
+
+NAME_MAX_LENGTH = 255
+
+
+class TimetableFormatError(ValueError):
+    pass
+
+
+def guess_format(filename):
+    if filename and filename.lower().endswith(".json"):
+        return JSON
+    return CSV
+
+
+def read_timetable(file, format=CSV):
+    """
+    Read the rows of a timetable file as dicts with ``school``, ``class``,
+    ``teacher`` and ``lessons`` keys, numbered from 1 in ``row``.
+
+    CSV files need ``school`` and ``class`` columns and may have ``teacher``
+    (national id) and ``lessons`` (names separated by ``;``) columns. JSON files
+    are lists of objects with the same keys, ``lessons`` being a list.
+    """
+    if format == JSON:
+        return list(_read_json(file))
+    return list(_read_csv(file))
+
+
+def _read_csv(file):
+    reader = csv.DictReader(file)
+    if not reader.fieldnames or not {"school", "class"} <= set(reader.fieldnames):
+        raise TimetableFormatError("The CSV file needs `school` and `class` columns.")
+    for number, row in enumerate(reader, start=1):
+        lessons = (row.get("lessons") or "").split(LESSON_SEPARATOR)
+        yield _row(number, row["school"], row["class"], row.get("teacher"), lessons)
+
+
+def _read_json(file):
+    try:
+        rows = json.load(file)
+    except ValueError:
+        raise TimetableFormatError("The file is not valid JSON.")
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise TimetableFormatError("The JSON file needs a list of objects.")
+    for number, row in enumerate(rows, start=1):
+        lessons = row.get("lessons") or []
+        if not isinstance(lessons, list):
+            lessons = [lessons]
+        yield _row(
+            number, row.get("school"), row.get("class"), row.get("teacher"), lessons
+        )
+
+
+def _row(number, school, name, teacher, lessons):
+    names = {}
+    for lesson in lessons:
+        if str(lesson).strip():
+            names.setdefault(normalize_lesson_name(str(lesson)), str(lesson).strip())
+    return {
+        "row": number,
+        "school": str(school or "").strip(),
+        "class": str(name or "").strip(),
+        "teacher": str(teacher or "").strip() or None,
+        "lessons": list(names.values()),
+    }
+
+
+def validate_timetable(rows):
+    """
+    Check every row of ``rows`` against the database with one query per kind
+    of object, and return ``[{"row", "errors"}]`` for the rows that cannot be
+    imported.
+    """
+    school_ids = {int(row["school"]) for row in rows if row["school"].isdecimal()}
+    schools = set(School.objects.filter(pk__in=school_ids).values_list("pk", flat=True))
+    teachers = set(
+        User.objects.filter(
+            national_id__in={row["teacher"] for row in rows if row["teacher"]},
+            groups__name="teacher",
+        ).values_list("national_id", flat=True)
+    )
+    existing = set(
+        Class.objects.filter(school_id__in=schools).values_list("school_id", "name")
+    )
+
+    errors, seen = [], set()
+    for row in rows:
+        row_errors = []
+        school_id = int(row["school"]) if row["school"].isdecimal() else None
+        if school_id not in schools:
+            row_errors.append(f"School {row['school'] or '(empty)'} does not exist.")
+        if not row["class"]:
+            row_errors.append("The class name is required.")
+        elif len(row["class"]) > NAME_MAX_LENGTH:
+            row_errors.append("The class name is too long.")
+        elif (school_id, row["class"]) in existing:
+            row_errors.append(f"The class {row['class']} already exists.")
+        elif (school_id, row["class"]) in seen:
+            row_errors.append(f"The class {row['class']} is listed twice.")
+        if row["teacher"] and row["teacher"] not in teachers:
+            row_errors.append(
+                f"The teacher with national_id = {row['teacher']} does not exist "
+                "or is not a teacher."
+            )
+        if any(len(lesson) > NAME_MAX_LENGTH for lesson in row["lessons"]):
+            row_errors.append("A lesson name is too long.")
+        seen.add((school_id, row["class"]))
+        if row_errors:
+            errors.append({"row": row["row"], "errors": row_errors})
+    return errors
+
+
+def import_timetable(rows, dry_run=False):
+    """
+    Create the classes of ``rows`` with their teachers and lessons, creating
+    the lessons that do not exist yet.
+
+    The whole file is validated first: if any row is invalid nothing is
+    created. Return ``(errors, counts)``, counts being the numbers of classes,
+    lessons and class lessons created (or that would be, with ``dry_run``).
+    """
+    errors = validate_timetable(rows)
+    if errors:
+        return errors, None
+
+    names = {lesson for row in rows for lesson in row["lessons"]}
+    with transaction.atomic():
+        missing = {
+            normalize_lesson_name(name)
+            for name in names - set(lesson_catalog.resolve(names))
+        }
+        counts = {
+            "classes": len(rows),
+            "lessons": len(missing),
+            "class_lessons": sum(len(row["lessons"]) for row in rows),
+        }
+        if dry_run:
+            return [], counts
+
+        lessons = lesson_catalog.resolve(names, create=True)
+
+        teachers = dict(
+            User.objects.filter(
+                national_id__in={row["teacher"] for row in rows if row["teacher"]}
+            ).values_list("national_id", "pk")
+        )
+        classes = Class.objects.bulk_create(
+            Class(
+                name=row["class"],
+                school_id=int(row["school"]),
+                teacher_id=teachers.get(row["teacher"]),
+            )
+            for row in rows
+        )
+        Class.lessons.through.objects.bulk_create(
+            Class.lessons.through(class_id=class_obj.pk, lesson_id=lessons[name])
+            for class_obj, row in zip(classes, rows)
+            for name in row["lessons"]
+        )
+
+        # bulk_create() sends no post_save: do what the Class receivers do.
+        membership_changed(*teachers.values())
+        rebuild_school_summary_on_commit(
+            *{class_obj.school_id for class_obj in classes}
+        )
+    return [], counts
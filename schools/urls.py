@@ -7,5 +7,10 @@ router = DefaultRouter()
 router.register("schools", SchoolViewSet, basename="school")
 router.register("classes", ClassViewSet, basename="class")
 urlpatterns = [
+    path(
+        "tiles/<int:z>/<int:x>/<int:y>.mvt",
+        SchoolTileView.as_view(),
+        name="school-tile",
+    ),
     path("", include(router.urls)),
 ]
@@ -1,22 +1,49 @@
-from django.contrib.gis.db.models.functions import Distance
-from django.contrib.gis.geos import Point, fromstr
-from django.contrib.gis.measure import D
-from django.db import connection
+import io
+import json
+import tempfile
+
+from django.conf import settings
+from django.contrib.gis.geos import fromstr
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.views import generic
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from assignments import gradebook
+from assignments.averages import class_ranking
+from assignments.models import Assignment
+from assignments.stats import school_stats
+from users.identity import SharedObjectMixin
 from users.models import User
 from users.serializers import UserSerializer
 
+from . import assignment, timetable
+from .autocomplete import autocomplete_schools
+from .catchments import catchment_collection, catchment_index
+from .enrollment import ADDED, REMOVED, sync_rosters, update_enrollment
+from .expansions import class_expansions, class_queryset
+from .geojson import feature_collection, paginated_feature_collection
+from .lessons import lesson_catalog
 from .models import *
+from .nearby import get_nearby_school, iter_nearby_schools_batch
 from .permissions import *
+from .renderers import GeoJSONRenderer, MVTRenderer
+from .rosters import school_roster
 from .serializers import *
+from .spatial_index import school_location_index
+from .summary import rebuild_school_summary
+from .tiles import get_tile, is_valid_tile
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 """
 {
@@ -30,47 +57,17 @@ from .serializers import *
 """
 
 
-def get_nearby_school(lan, lat, radius):
-    point = Point(lan, lat, srid=4326)
-    radius = radius * 1000
-
-    with connection.cursor() as cursor:
-        cursor.execute(
-            """
-            SELECT id, name, manager_id,
-                   ST_AsGeoJSON(location) as geojson,
-                   ST_Distance(location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography) AS distance
-            FROM schools_school
-            WHERE ST_DWithin(location::geography, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s)
-            ORDER BY distance ASC
-        """,
-            [lan, lat, lan, lat, radius],
-        )
-        nearbyes = cursor.fetchall()
-
-    sorted_schools = []
-    for row in nearbyes:
-        school = {
-            "id": row[0],
-            "name": row[1],
-            "manager": row[2],
-            "geometry": row[3],
-            "distance_km": round(row[4] / 1000, 2),
-        }
-        sorted_schools.append(school)
-
-    return sorted_schools
-
-
 class SchoolViewSet(viewsets.ModelViewSet):
     queryset = School.objects.all()
     serializer_class = SchoolSerializer
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [GeoJSONRenderer]
 
     def get_permissions(self):
         if self.action in ["create", "update", "partial_update", "destroy"]:
             permission_classes = [IsAdminUser]
         else:
-            permission_classes = [IsAuthenticated]
+            # The permission_classes of an @action replace the viewset's.
+            permission_classes = [IsAuthenticated, *self.permission_classes]
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
@@ -92,10 +89,19 @@ class SchoolViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         operation_summary="List all schools",
         operation_description="Returns a list of all schools in the system. "
-        "Managers see only their school; staff sees all.",
+        "Managers see only their school; staff sees all. With `?format=geojson` or "
+        "`Accept: application/geo+json` the same FeatureCollection, ordered by id, "
+        "is built by the database.",
         responses={200: SchoolSerializer(many=True)},
     )
     def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == GeoJSONRenderer.format:
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.paginator is None:
+                return Response(feature_collection(queryset.order_by("pk")))
+            return Response(
+                paginated_feature_collection(queryset, self.paginator, request)
+            )
         return super().list(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -144,8 +150,10 @@ class SchoolViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Get all students in this school.",
-        operation_description="Returns a list of all students enrolled in any class of the school.",
-        responses={200: UserSerializer(many=True)},
+        operation_description="Returns a page of the students enrolled in any class of "
+        "the school, ordered by name. `search` matches names, usernames and the start "
+        "of national ids; `class` keeps the students of one class.",
+        query_serializer=RosterQuerySerializer,
     )
     @action(
         detail=True,
@@ -153,21 +161,50 @@ class SchoolViewSet(viewsets.ModelViewSet):
         permission_classes=[IsManagerOfSchool],
     )
     def students(self, request, pk=None):
-        try:
-            school = self.get_object()
-            students = (
-                User.objects.filter(
-                    class_students__school=school,
-                )
-                .filter(groups__name="student")
-                .distinct()
-            )
-            serializer = UserSerializer(students, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except School.DoesNotExist:
-            return Response(
-                {"detail": "School not found."}, status=status.HTTP_404_NOT_FOUND
-            )
+        return self.roster(request, "student")
+
+    @swagger_auto_schema(
+        operation_summary="Dashboard counters of this school.",
+        operation_description="Returns the number of classes, enrolled students, "
+        "teachers, assignments, open assignments (deadline not passed), ungraded "
+        "solutions and news of the school.",
+        responses={200: SchoolSummarySerializer},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[IsAdminUser | IsManagerOfSchool],
+    )
+    def summary(self, request, pk=None):
+        school = self.get_object()
+        summary = SchoolSummary.objects.filter(school=school).first()
+        if summary is None:
+            rebuild_school_summary(school.pk)
+            summary = SchoolSummary.objects.get(school=school)
+        # Depends on today's date, so it is counted rather than maintained.
+        summary.open_assignments = Assignment.objects.filter(
+            class_obj__school=school, deadline__gte=timezone.localdate()
+        ).count()
+        serializer = SchoolSummarySerializer(summary)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="Grade statistics of this school.",
+        operation_description="Returns the distribution of every graded student's "
+        "best grade on every assignment of the school, as percentages of the "
+        "maximum grades, and the share of expected solutions (students times "
+        "assignments of their classes) that were submitted.",
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="assignment-stats",
+        url_name="assignment-stats",
+        permission_classes=[IsAdminUser | IsManagerOfSchool],
+    )
+    def assignment_stats(self, request, pk=None):
+        school = self.get_object()
+        return Response(school_stats(school.pk), status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
         operation_summary="Get all classes in this school.",
@@ -178,8 +215,12 @@ class SchoolViewSet(viewsets.ModelViewSet):
     def classes(self, request, pk=None):
         try:
             school = self.get_object()
-            classes = Class.objects.filter(school=school)
-            serializer = ClassSerializer(classes, many=True)
+            classes = class_queryset(
+                Class.objects.filter(school=school), class_expansions(request)
+            )
+            serializer = ClassSerializer(
+                classes, many=True, context=self.get_serializer_context()
+            )
             return Response(serializer.data, status=status.HTTP_200_OK)
         except School.DoesNotExist:
             return Response(
@@ -209,86 +250,266 @@ class SchoolViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="Get all teachers in this school.",
-        operation_description="Returns a list of all teachers teaching in this school.",
-        responses={200: UserSerializer(many=True)},
+        operation_description="Returns a page of the teachers of any class of the "
+        "school, ordered by name. `search` matches names, usernames and the start of "
+        "national ids; `class` keeps the teacher of one class.",
+        query_serializer=RosterQuerySerializer,
     )
     @action(detail=True, methods=["get"], permission_classes=[IsManagerOfSchool])
     def teachers(self, request, pk=None):
-        try:
-            school = self.get_object()
-            teachers = (
-                User.objects.filter(
-                    class_teacher__school=school,
+        return self.roster(request, "teacher")
+
+    def roster(self, request, role):
+        school = self.get_object()
+        query = RosterQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        users = school_roster(
+            school.pk,
+            role,
+            search=query.validated_data.get("search"),
+            class_id=query.validated_data.get("class_id"),
+        )
+        page = self.paginate_queryset(users)
+        if page is None:
+            return Response(list(users), status=status.HTTP_200_OK)
+        return self.get_paginated_response(page)
+
+    @swagger_auto_schema(
+        operation_summary="Find schools near a point",
+        operation_description="In `radius` mode returns the schools within `radius` km "
+        "(default 10), in `nearest` mode the `limit` closest schools, optionally within "
+        "`radius`. Results are ordered by distance. When `limit` is given, the "
+        "`X-Next-Cursor` response header holds the `cursor` of the next page.",
+        request_body=NearbyQuerySerializer,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="nearby",
+        permission_classes=[IsAuthenticated],
+    )
+    def nearby(self, request):
+        query = NearbyQuerySerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        if settings.SCHOOL_LOCATION_INDEX:
+            search = school_location_index.search
+        else:
+            search = get_nearby_school
+        sorted_schools, next_cursor = search(
+            lan=params["lng"],
+            lat=params["lat"],
+            radius=params.get("radius"),
+            mode=params["mode"],
+            limit=params.get("limit"),
+            cursor=params.get("cursor"),
+        )
+        response = Response(sorted_schools)
+        if next_cursor:
+            response["X-Next-Cursor"] = next_cursor
+        return response
+
+    @swagger_auto_schema(
+        operation_summary="Find schools near many points",
+        operation_description="Resolves a list of points in one query. `mode`, `radius` "
+        "and `limit` apply to every point unless the point sets its own `radius`/`limit`. "
+        "The streamed response maps each point's index in `points` to its schools.",
+        request_body=NearbyBatchSerializer,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="nearby/batch",
+        url_name="nearby-batch",
+        permission_classes=[IsAuthenticated],
+    )
+    def nearby_batch(self, request):
+        query = NearbyBatchSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        points = query.validated_data["points"]
+        mode = query.validated_data["mode"]
+
+        if settings.SCHOOL_LOCATION_INDEX:
+            results = (
+                (
+                    index,
+                    school_location_index.search(
+                        lan=point["lng"],
+                        lat=point["lat"],
+                        radius=point["radius"],
+                        mode=mode,
+                        limit=point["limit"],
+                    )[0],
                 )
-                .filter(groups__name="teacher")
-                .distinct()
-            )
-            serializer = UserSerializer(teachers, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except School.DoesNotExist:
-            return Response(
-                {"detail": "School not found."}, status=status.HTTP_404_NOT_FOUND
+                for index, point in enumerate(points)
             )
+        else:
+            results = iter_nearby_schools_batch(points, mode=mode)
+
+        def stream():
+            yield "{"
+            for position, (index, schools) in enumerate(results):
+                separator = "," if position else ""
+                yield '{}"{}":{}'.format(separator, index, json.dumps(schools))
+            yield "}"
 
+        return StreamingHttpResponse(stream(), content_type="application/json")
+
+    @swagger_auto_schema(
+        operation_summary="Autocomplete school names",
+        operation_description="Returns the schools whose name best matches `q`. Names "
+        "starting with `q` come first; with `lat`/`lng`, closer schools are ranked "
+        "higher and `distance_km` is filled in.",
+        query_serializer=AutocompleteQuerySerializer,
+    )
     @action(
         detail=False,
-        methods=["post"],
-        url_path="nearby1",
+        methods=["get"],
         permission_classes=[IsAuthenticated],
     )
-    def nearby1(self, request):
+    def autocomplete(self, request):
+        query = AutocompleteQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        schools = autocomplete_schools(
+            query.validated_data["q"],
+            lng=query.validated_data.get("lng"),
+            lat=query.validated_data.get("lat"),
+            limit=query.validated_data["limit"],
+        )
+        return Response(schools)
+
+    @swagger_auto_schema(
+        operation_summary="Assign points to their nearest school",
+        operation_description="Admin only. Upload a CSV (`id`, `lng`, `lat` columns) or "
+        "GeoJSON FeatureCollection of points; returns a CSV of `id`, `school_id` and "
+        "`distance_km`. `max_distance` (km) leaves farther points unassigned and "
+        "`capacity` limits the points assigned to each school.",
+        request_body=SchoolAssignmentSerializer,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="assign-nearest",
+        url_name="assign-nearest",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def assign_nearest(self, request):
+        query = SchoolAssignmentSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        upload = query.validated_data["file"]
+        format = query.validated_data.get("format") or assignment.guess_format(
+            upload.name
+        )
+
         try:
-            lat = float(request.data.get("lat"))
-            lng = float(request.data.get("lng"))
-            user_location = Point(lng, lat, srid=4326)
-        except (TypeError, ValueError):
-            return Response(
-                {"error": "Invalid or missing 'lat'/'lng' in request body."}, status=400
+            points = assignment.read_points(
+                io.TextIOWrapper(upload, encoding="utf-8-sig", newline=""), format
             )
+        except (UnicodeDecodeError, assignment.PointsFormatError) as e:
+            raise ValidationError({"file": str(e)})
 
-        radius_km = float(request.data.get("radius", 10))
-        print(radius_km)
-        nearby_schools = (
-            School.objects.annotate(distance=Distance("location", user_location))
-            .filter(location__distance_lte=(user_location, D(km=radius_km)))
-            .order_by("distance")
+        assignments = assignment.assign_nearest_schools(
+            points,
+            max_distance=query.validated_data.get("max_distance"),
+            capacity=query.validated_data.get("capacity"),
         )
-        print("nearby_schools count:", nearby_schools.count())
-        serializer = self.get_serializer(nearby_schools, many=True)
-        features = serializer.data["features"]
-        response_data = []
+        response = HttpResponse(
+            assignment.assignments_csv(assignments), content_type="text/csv"
+        )
+        response["Content-Disposition"] = 'attachment; filename="assignments.csv"'
+        return response
 
-        for school_obj, feature in zip(nearby_schools, features):
-            feature["properties"]["distance_km"] = round(school_obj.distance.km, 2)
-            response_data.append(feature)
+    @swagger_auto_schema(
+        operation_summary="School catchment areas for a map view",
+        operation_description="Returns a GeoJSON FeatureCollection of the catchments of "
+        "the schools visible to the user, simplified for `zoom` (full resolution above "
+        "zoom 12) and optionally limited to those overlapping `bbox`.",
+        query_serializer=CatchmentQuerySerializer,
+    )
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+    )
+    def catchments(self, request):
+        query = CatchmentQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        collection = catchment_collection(
+            self.filter_queryset(self.get_queryset()),
+            query.validated_data["zoom"],
+            query.validated_data.get("bbox"),
+        )
+        return HttpResponse(collection, content_type=GeoJSONRenderer.media_type)
 
-        return Response({"type": "FeatureCollection", "features": response_data})
+    @swagger_auto_schema(
+        operation_summary="Set the catchment area of a school",
+        operation_description="Admin only. Accepts a GeoJSON Feature whose geometry is a "
+        "Polygon or MultiPolygon, or null to remove the catchment.",
+        request_body=SchoolCatchmentSerializer,
+        responses={200: SchoolCatchmentSerializer},
+    )
+    @action(
+        detail=True,
+        methods=["put"],
+        permission_classes=[IsAdminUser],
+    )
+    def catchment(self, request, pk=None):
+        serializer = SchoolCatchmentSerializer(self.get_object(), data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @swagger_auto_schema(
+        operation_summary="Find the schools whose catchment contains a point",
+        operation_description="Returns the ids of the schools whose catchment covers "
+        "the point, usually zero or one.",
+        request_body=CatchmentPointSerializer,
+    )
     @action(
         detail=False,
         methods=["post"],
-        url_path="nearby",
+        url_path="catchment-lookup",
+        url_name="catchment-lookup",
         permission_classes=[IsAuthenticated],
     )
-    def nearby(self, request):
-        try:
-            lat = float(request.data.get("lat"))
-            lng = float(request.data.get("lng"))
-        except (TypeError, ValueError):
-            return Response(
-                {"error": "Invalid or missing 'lat'/'lng' in request body."}, status=400
-            )
+    def catchment_lookup(self, request):
+        query = CatchmentPointSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        school_ids = catchment_index.lookup(
+            query.validated_data["lng"], query.validated_data["lat"]
+        )
+        return Response(school_ids)
 
-        radius_km = float(request.data.get("radius", 10))
-        sorted_schools = get_nearby_school(lan=lng, lat=lat, radius=radius_km)
-        return Response(sorted_schools)
+    @swagger_auto_schema(
+        operation_summary="Find the catchment schools of many points",
+        operation_description="Maps each point's index in `points` to the ids of the "
+        "schools whose catchment covers it.",
+        request_body=CatchmentBatchSerializer,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="catchment-lookup/batch",
+        url_name="catchment-lookup-batch",
+        permission_classes=[IsAuthenticated],
+    )
+    def catchment_lookup_batch(self, request):
+        query = CatchmentBatchSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        points = [
+            (point["lng"], point["lat"]) for point in query.validated_data["points"]
+        ]
+        results = catchment_index.lookup_many(points)
+        return Response({str(index): ids for index, ids in enumerate(results)})
 
 
 @swagger_auto_schema(
     tags=["Class Management"],
     operation_description="Manage class data, including adding/removing students and lessons.",
 )
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(SharedObjectMixin, viewsets.ModelViewSet):
     serializer_class = ClassSerializer
     queryset = Class.objects.all()
 
@@ -296,7 +517,8 @@ class ClassViewSet(viewsets.ModelViewSet):
         if self.action in ["create", "update", "partial_update", "destroy"]:
             permission_classes = [IsAdminUser]
         else:
-            permission_classes = [IsAuthenticated]
+            # The permission_classes of an @action replace the viewset's.
+            permission_classes = [IsAuthenticated, *self.permission_classes]
         return [permission() for permission in permission_classes]
 
     def get_serializer_class(self):
@@ -305,6 +527,11 @@ class ClassViewSet(viewsets.ModelViewSet):
         return super().get_serializer_class()
 
     def get_queryset(self):
+        return class_queryset(
+            self.get_visible_classes(), class_expansions(self.request)
+        )
+
+    def get_visible_classes(self):
         user = self.request.user
         if user.is_staff:
             return Class.objects.all().order_by("school")
@@ -494,6 +721,289 @@ class ClassViewSet(viewsets.ModelViewSet):
                 {"detail": "Class not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
+    @swagger_auto_schema(
+        operation_summary="Add and remove many students of a class",
+        operation_description="Only the class teacher can change enrollments. "
+        "Enrolls the students listed in `add` and unenrolls those in `remove`, "
+        "and reports the outcome for every national id: `added`, `removed`, "
+        "`already_enrolled`, `not_enrolled` or `not_found` (no such student).",
+        request_body=BulkEnrollmentSerializer,
+        responses={
+            200: openapi.Response(
+                description="Success",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    example={
+                        "added": 1,
+                        "removed": 0,
+                        "results": [{"national_id": "1234567890", "status": "added"}],
+                    },
+                ),
+            ),
+            400: openapi.Response(
+                description="Bad Request",
+                schema=openapi.Schema(type=openapi.TYPE_OBJECT),
+            ),
+        },
+    )
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="students/bulk",
+        url_name="bulk-students",
+        permission_classes=[IsTeacherOfClass],
+    )
+    def bulk_students(self, request, pk=None):
+        class_obj = self.get_object()
+        serializer = BulkEnrollmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = update_enrollment(class_obj, **serializer.validated_data)
+        return Response(
+            {
+                "added": sum(result["status"] == ADDED for result in results),
+                "removed": sum(result["status"] == REMOVED for result in results),
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @swagger_auto_schema(
+        operation_summary="Replace the students of a class",
+        operation_description="Makes the students of the class exactly the students "
+        "listed, adding and removing only what differs, and returns the numbers of "
+        "students added and removed and the national ids matching no student. "
+        "Available to admins, the class teacher and the school manager.",
+        request_body=RosterSyncSerializer,
+        responses={
+            200: openapi.Response(
+                description="Success",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    example={"added": 2, "removed": 1, "not_found": ["0000000000"]},
+                ),
+            ),
+            400: openapi.Response(
+                description="Bad Request",
+                schema=openapi.Schema(type=openapi.TYPE_OBJECT),
+            ),
+        },
+    )
+    @action(
+        detail=True,
+        methods=["put"],
+        permission_classes=[IsAdminUser | IsTeacherOfClass | IsManagerOfClass],
+    )
+    def roster(self, request, pk=None):
+        class_obj = self.get_object()
+        serializer = RosterSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = sync_rosters({class_obj: serializer.validated_data["students"]})
+        return Response(changes[class_obj.pk], status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="Replace the students of many classes",
+        operation_description="Roster sync for several classes in one transaction, "
+        "e.g. a nightly export of a student information system. Admins can sync any "
+        "class, managers the classes of their school.",
+        request_body=RosterSyncBatchSerializer,
+        responses={
+            200: openapi.Response(
+                description="Success",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    example={
+                        "results": [
+                            {"class": 1, "added": 2, "removed": 1, "not_found": []}
+                        ]
+                    },
+                ),
+            ),
+            400: openapi.Response(
+                description="Bad Request",
+                schema=openapi.Schema(type=openapi.TYPE_OBJECT),
+            ),
+        },
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="roster-sync",
+        url_name="roster-sync",
+        permission_classes=[IsAdminUser | IsManagerOfSchool],
+    )
+    def roster_sync(self, request):
+        serializer = RosterSyncBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rosters = serializer.validated_data["rosters"]
+
+        classes = self.get_visible_classes().in_bulk(
+            [roster["class_id"] for roster in rosters]
+        )
+        unknown = [
+            roster["class_id"]
+            for roster in rosters
+            if roster["class_id"] not in classes
+        ]
+        if unknown:
+            raise ValidationError({"rosters": f"Unknown classes: {unknown}."})
+
+        changes = sync_rosters(
+            {classes[roster["class_id"]]: roster["students"] for roster in rosters}
+        )
+        return Response(
+            {
+                "results": [
+                    {"class": class_id, **change}
+                    for class_id, change in changes.items()
+                ]
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @swagger_auto_schema(
+        operation_summary="Import a timetable",
+        operation_description="Creates the classes of a CSV (`school`, `class`, "
+        "`teacher`, `lessons` separated by `;`) or JSON file, with their teachers "
+        "and lessons, in one transaction. Teachers are given by national id, and "
+        "lessons that do not exist yet are created. If any row is invalid nothing "
+        "is created and the errors of every row are returned. With `dry_run` the "
+        "file is only validated.",
+        request_body=TimetableImportSerializer,
+        responses={
+            201: openapi.Response(
+                description="Created",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    example={"classes": 12, "lessons": 3, "class_lessons": 60},
+                ),
+            ),
+            400: openapi.Response(
+                description="Bad Request",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    example={
+                        "errors": [{"row": 2, "errors": ["School 9 does not exist."]}]
+                    },
+                ),
+            ),
+        },
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        url_name="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def import_timetable(self, request):
+        query = TimetableImportSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        upload = query.validated_data["file"]
+        format = query.validated_data.get("format") or timetable.guess_format(
+            upload.name
+        )
+
+        try:
+            rows = timetable.read_timetable(
+                io.TextIOWrapper(upload, encoding="utf-8-sig", newline=""), format
+            )
+        except (UnicodeDecodeError, timetable.TimetableFormatError) as e:
+            raise ValidationError({"file": str(e)})
+
+        errors, counts = timetable.import_timetable(
+            rows, dry_run=query.validated_data["dry_run"]
+        )
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            counts,
+            status=(
+                status.HTTP_200_OK
+                if query.validated_data["dry_run"]
+                else status.HTTP_201_CREATED
+            ),
+        )
+
+    @swagger_auto_schema(
+        operation_summary="Gradebook of a class",
+        operation_description="Returns the grades of every student of the class for "
+        "every assignment (`grades` follow the order of `assignments`, `null` when "
+        "ungraded), the average grade of each assignment and the average percentage "
+        "of each student and of the class. Available to admins, the class teacher "
+        "and the school manager.",
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[IsAdminUser | IsTeacherOfClass | IsManagerOfClass],
+    )
+    def gradebook(self, request, pk=None):
+        class_obj = self.get_object()
+        return Response(gradebook.gradebook(class_obj.pk), status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="Rank the students of a class",
+        operation_description="Ranks the students of the class by their average "
+        "grade in `lesson` or, without it, over every lesson of the class. Ties "
+        "share a rank and students without graded solutions are left out.",
+        query_serializer=ClassRankingQuerySerializer,
+        responses={200: ClassRankingSerializer(many=True)},
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[IsAdminUser | IsTeacherOfClass | IsManagerOfClass],
+    )
+    def rankings(self, request, pk=None):
+        class_obj = self.get_object()
+        query = ClassRankingQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ranking = class_ranking(class_obj.pk, query.validated_data.get("lesson"))
+        serializer = ClassRankingSerializer(ranking, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_summary="Export the gradebook of a class",
+        operation_description="Streams the gradebook as CSV (default) or as an "
+        "XLSX workbook: one row per student with a column per assignment, then a "
+        "row of averages.",
+        query_serializer=GradebookExportSerializer,
+    )
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="gradebook/export",
+        url_name="gradebook-export",
+        permission_classes=[IsAdminUser | IsTeacherOfClass | IsManagerOfClass],
+    )
+    def gradebook_export(self, request, pk=None):
+        class_obj = self.get_object()
+        query = GradebookExportSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        filename = "gradebook-{}.{}".format(
+            class_obj.pk, query.validated_data["output"]
+        )
+
+        if query.validated_data["output"] == gradebook.CSV:
+            response = StreamingHttpResponse(
+                gradebook.iter_csv(class_obj.pk), content_type="text/csv"
+            )
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
+
+        # A workbook is a zip archive, written whole before it can be sent: it
+        # is spooled to disk past a few megabytes.
+        file = tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024)
+        gradebook.write_xlsx(class_obj.pk, file)
+        file.seek(0)
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=filename,
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
     @swagger_auto_schema(
         operation_summary="List all students in a class",
         operation_description="Only the class teacher can see the list of students.",
@@ -544,21 +1054,21 @@ class ClassViewSet(viewsets.ModelViewSet):
         try:
             class_obj = self.get_object()
             lesson_name = request.data.get("name")
-            if not lesson_name:
+            if not lesson_name or not str(lesson_name).strip():
                 return Response(
                     {"detail": "The lesson name is required."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            lesson, created = Lesson.objects.get_or_create(name=lesson_name)
+            lesson_id = lesson_catalog.get_or_create(str(lesson_name))
 
-            if class_obj.lessons.filter(id=lesson.id).exists():
+            if class_obj.lessons.filter(id=lesson_id).exists():
                 return Response(
                     {"detail": "This lesson is already added."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            class_obj.lessons.add(lesson)
+            class_obj.lessons.add(lesson_id)
             return Response(
                 {"detail": "Lesson added successfully."}, status=status.HTTP_200_OK
             )
@@ -587,3 +1097,20 @@ class ClassViewSet(viewsets.ModelViewSet):
             return Response(
                 {"detail": "Class not found."}, status=status.HTTP_404_NOT_FOUND
             )
+
+
+class SchoolTileView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [MVTRenderer]
+
+    @swagger_auto_schema(
+        operation_summary="Vector tile of school locations",
+        operation_description="Returns the `schools` layer of a Mapbox Vector Tile. "
+        "Up to zoom 12 nearby schools are clustered into one point whose `count` "
+        "is the number of schools and `id` the lowest school id; above it every "
+        "school is a point with its `id` and `name`.",
+    )
+    def get(self, request, z, x, y):
+        if not is_valid_tile(z, x, y):
+            raise Http404
+        return Response(get_tile(z, x, y))
@@ -0,0 +1,70 @@
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .authorization import get_authorization_context_for_id
+from .models import User
+from .tokens import MEMBERSHIP_VERSION_CLAIM, SCHOOL_CLAIM
+
+
+def claims_user(validated_token):
+    """
+    Build an unsaved ``User`` carrying the identity stored in the token claims.
+
+    It behaves like a loaded row for comparisons, foreign key assignment and
+    filtering; the reverse ``school_manager`` relation is primed from the
+    ``school`` claim so ``hasattr(user, "school_manager")`` stays query-free.
+    """
+    from schools.models import School
+
+    user = User(
+        id=validated_token[api_settings.USER_ID_CLAIM],
+        username=validated_token.get("username", ""),
+        is_staff=validated_token.get("is_staff", False),
+        is_superuser=validated_token.get("is_superuser", False),
+        is_active=True,
+        membership_version=validated_token[MEMBERSHIP_VERSION_CLAIM],
+    )
+    user._state.adding = False
+    user._state.db = router.db_for_read(User)
+
+    school_id = validated_token.get(SCHOOL_CLAIM)
+    school = School(id=school_id, manager_id=user.id) if school_id else None
+    User._meta.get_field("school_manager").set_cached_value(user, school)
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates access tokens issued with authorization claims without
+    loading the user row.
+
+    The membership version in the token is compared with the cached
+    authorization context; a mismatch means the roles or memberships changed
+    after the token was issued and the client has to refresh it. Tokens issued
+    without claims fall back to the regular user lookup.
+    """
+
+    def get_user(self, validated_token):
+        if MEMBERSHIP_VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        context = get_authorization_context_for_id(user_id)
+        if not context.is_active:
+            raise AuthenticationFailed(
+                _("User not found or inactive"), code="user_inactive"
+            )
+        if context.version != validated_token[MEMBERSHIP_VERSION_CLAIM]:
+            raise AuthenticationFailed(
+                _("Token claims are out of date, please refresh the token."),
+                code="stale_token_claims",
+            )
+
+        return claims_user(validated_token)
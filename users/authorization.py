@@ -0,0 +1,166 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import User
+
+CACHE_KEY = "authorization-context:{}"
+
+_request_scope = ContextVar("authorization_request_scope", default=None)
+
+
+class AuthorizationContext:
+    """
+    Everything the permission layer needs to know about a user: group names,
+    the id of the school they manage and the ids of the classes they teach or
+    are enrolled in. ``version`` is the user's membership version, which is
+    bumped every time one of those memberships changes.
+    """
+
+    def __init__(
+        self,
+        user_id=None,
+        is_active=False,
+        version=0,
+        roles=(),
+        managed_school_id=None,
+        taught_class_ids=(),
+        enrolled_class_ids=(),
+    ):
+        self.user_id = user_id
+        self.is_active = is_active
+        self.version = version
+        self.roles = frozenset(roles)
+        self.managed_school_id = managed_school_id
+        self.taught_class_ids = frozenset(taught_class_ids)
+        self.enrolled_class_ids = frozenset(enrolled_class_ids)
+
+    def has_role(self, role_name):
+        return role_name in self.roles
+
+    def teaches(self, class_id):
+        return class_id in self.taught_class_ids
+
+    def is_enrolled_in(self, class_id):
+        return class_id in self.enrolled_class_ids
+
+    def manages(self, school_id):
+        return school_id is not None and school_id == self.managed_school_id
+
+
+ANONYMOUS_CONTEXT = AuthorizationContext()
+
+
+def load_authorization_context(user_id):
+    from schools.models import Class, School
+
+    state = (
+        User.objects.filter(pk=user_id)
+        .values_list("is_active", "membership_version")
+        .first()
+    )
+    if state is None:
+        return AuthorizationContext(user_id=user_id)
+
+    roles = Group.objects.filter(user__id=user_id).values_list("name", flat=True)
+    managed_school_id = (
+        School.objects.filter(manager_id=user_id).values_list("id", flat=True).first()
+    )
+    taught_class_ids = Class.objects.filter(teacher_id=user_id).values_list(
+        "id", flat=True
+    )
+    enrolled_class_ids = Class.students.through.objects.filter(
+        user_id=user_id
+    ).values_list("class_id", flat=True)
+
+    return AuthorizationContext(
+        user_id=user_id,
+        is_active=state[0],
+        version=state[1],
+        roles=list(roles),
+        managed_school_id=managed_school_id,
+        taught_class_ids=list(taught_class_ids),
+        enrolled_class_ids=list(enrolled_class_ids),
+    )
+
+
+def get_authorization_context(user):
+    """
+    Return the authorization context of ``user``.
+
+    The context is loaded from the database at most once per request and is
+    shared between workers through the default cache until one of the
+    invalidation signals fires for the user.
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS_CONTEXT
+    return get_authorization_context_for_id(user.pk)
+
+
+def get_authorization_context_for_id(user_id):
+    scope = _request_scope.get()
+    if scope is not None and user_id in scope:
+        return scope[user_id]
+
+    key = CACHE_KEY.format(user_id)
+    context = cache.get(key)
+    if context is None:
+        context = load_authorization_context(user_id)
+        cache.set(key, context, settings.AUTHORIZATION_CONTEXT_TIMEOUT)
+
+    if scope is not None:
+        scope[user_id] = context
+    return context
+
+
+def has_role(user, role_name):
+    return get_authorization_context(user).has_role(role_name)
+
+
+def invalidate_authorization_context(*user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    cache.delete_many([CACHE_KEY.format(user_id) for user_id in user_ids])
+
+    scope = _request_scope.get()
+    if scope is not None:
+        for user_id in user_ids:
+            scope.pop(user_id, None)
+
+
+def membership_changed(*user_ids):
+    """
+    Record that the roles or class/school memberships of ``user_ids`` changed:
+    bump their membership version, which makes tokens carrying the old claims
+    stale, and drop their cached contexts.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    User.objects.filter(pk__in=user_ids).update(
+        membership_version=F("membership_version") + 1
+    )
+    invalidate_authorization_context(*user_ids)
+
+
+class AuthorizationContextMiddleware:
+    """
+    Opens a fresh request scope so that every permission check of a request
+    reads the same authorization context.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request_scope.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _request_scope.reset(token)
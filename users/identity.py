@@ -0,0 +1,77 @@
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404
+
+
+class IdentityMap:
+    """
+    Objects loaded during one request, by model and lookup value, so that the
+    permission classes and the view of a request share one instance of each.
+    Lookups that found nothing are remembered too.
+    """
+
+    def __init__(self):
+        self._objects = {}
+
+    def get(self, queryset, **lookup):
+        """
+        Return the object of ``queryset`` matching ``lookup``, loading it on
+        the first call only. Raise the model's ``DoesNotExist`` when there is
+        none.
+        """
+        model = queryset.model
+        key = (
+            model,
+            tuple(sorted((name, str(value)) for name, value in lookup.items())),
+        )
+        if key not in self._objects:
+            try:
+                self._objects[key] = queryset.get(**lookup)
+            except (ObjectDoesNotExist, ValidationError, TypeError, ValueError):
+                self._objects[key] = None
+        obj = self._objects[key]
+        if obj is None:
+            raise model.DoesNotExist(
+                "No {} matches the given query.".format(model._meta.object_name)
+            )
+        return obj
+
+
+def get_identity_map(request):
+    # Permission classes receive the DRF request and views may hold either, so
+    # the map hangs on the underlying HttpRequest.
+    request = getattr(request, "_request", request)
+    if not hasattr(request, "identity_map"):
+        request.identity_map = IdentityMap()
+    return request.identity_map
+
+
+def get_shared_object(request, view):
+    """
+    Return the object a detail view is about, loaded from the view's queryset
+    once per request whether a permission class or the view asks first.
+    """
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    return get_identity_map(request).get(
+        view.filter_queryset(view.get_queryset()),
+        **{view.lookup_field: view.kwargs[lookup_url_kwarg]}
+    )
+
+
+class SharedObjectMixin:
+    """
+    Makes ``get_object()`` go through the request's identity map, so that
+    permission classes using ``get_shared_object()`` do not load the object
+    a second time.
+    """
+
+    def get_object(self):
+        try:
+            obj = get_shared_object(self.request, self)
+        except ObjectDoesNotExist:
+            raise Http404(
+                "No {} matches the given query.".format(
+                    self.get_queryset().model._meta.object_name
+                )
+            )
+        self.check_object_permissions(self.request, obj)
+        return obj
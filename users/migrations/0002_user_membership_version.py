@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='membership_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Bumped whenever the user's groups or class/school memberships change."),
+        ),
+    ]
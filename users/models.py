@@ -19,10 +19,34 @@ class User(AbstractUser):
         max_length=10,
         help_text="10-digit national id",
     )
+    membership_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bumped whenever the user's groups or class/school memberships change.",
+    )
     objects = UserManager()
 
     def __str__(self):
         return f"{self.username} - {self.bio}"
 
+    def save(self, *args, **kwargs):
+        # membership_version is only ever bumped in the database by
+        # membership_changed(): saving a user loaded before a bump must not
+        # write the old version back.
+        if (
+            not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+            and not args
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "membership_version"
+            ]
+        super().save(*args, **kwargs)
+
     def has_role(self, role_name):
-        return self.groups.filter(name=role_name).exists()
+        from .authorization import has_role
+
+        return has_role(self, role_name)
@@ -0,0 +1,30 @@
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from .authorization import invalidate_authorization_context, membership_changed
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if not created:
+        # Picks up activation changes, which stateless tokens rely on.
+        invalidate_authorization_context(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            membership_changed(instance.pk)
+        return
+
+    # ``group.user_set`` was changed: ``instance`` is the group.
+    if action == "pre_clear":
+        instance._cleared_user_ids = list(
+            instance.user_set.values_list("id", flat=True)
+        )
+    elif action == "post_clear":
+        membership_changed(*getattr(instance, "_cleared_user_ids", ()))
+    elif action in ("post_add", "post_remove"):
+        membership_changed(*pk_set)
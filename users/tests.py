@@ -1,9 +1,17 @@
 from django.contrib.auth.models import Group
+from django.contrib.gis.geos import Point
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
 
+from schools.models import Class, School
+from users.authentication import StatelessJWTAuthentication
+from users.authorization import get_authorization_context, has_role
 from users.models import User
+from users.tokens import MEMBERSHIP_VERSION_CLAIM, ROLES_CLAIM, SCHOOL_CLAIM
 
 
 class UserTests(APITestCase):
@@ -117,3 +125,108 @@ class UserTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         user_to_activate.refresh_from_db()
         self.assertTrue(user_to_activate.is_active)
+
+
+class AuthorizationContextTests(APITestCase):
+    def setUp(self):
+        self.student_group = Group.objects.get_or_create(name="student")[0]
+        self.user = User.objects.create_user(
+            username="ctx",
+            email="ctx@ctx.com",
+            password="ctx",
+            national_id="3333333333",
+        )
+
+    def test_context_is_loaded_once(self):
+        get_authorization_context(self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(self.user.has_role("student"))
+            self.assertFalse(has_role(self.user, "teacher"))
+
+    def test_group_change_invalidates_context(self):
+        self.assertFalse(self.user.has_role("student"))
+        self.user.groups.add(self.student_group)
+        self.assertTrue(self.user.has_role("student"))
+        self.student_group.user_set.remove(self.user)
+        self.assertFalse(self.user.has_role("student"))
+
+    def test_enrollment_invalidates_context(self):
+        school = School.objects.create(name="S", location=Point(10.0, 20.0))
+        classroom = Class.objects.create(name="C", school=school, teacher=self.user)
+        context = get_authorization_context(self.user)
+        self.assertTrue(context.teaches(classroom.id))
+        self.assertFalse(context.is_enrolled_in(classroom.id))
+
+        classroom.students.add(self.user)
+        self.assertTrue(
+            get_authorization_context(self.user).is_enrolled_in(classroom.id)
+        )
+
+        classroom.teacher = None
+        classroom.save()
+        self.assertFalse(get_authorization_context(self.user).teaches(classroom.id))
+
+    def test_save_keeps_membership_version(self):
+        school = School.objects.create(name="S", location=Point(10.0, 20.0))
+        classroom = Class.objects.create(name="C", school=school)
+        user = User.objects.get(pk=self.user.pk)
+        classroom.students.add(user)
+        bumped = User.objects.get(pk=user.pk).membership_version
+        self.assertGreater(bumped, user.membership_version)
+
+        user.bio = "Saved after the enrollment"
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.membership_version, bumped)
+        self.assertEqual(user.bio, "Saved after the enrollment")
+
+
+@override_settings(STATELESS_JWT=True)
+class StatelessJWTTests(APITestCase):
+    def setUp(self):
+        self.teacher_group = Group.objects.get_or_create(name="teacher")[0]
+        self.user = User.objects.create_user(
+            username="jwt",
+            email="jwt@jwt.com",
+            password="jwt",
+            national_id="4444444444",
+            is_active=True,
+        )
+        self.user.groups.add(self.teacher_group)
+        self.authentication = StatelessJWTAuthentication()
+
+    def obtain_tokens(self):
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "jwt", "password": "jwt"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_access_token_carries_claims(self):
+        access = AccessToken(self.obtain_tokens()["access"])
+        self.assertEqual(access[ROLES_CLAIM], ["teacher"])
+        self.assertIsNone(access[SCHOOL_CLAIM])
+        self.assertEqual(access[MEMBERSHIP_VERSION_CLAIM], 1)
+
+    def test_authentication_does_not_load_user(self):
+        access = AccessToken(self.obtain_tokens()["access"])
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(access)
+            self.assertEqual(user, self.user)
+            self.assertTrue(user.has_role("teacher"))
+            self.assertFalse(hasattr(user, "school_manager"))
+
+    def test_membership_change_makes_claims_stale(self):
+        tokens = self.obtain_tokens()
+        self.user.groups.remove(self.teacher_group)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(AccessToken(tokens["access"]))
+
+        response = self.client.post(
+            reverse("token_refresh"), {"refresh": tokens["refresh"]}, format="json"
+        )
+        access = AccessToken(response.data["access"])
+        self.assertEqual(access[ROLES_CLAIM], [])
+        self.assertEqual(self.authentication.get_user(access), self.user)
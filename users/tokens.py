@@ -0,0 +1,57 @@
+from django.conf import settings
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authorization import get_authorization_context_for_id
+from .models import User
+
+ROLES_CLAIM = "roles"
+SCHOOL_CLAIM = "school"
+MEMBERSHIP_VERSION_CLAIM = "mv"
+
+
+def add_authorization_claims(token, user_id):
+    """
+    Stamp the user's roles, managed school and membership version on ``token``
+    so that ``StatelessJWTAuthentication`` can authorize requests without
+    loading the user.
+    """
+    context = get_authorization_context_for_id(user_id)
+    user = (
+        User.objects.filter(pk=user_id)
+        .values("username", "is_staff", "is_superuser")
+        .first()
+    )
+    if user is not None:
+        token["username"] = user["username"]
+        token["is_staff"] = user["is_staff"]
+        token["is_superuser"] = user["is_superuser"]
+    token[ROLES_CLAIM] = sorted(context.roles)
+    token[SCHOOL_CLAIM] = context.managed_school_id
+    token[MEMBERSHIP_VERSION_CLAIM] = context.version
+    return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        if settings.STATELESS_JWT:
+            add_authorization_claims(token, user.pk)
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if settings.STATELESS_JWT:
+            # The refresh token may carry claims from when it was issued, so
+            # the new access token is stamped with the current ones.
+            access = AccessToken(data["access"])
+            add_authorization_claims(access, access[api_settings.USER_ID_CLAIM])
+            data["access"] = str(access)
+        return data
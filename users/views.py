@@ -4,6 +4,7 @@ from rest_framework.decorators import action
 from rest_framework.permissions import *
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from schools.models import *
 from schools.serializers import *
@@ -11,6 +12,7 @@ from schools.serializers import *
 from .models import User
 from .permissions import IsStudent, IsTeacher
 from .serializers import RegisterSerializer, UpdateBioSerializer, UserSerializer
+from .tokens import ClaimsTokenObtainPairSerializer, ClaimsTokenRefreshSerializer
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -135,3 +137,11 @@ class UserRegistrationView(APIView):
                     status=status.HTTP_201_CREATED,
                 )
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ClaimsTokenObtainPairView(TokenObtainPairView):
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+
+class ClaimsTokenRefreshView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer